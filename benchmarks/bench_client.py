@@ -0,0 +1,32 @@
+"""Per-poll CPU cost of the client."""
+from custom_components.daikinskyport.const import DEVICE_DATA_KEYS
+from custom_components.daikinskyport.daikinskyport import DaikinSkyport
+
+
+def bench_decode_device_data(benchmark, payload):
+    """Decode a body into a projected Snapshot the way the integration's client does."""
+    decoder = DaikinSkyport(config={"EMAIL": "bench@example.com", "PASSWORD": "bench"},
+                            projection=DEVICE_DATA_KEYS)
+    decoder._decode("device-0", payload)
+    benchmark(decoder._decode, "device-0", payload)
+
+
+def bench_store_changed_thermostat(benchmark, client, payload):
+    """Merge a body that differs from the snapshot, as on every poll with drifting sensors."""
+    bodies = [payload, payload.replace(b'"tempIndoor": ', b'"tempIndoor": 1')]
+    state = {"turn": 0}
+
+    def store():
+        state["turn"] ^= 1
+        client._store_thermostats([bodies[state["turn"]]])
+
+    benchmark(store)
+
+
+def bench_store_unchanged_thermostat(benchmark, client, payload):
+    client._store_thermostats([payload])
+    benchmark(client._store_thermostats, [payload])
+
+
+def bench_get_sensors(benchmark, client):
+    benchmark(client.get_sensors, 0)
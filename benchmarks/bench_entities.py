@@ -0,0 +1,25 @@
+"""Per-poll CPU cost of the entity state derivation."""
+from custom_components.daikinskyport.climate import Thermostat
+from custom_components.daikinskyport.weather import DaikinSkyportWeather
+
+from conftest import run_coroutine
+
+
+def bench_thermostat_update(benchmark, coordinator):
+    thermostat = Thermostat(coordinator, 0, coordinator.daikinskyport.get_thermostat(0))
+    benchmark(thermostat._update_from_thermostat)
+
+
+def bench_thermostat_extra_state_attributes(benchmark, coordinator):
+    thermostat = Thermostat(coordinator, 0, coordinator.daikinskyport.get_thermostat(0))
+    benchmark(lambda: thermostat.extra_state_attributes)
+
+
+def bench_weather_update(benchmark, coordinator):
+    weather = DaikinSkyportWeather(coordinator, "Thermostat 0", 0)
+    benchmark(weather._update_from_thermostat)
+
+
+def bench_weather_forecast_daily(benchmark, coordinator):
+    weather = DaikinSkyportWeather(coordinator, "Thermostat 0", 0)
+    benchmark(lambda: run_coroutine(weather.async_forecast_daily()))
@@ -0,0 +1,202 @@
+"""Scale benchmark: set the integration up against the API stand-in with many thermostats.
+
+For each device count the stand-in runs in its own process, the config entry is
+set up in a test Home Assistant instance and a few poll cycles are driven by hand.
+Reported per count:
+
+  setup      wall and CPU seconds of async_setup_entry including platform setup
+  poll       wall and CPU seconds of one coordinator refresh
+  executor   share of the poll the executor threads were busy, and jobs run
+  writes     entity state writes per poll
+
+Run with `pytest bench_scale.py -s` to see the table.  Results are written to
+.benchmarks/scale/<commit>.json for comparison.  DAIKIN_SCALE_COUNTS overrides
+the device counts, e.g. DAIKIN_SCALE_COUNTS=1,10.  Needs
+pytest-homeassistant-custom-component.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.const import CONF_EMAIL, CONF_NAME, CONF_PASSWORD  # noqa: E402
+from homeassistant.helpers.entity import Entity  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from custom_components.daikinskyport.const import CONF_BASE_URL, COORDINATOR, DOMAIN  # noqa: E402
+
+DEVICE_COUNTS = tuple(int(count) for count in
+                      os.environ.get("DAIKIN_SCALE_COUNTS", "1,10,100,500").split(","))
+POLLS = 3
+RESULTS = Path(__file__).parent / ".benchmarks" / "scale"
+MOCK_SERVER = Path(__file__).parent / "skyport_mock.py"
+
+_results = dict()
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+@contextmanager
+def mock_api(devices, latency=0.0):
+    """Run the API stand-in in a separate process so its CPU time is not counted."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, str(MOCK_SERVER), "--devices", str(devices), "--port", str(port),
+         "--latency", str(latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("API stand-in did not start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+class ExecutorMeter:
+    """Time every job the event loop hands to an executor."""
+
+    def __init__(self, loop, monkeypatch):
+        self.busy = 0.0
+        self.jobs = 0
+        self._lock = threading.Lock()
+        run_in_executor = loop.run_in_executor
+
+        def timed_run_in_executor(executor, func, *args):
+            def timed():
+                start = time.perf_counter()
+                try:
+                    return func(*args)
+                finally:
+                    with self._lock:
+                        self.busy += time.perf_counter() - start
+                        self.jobs += 1
+            return run_in_executor(executor, timed)
+
+        monkeypatch.setattr(loop, "run_in_executor", timed_run_in_executor)
+
+    def reset(self):
+        with self._lock:
+            self.busy = 0.0
+            self.jobs = 0
+
+
+class StateWriteCounter:
+    """Count Entity.async_write_ha_state calls."""
+
+    def __init__(self, monkeypatch):
+        self.count = 0
+        write = Entity.async_write_ha_state
+
+        def counted(entity):
+            self.count += 1
+            return write(entity)
+
+        monkeypatch.setattr(Entity, "async_write_ha_state", counted)
+
+
+@contextmanager
+def measure(into):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    yield
+    into["wall"] = time.perf_counter() - wall
+    into["cpu"] = time.process_time() - cpu
+
+
+@pytest.mark.parametrize("devices", DEVICE_COUNTS)
+async def bench_scale(hass, monkeypatch, devices):
+    executor = ExecutorMeter(hass.loop, monkeypatch)
+    writes = StateWriteCounter(monkeypatch)
+    with mock_api(devices) as base_url:
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            unique_id="bench@example.com",
+            data={
+                CONF_NAME: "Bench",
+                CONF_EMAIL: "bench@example.com",
+                CONF_PASSWORD: "bench",
+                CONF_BASE_URL: base_url,
+            },
+        )
+        entry.add_to_hass(hass)
+
+        setup = dict()
+        with measure(setup):
+            assert await hass.config_entries.async_setup(entry.entry_id)
+            await hass.async_block_till_done()
+        setup["entities"] = len(hass.states.async_all())
+        setup["state_writes"] = writes.count
+
+        coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+        polls = list()
+        for _ in range(POLLS):
+            executor.reset()
+            writes.count = 0
+            poll = dict()
+            # Polls are staggered per device, time a full round
+            coordinator.polling.poll_all_now()
+            with measure(poll):
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+            poll["executor_busy"] = executor.busy / poll["wall"]
+            poll["executor_jobs"] = executor.jobs
+            poll["state_writes"] = writes.count
+            polls.append(poll)
+
+        assert await hass.config_entries.async_unload(entry.entry_id)
+
+    _results[devices] = {"setup": setup, "polls": polls}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def teardown_module(module):
+    if not _results:
+        return
+    print()
+    print(f"{'devices':>8} {'entities':>9} {'setup s':>8} {'setup cpu':>10} "
+          f"{'poll s':>8} {'poll cpu':>9} {'executor':>9} {'jobs':>5} {'writes':>7}")
+    for devices, result in sorted(_results.items()):
+        setup = result["setup"]
+        polls = result["polls"]
+
+        def mean(key):
+            return sum(poll[key] for poll in polls) / len(polls)
+
+        print(f"{devices:>8} {setup['entities']:>9} {setup['wall']:>8.2f} {setup['cpu']:>10.2f} "
+              f"{mean('wall'):>8.3f} {mean('cpu'):>9.3f} {mean('executor_busy'):>8.1%} "
+              f"{mean('executor_jobs'):>5.0f} {mean('state_writes'):>7.0f}")
+    RESULTS.mkdir(parents=True, exist_ok=True)
+    path = RESULTS / f"{_commit()}.json"
+    path.write_text(json.dumps({str(devices): result for devices, result in sorted(_results.items())},
+                               indent=2))
+    print(f"Saved to {path}")
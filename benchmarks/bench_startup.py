@@ -0,0 +1,141 @@
+"""Startup benchmark: import time of the integration and time of async_setup_entry.
+
+  import     seconds to import the integration package in a fresh interpreter that
+             already has the Home Assistant modules it uses loaded, and the modules
+             it pulled in.  requests, urllib3, pytz and the platform modules must
+             not be among them.
+  setup      wall and CPU seconds of async_setup_entry including platform setup,
+             against an API stand-in answering every request after
+             DAIKIN_STARTUP_LATENCY seconds (default 1).  "cold" has no stored
+             snapshots and waits for the API, "warm" starts from the snapshots
+             stored by the previous run and must not wait for it.
+
+Both are checked against a budget, IMPORT_BUDGET and WARM_SETUP_BUDGET seconds,
+overridable through DAIKIN_IMPORT_BUDGET and DAIKIN_WARM_SETUP_BUDGET.  Run with
+`pytest bench_startup.py -s` to see the table.  Results are written to
+.benchmarks/startup/<commit>.json for comparison.  Needs
+pytest-homeassistant-custom-component.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.const import CONF_EMAIL, CONF_NAME, CONF_PASSWORD  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry  # noqa: E402
+
+from bench_scale import _commit, measure, mock_api  # noqa: E402
+from custom_components.daikinskyport.const import CONF_BASE_URL, DOMAIN  # noqa: E402
+
+DEVICES = 10
+LATENCY = float(os.environ.get("DAIKIN_STARTUP_LATENCY", "1"))
+IMPORT_BUDGET = float(os.environ.get("DAIKIN_IMPORT_BUDGET", "0.25"))
+WARM_SETUP_BUDGET = float(os.environ.get("DAIKIN_WARM_SETUP_BUDGET", "0.5"))
+RESULTS = Path(__file__).parent / ".benchmarks" / "startup"
+ROOT = Path(__file__).resolve().parent.parent
+
+# Loaded by Home Assistant before any integration is set up
+PRELOADED = (
+    "homeassistant.config_entries",
+    "homeassistant.core",
+    "homeassistant.helpers.debounce",
+    "homeassistant.helpers.entity",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+    "aiohttp",
+    "voluptuous",
+)
+# Must only be loaded when something needs them
+LAZY = ("requests", "urllib3", "pytz") + tuple(
+    f"custom_components.daikinskyport.{platform}"
+    for platform in ("climate", "sensor", "switch", "weather")
+)
+
+IMPORT_PROBE = """
+import importlib, json, sys, time
+for module in {preloaded!r}:
+    importlib.import_module(module)
+before = set(sys.modules)
+start = time.perf_counter()
+import custom_components.daikinskyport
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+_results = dict()
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+def bench_import():
+    """Import the integration in a fresh interpreter, best of three."""
+    runs = list()
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(preloaded=PRELOADED)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    best = min(runs, key=lambda run: run["seconds"])
+    loaded = [module for module in best["modules"]
+              if any(module == lazy or module.startswith(lazy + ".") for lazy in LAZY)]
+    _results["import"] = {"wall": best["seconds"], "modules": len(best["modules"]),
+                          "lazy_loaded": loaded}
+    assert not loaded, f"imported eagerly: {loaded}"
+    assert best["seconds"] <= IMPORT_BUDGET
+
+
+async def bench_setup(hass):
+    """Set the entry up without stored snapshots, then again from the ones saved on unload."""
+    with mock_api(DEVICES, LATENCY) as base_url:
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            unique_id="bench@example.com",
+            data={
+                CONF_NAME: "Bench",
+                CONF_EMAIL: "bench@example.com",
+                CONF_PASSWORD: "bench",
+                CONF_BASE_URL: base_url,
+            },
+        )
+        entry.add_to_hass(hass)
+
+        for run in ("cold", "warm"):
+            setup = dict()
+            with measure(setup):
+                assert await hass.config_entries.async_setup(entry.entry_id)
+                await hass.async_block_till_done()
+            setup["entities"] = len(hass.states.async_all())
+            _results[run] = setup
+            assert await hass.config_entries.async_unload(entry.entry_id)
+            await hass.async_block_till_done()
+
+    assert _results["warm"]["entities"] == _results["cold"]["entities"]
+    assert _results["warm"]["wall"] <= WARM_SETUP_BUDGET
+
+
+def teardown_module(module):
+    if not _results:
+        return
+    print()
+    print(f"{'':>8} {'wall s':>8} {'cpu s':>8} {'detail':>10}")
+    if "import" in _results:
+        result = _results["import"]
+        print(f"{'import':>8} {result['wall']:>8.3f} {'':>8} {result['modules']:>5} modules")
+    for run in ("cold", "warm"):
+        if run in _results:
+            result = _results[run]
+            print(f"{run:>8} {result['wall']:>8.3f} {result['cpu']:>8.3f} "
+                  f"{result['entities']:>5} entities")
+    RESULTS.mkdir(parents=True, exist_ok=True)
+    path = RESULTS / f"{_commit()}.json"
+    path.write_text(json.dumps({"latency": LATENCY, **_results}, indent=2))
+    print(f"Saved to {path}")
@@ -0,0 +1,64 @@
+"""Shared fixtures for the benchmark suite.
+
+The benchmarks run against the real integration modules, so Home Assistant and
+pytest-benchmark need to be installed (see requirements.txt).  Thermostat data
+comes from the same generator as the local API stand-in.
+"""
+import json
+import random
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+pytest.importorskip("homeassistant")
+
+from custom_components.daikinskyport.daikinskyport import DaikinSkyport  # noqa: E402
+from skyport_mock import make_device_data  # noqa: E402
+
+
+def make_client(count=1, furnace=False):
+    """Return a client holding count thermostats merged from full-size payloads."""
+    client = DaikinSkyport(config={"EMAIL": "bench@example.com", "PASSWORD": "bench"})
+    client.thermostatlist = [
+        {"id": f"device-{index}", "name": f"Thermostat {index}", "model": "ONEPLUS"}
+        for index in range(count)
+    ]
+    client._store_thermostats([
+        json.dumps(make_device_data(index, furnace, random.Random(index))).encode()
+        for index in range(count)
+    ])
+    return client
+
+
+def run_coroutine(coro):
+    """Run a coroutine that never suspends without the overhead of an event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+@pytest.fixture(params=[False, True], ids=["air_handler", "furnace"])
+def furnace(request):
+    return request.param
+
+
+@pytest.fixture
+def payload(furnace):
+    """Raw deviceData body of one thermostat as returned by the API."""
+    return json.dumps(make_device_data(0, furnace)).encode()
+
+
+@pytest.fixture
+def client(furnace):
+    return make_client(furnace=furnace)
+
+
+@pytest.fixture
+def coordinator(client):
+    """The parts of DaikinSkyportData the entities read."""
+    return SimpleNamespace(daikinskyport=client, device_info=None)
@@ -0,0 +1,393 @@
+"""Local stand-in for the Daikin Skyport cloud API.
+
+Serves the endpoints documented in API_info.md so the client and the whole
+integration can be exercised without network access:
+
+    POST /users/auth/login
+    POST /users/auth/token
+    GET  /locations
+    GET  /devices
+    GET  /deviceData/<id>
+    PUT  /deviceData/<id>
+
+Every thermostat gets a realistic ~900 key deviceData payload, either with an
+air handler or with a furnace as indoor unit. Latency, error rate, offline
+devices and token lifetime are configurable.
+
+Run it standalone and point the integration at it:
+
+    python benchmarks/skyport_mock.py --devices 100 --port 8080
+    DAIKINSKYPORT_API_URL=http://127.0.0.1:8080 hass -c config
+
+or start it in-process with start_mock_server().
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter
+
+from aiohttp import web
+
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+WEATHER_DAYS = ("Today", "Day1", "Day2", "Day3", "Day4", "Day5")
+WEATHER_ICONS = ("sunny", "partlycloudy", "mostlycloudy", "cloudy", "rain", "chancerain", "tstorms")
+
+# (start in 15 minute units, label, heating setpoint, cooling setpoint)
+SCHEDULE_PARTS = (
+    (24, "wake", 20.5, 24.5),
+    (32, "away", 17.0, 27.0),
+    (64, "home", 20.5, 24.5),
+    (72, "home", 21.0, 24.0),
+    (88, "sleep", 18.5, 25.5),
+    (92, "sleep", 18.0, 26.0),
+)
+
+# Keys reported by both indoor unit types, 255 / 65535 mean "not present"
+AIR_HANDLER_KEYS = {
+    "ctAHUnitType": 2,
+    "ctAHMode": "heat pump    ",
+    "ctAHCurrentIndoorAirflow": 850,
+    "ctAHFanCurrentDemandStatus": 120,
+    "ctAHFanRequestedDemand": 120,
+    "ctAHHeatRequestedDemand": 0,
+    "ctAHHumidificationRequestedDemand": 0,
+    "ctAHHumidificationFanSpeedPercent": 100,
+    "ctAHCriticalFault": 0,
+    "ctAHMinorFault": 0,
+}
+
+FURNACE_KEYS = {
+    "ctIFCUnitType": 1,
+    "ctIFCOperatingHeatCoolMode": "heat         ",
+    "ctIFCIndoorBlowerAirflow": 1100,
+    "ctIFCFanRequestedDemandPercent": 100,
+    "ctIFCCurrentFanActualStatus": 100,
+    "ctIFCCoolRequestedDemandPercent": 0,
+    "ctIFCCurrentCoolActualStatus": 0,
+    "ctIFCHeatRequestedDemandPercent": 140,
+    "ctIFCCurrentHeatActualStatus": 140,
+    "ctIFCHumRequestedDemandPercent": 0,
+    "ctIFCDehumRequestedDemandPercent": 0,
+    "ctIFCCriticalFault": 0,
+    "ctIFCMinorFault": 0,
+}
+
+# Keys that drift between polls so the client sees realistic churn
+DRIFTING_KEYS = ("tempIndoor", "humIndoor", "ctOutdoorAirTemperature", "ctOutdoorPower",
+                 "ctIndoorPower", "ctOutdoorFrequencyInPercent", "aqIndoorParticlesValue",
+                 "aqIndoorVOCValue")
+
+PAYLOAD_SIZE = 900
+
+
+def _absent(value):
+    """Return the "not present" marker the API uses for a value of this type."""
+    if isinstance(value, str):
+        return ""
+    if isinstance(value, int) and value > 255:
+        return 65535
+    return 255
+
+
+def make_device_data(index, furnace=False, rng=None):
+    """Return a deviceData payload of about PAYLOAD_SIZE keys for one thermostat."""
+    rng = rng or random.Random(index)
+    data = {
+        "mode": rng.choice((1, 2, 3)),
+        "equipmentStatus": rng.choice((1, 3, 4, 5, 5, 5)),
+        "tempIndoor": round(rng.uniform(19, 24), 1),
+        "humIndoor": rng.randint(30, 55),
+        "tempOutdoor": round(rng.uniform(-5, 32), 1),
+        "humOutdoor": rng.randint(20, 90),
+        "cspActive": 24.5,
+        "hspActive": 20.5,
+        "cspHome": 24.5,
+        "hspHome": 20.5,
+        "cspAway": 27.0,
+        "hspAway": 17.0,
+        "cspSched": 24.5,
+        "hspSched": 20.5,
+        "humSP": 40,
+        "dehumSP": 55,
+        "fanCirculate": 0,
+        "fanCirculateSpeed": 1,
+        "fanCirculateActive": False,
+        "fanCirculateDuration": 0,
+        "fanCirculateStart": 0,
+        "fanCirculateStop": 0,
+        "oneCleanFanActive": False,
+        "oneCleanFanSpeed": 1,
+        "geofencingAway": False,
+        "schedEnabled": True,
+        "schedOverride": 0,
+        "schedOverrideDuration": 8,
+        "nightModeActive": False,
+        "nightModeEnabled": False,
+        "nightModeLightBarAllowed": True,
+        "nightModeStart": 88,
+        "nightModeStop": 24,
+        "displayBrightness": 70,
+        "displayLockPIN": 0,
+        "alertMediaAirFilterDays": rng.randint(0, 180),
+        "statFirmware": "3.2.19",
+        "statType": "production",
+        "timeZone": "America/New_York",
+        "ctSystemCapHeat": True,
+        "ctSystemCapHumidification": furnace,
+        "ctOutdoorNoofCoolStages": 2,
+        "P1P2S21CoolingCapability": True,
+        "P1P2FieldSettingModeNumber": 0,
+        "P1P2FieldSettingUnitNumChangeRequest": False,
+        "P1P2SentFieldSettingSW3": 15,
+        "P1P2SentFieldSettingSW6": 15,
+        "ctOutdoorMode": "cool         ",
+        "ctOutdoorAirTemperature": 780,
+        "ctOutdoorPower": rng.randint(0, 300),
+        "ctIndoorPower": rng.randint(50, 600),
+        "ctOutdoorFrequencyInPercent": rng.randint(0, 200),
+        "ctOutdoorFanRequestedDemandPercentage": rng.randint(0, 200),
+        "ctOutdoorHeatRequestedDemand": 0,
+        "ctOutdoorCoolRequestedDemand": rng.randint(0, 200),
+        "ctOutdoorDeHumidificationRequestedDemand": 0,
+        "ctOutdoorCriticalFault": 0,
+        "ctOutdoorMinorFault": 0,
+        "ctEEVCoilCriticalFault": 0,
+        "ctEEVCoilMinorFault": 0,
+        "ctStatCriticalFault": 0,
+        "ctStatMinorFault": 0,
+        "aqOutdoorAvailable": True,
+        "aqOutdoorParticles": rng.randint(0, 40),
+        "aqOutdoorValue": rng.randint(0, 80),
+        "aqOutdoorOzone": rng.randint(10, 50),
+        "aqOutdoorLevel": 1,
+        "aqIndoorAvailable": index % 2 == 0,
+        "aqIndoorParticlesValue": rng.randint(0, 40),
+        "aqIndoorParticlesLevel": 1,
+        "aqIndoorValue": rng.randint(0, 80),
+        "aqIndoorVOCValue": rng.randint(100, 600),
+        "aqIndoorVOCLevel": 1,
+        "aqIndoorLevel": 1,
+    }
+
+    present, missing = (FURNACE_KEYS, AIR_HANDLER_KEYS) if furnace else (AIR_HANDLER_KEYS, FURNACE_KEYS)
+    data.update(present)
+    data.update({key: _absent(value) for key, value in missing.items()})
+
+    for day in DAYS:
+        for part, (start, label, hsp, csp) in enumerate(SCHEDULE_PARTS, 1):
+            prefix = f"sched{day}Part{part}"
+            data[prefix + "Time"] = start
+            data[prefix + "Enabled"] = True
+            data[prefix + "Label"] = label
+            data[prefix + "hsp"] = hsp
+            data[prefix + "csp"] = csp
+            data[prefix + "Action"] = 0
+
+    for day in WEATHER_DAYS:
+        temp = round(rng.uniform(-5, 32))
+        icon = rng.choice(WEATHER_ICONS)
+        data[f"weather{day}TempC"] = temp
+        data[f"weather{day}TempF"] = round(temp * 9 / 5 + 32)
+        data[f"weather{day}Icon"] = icon
+        data[f"weather{day}Cond"] = icon.replace("chance", "chance of ")
+        data[f"weather{day}Hum"] = rng.randint(20, 90)
+
+    for n in range(1, 11):
+        data[f"messageHistory{n}Text"] = ""
+        data[f"messageHistory{n}Type"] = 0
+        data[f"messageHistory{n}Date"] = 0
+        data[f"sysFault{n}Date"] = 0
+        data[f"sysFault{n}Level"] = 255
+        data[f"sysFault{n}Code"] = 0
+    for n in range(1, 31):
+        data[f"fault{n}Date"] = 0
+        data[f"fault{n}Level"] = 255
+        data[f"fault{n}Code"] = 0
+    for n in range(1, 8):
+        data[f"runtimeDay{n}Date"] = 0
+        data[f"runtimeDay{n}Heat"] = rng.randint(0, 600)
+        data[f"runtimeDay{n}Cool"] = rng.randint(0, 600)
+        data[f"runtimeDay{n}Fan"] = rng.randint(0, 900)
+
+    # Pad with the unit configuration fields the integration never reads
+    n = 0
+    while len(data) < PAYLOAD_SIZE:
+        n += 1
+        data[f"ctOutdoorConfig{n:03d}"] = rng.randint(0, 255)
+    return data
+
+
+class MockSkyport:
+    """State and request handlers of the stand-in API."""
+
+    def __init__(self, devices=1, latency=0.0, jitter=0.0, error_rate=0.0, offline=0,
+                 token_lifetime=3600, furnace_ratio=0.5, drift=True, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.drift = drift
+        self.rng = random.Random(seed)
+        self.location_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        self.access_tokens = dict()
+        self.refresh_tokens = set()
+        self.stats = Counter()
+        self.devices = list()
+        self.device_data = dict()
+        for index in range(devices):
+            device_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+            name = f"Thermostat {index + 1}"
+            self.devices.append({
+                "id": device_id,
+                "locationId": self.location_id,
+                "name": name,
+                "model": "ONEPLUS",
+                "firmwareVersion": "1.4.5",
+                "createdDate": 1563568617,
+                "hasOwner": True,
+                "hasWrite": True,
+            })
+            furnace = index < round(devices * furnace_ratio)
+            self.device_data[device_id] = make_device_data(index, furnace, random.Random(seed + index))
+        self.offline = {device["id"] for device in self.devices[:offline]}
+
+    def app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/users/auth/login", self.login)
+        app.router.add_post("/users/auth/token", self.token)
+        app.router.add_get("/locations", self.locations)
+        app.router.add_get("/devices", self.list_devices)
+        app.router.add_get("/deviceData/{device_id}", self.get_device_data)
+        app.router.add_put("/deviceData/{device_id}", self.put_device_data)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        resource = request.match_info.route.resource
+        self.stats[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+        delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"message": "Internal server error"}, status=503)
+        return await handler(request)
+
+    def _issue_access_token(self):
+        token = uuid.uuid4().hex
+        self.access_tokens[token] = time.monotonic() + self.token_lifetime
+        return token
+
+    def _authorized(self, request):
+        header = request.headers.get("Authorization", "")
+        expires = self.access_tokens.get(header.removeprefix("Bearer "))
+        return expires is not None and time.monotonic() < expires
+
+    @staticmethod
+    def _expired():
+        return web.json_response(
+            {"message": "Unauthorized", "error": "authorization_expired"}, status=401)
+
+    async def login(self, request):
+        body = await request.json()
+        if not body.get("email") or not body.get("password"):
+            return web.json_response({"message": "Invalid credentials"}, status=401)
+        refresh_token = uuid.uuid4().hex
+        self.refresh_tokens.add(refresh_token)
+        return web.json_response({
+            "accessToken": self._issue_access_token(),
+            "accessTokenExpiresIn": self.token_lifetime,
+            "refreshToken": refresh_token,
+            "tokenType": "Bearer",
+        })
+
+    async def token(self, request):
+        body = await request.json()
+        if body.get("refreshToken") not in self.refresh_tokens:
+            return web.json_response({"message": "Invalid refresh token"}, status=401)
+        return web.json_response({
+            "accessToken": self._issue_access_token(),
+            "accessTokenExpiresIn": self.token_lifetime,
+            "tokenType": "Bearer",
+        })
+
+    async def locations(self, request):
+        if not self._authorized(request):
+            return self._expired()
+        return web.json_response([{
+            "id": self.location_id, "name": "Home", "address": "1 Main St", "city": "Springfield",
+            "province": "IL", "postalCode": "62701", "country": "US",
+            "timeZone": "America/New_York", "latitude": 39.8, "longitude": -89.6, "hasOwner": True,
+        }])
+
+    async def list_devices(self, request):
+        if not self._authorized(request):
+            return self._expired()
+        return web.json_response(self.devices)
+
+    async def get_device_data(self, request):
+        if not self._authorized(request):
+            return self._expired()
+        device_id = request.match_info["device_id"]
+        data = self.device_data.get(device_id)
+        if data is None:
+            return web.json_response({"message": "DeviceNotFoundException"}, status=404)
+        if device_id in self.offline:
+            return web.json_response({"message": "DeviceOfflineException"}, status=400)
+        if self.drift:
+            key = self.rng.choice(DRIFTING_KEYS)
+            value = data[key]
+            data[key] = round(value + self.rng.choice((-1, 1)) * (0.1 if isinstance(value, float) else 1), 1)
+        return web.json_response(data)
+
+    async def put_device_data(self, request):
+        if not self._authorized(request):
+            return self._expired()
+        device_id = request.match_info["device_id"]
+        data = self.device_data.get(device_id)
+        if data is None:
+            return web.json_response({"message": "DeviceNotFoundException"}, status=404)
+        if device_id in self.offline:
+            return web.json_response({"message": "DeviceOfflineException"}, status=400)
+        data.update(await request.json())
+        return web.json_response({"message": "OK"})
+
+
+async def start_mock_server(host="127.0.0.1", port=0, **options):
+    """Start a MockSkyport in the running loop and return (mock, runner, base_url)."""
+    mock = MockSkyport(**options)
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return mock, runner, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--devices", type=int, default=1, help="number of thermostats")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds on top of --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--offline", type=int, default=0, help="number of devices reporting DeviceOfflineException")
+    parser.add_argument("--token-lifetime", type=int, default=3600, help="access token lifetime in seconds")
+    parser.add_argument("--furnace-ratio", type=float, default=0.5, help="fraction of thermostats with a furnace")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    mock = MockSkyport(
+        devices=args.devices, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        offline=args.offline, token_lifetime=args.token_lifetime, furnace_ratio=args.furnace_ratio,
+        seed=args.seed,
+    )
+    web.run_app(mock.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
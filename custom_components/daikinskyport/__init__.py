@@ -1,37 +1,42 @@
 """Daikin Skyport integration."""
-import os
 from datetime import timedelta
-from async_timeout import timeout
-from requests.exceptions import RequestException
-from typing import Any
 
-import voluptuous as vol
-
-import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers import discovery
 from homeassistant.const import (
     CONF_PASSWORD,
     CONF_EMAIL,
     CONF_NAME,
     Platform
 )
-from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.util import Throttle
-from homeassistant.helpers.json import save_json
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.entity import DeviceInfo
 
-from .daikinskyport import DaikinSkyport, ExpiredTokenError
+from .async_daikinskyport import AsyncDaikinSkyport
+from .daikinskyport import ExpiredTokenError
+from .polling import AdaptivePolling
 from .const import (
     _LOGGER,
     DOMAIN,
     MANUFACTURER,
     CONF_ACCESS_TOKEN,
     CONF_REFRESH_TOKEN,
+    CONF_ACCESS_TOKEN_EXPIRES,
+    CONF_BASE_URL,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    CACHE_SAVE_DELAY,
+    CACHE_STORAGE_VERSION,
     COORDINATOR,
+    DATA_STALE_AFTER,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
+    DEVICE_DATA_KEYS,
+    TOKEN_SAVE_COOLDOWN,
 )
 
 MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=30)
@@ -65,6 +70,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "PASSWORD": password,
         "ACCESS_TOKEN": access_token,
         "REFRESH_TOKEN": refresh_token,
+        "ACCESS_TOKEN_EXPIRES": entry.data.get(CONF_ACCESS_TOKEN_EXPIRES),
+        "BASE_URL": entry.data.get(CONF_BASE_URL),
     }
         
     assert entry.unique_id is not None
@@ -77,11 +84,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         hass, config, unique_id, entry
     )
 
-    try:
-        await coordinator._async_update_data()
-    except ExpiredTokenError as ex:
-        _LOGGER.warn("Unable to refresh auth token.")
-        raise ConfigEntryNotReady("Unable to refresh token.")
+    if await coordinator.async_restore_cache():
+        # Entities start from the last known state, the API is polled in the background
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} first refresh {entry.entry_id}"
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
     
     if coordinator.daikinskyport.thermostats is None:
         _LOGGER.error("No Daikin Skyport devices found to set up")
@@ -90,9 +99,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 #    entry.async_on_unload(entry.add_update_listener(update_listener))
 
 
-    for platform in PLATFORMS:
-        if entry.options.get(platform, True):
-            coordinator.platforms.append(platform)
+    # Only the enabled platforms are forwarded, the others are never imported
+    coordinator.platforms = _enabled_platforms(entry)
 
     undo_listener = entry.add_update_listener(update_listener)
 
@@ -101,18 +109,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         UNDO_UPDATE_LISTENER: undo_listener
     }
 
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    await hass.config_entries.async_forward_entry_setups(entry, coordinator.platforms)
 
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     _LOGGER.debug("Unload Entry: %s", str(entry))
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, coordinator.platforms)
     
     hass.data[DOMAIN][entry.entry_id][UNDO_UPDATE_LISTENER]()
 
     if unload_ok:
+        coordinator.async_cancel_command_poll()
+        coordinator.async_flush_tokens()
+        await coordinator.async_save_cache()
+        await coordinator.daikinskyport.async_close()
         hass.data[DOMAIN].pop(entry.entry_id)
         if not hass.data[DOMAIN]:
             hass.data.pop(DOMAIN)
@@ -121,6 +134,19 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the snapshot cache of a deleted config entry."""
+    await _cache_store(hass, entry).async_remove()
+
+
+def _enabled_platforms(entry: ConfigEntry) -> list[Platform]:
+    return [platform for platform in PLATFORMS if entry.options.get(platform, True)]
+
+
+def _cache_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    return Store(hass, CACHE_STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload config entry."""
     _LOGGER.debug("Reload Entry: %s", str(entry))
@@ -130,11 +156,16 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update listener."""
     _LOGGER.debug("Update listener: %s", str(entry))
+    coordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    if coordinator.platforms != _enabled_platforms(entry):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    coordinator.async_apply_options()
 #    await hass.config_entries.async_reload(entry.entry_id)
 
 
-class DaikinSkyportData:
-    """Get the latest data and update the states."""
+class DaikinSkyportData(DataUpdateCoordinator):
+    """Get the latest data and push it to the entities."""
 
     def __init__(
         self, 
@@ -143,48 +174,161 @@ class DaikinSkyportData:
         unique_id: str,
         entry: ConfigEntry) -> None:
         """Init the Daikin Skyport data object."""
-        self.platforms = []
         try:
-            self.name: str = entry.options[CONF_NAME]
+            name: str = entry.options[CONF_NAME]
         except (NameError, KeyError):
-            self.name: str = entry.data[CONF_NAME]
-        self.hass = hass
+            name: str = entry.data[CONF_NAME]
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=name,
+            update_interval=MIN_TIME_BETWEEN_UPDATES,
+        )
+        self.platforms = []
+        # Climate entities by entity_id, for the services
+        self.climate_entities = {}
         self.entry = entry
         self.unique_id = unique_id
-        self.daikinskyport = DaikinSkyport(config=config)
+        # Home Assistant's shared session, nothing to leak if setup fails half way
+        self.daikinskyport = AsyncDaikinSkyport(
+            config=config, session=async_get_clientsession(hass), projection=DEVICE_DATA_KEYS
+        )
+        # Refreshes can come in bursts, only the settled tokens are written to the entry
+        self._token_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=TOKEN_SAVE_COOLDOWN,
+            immediate=False,
+            function=self._async_save_tokens,
+        )
+        self.daikinskyport.token_callback = self._token_debouncer.async_schedule_call
+        self.polling = AdaptivePolling(
+            entry.options.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL),
+            entry.options.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL),
+            MIN_TIME_BETWEEN_UPDATES.total_seconds(),
+        )
+        self.daikinskyport.write_callback = self._async_command_sent
+        # Poll pulled in by a command ahead of the scheduled one
+        self._command_poll: CALLBACK_TYPE | None = None
+        # Last good device list and snapshots, to set the entities up without waiting on the API
+        self._cache = _cache_store(hass, entry)
         self.device_info = DeviceInfo(
             identifiers={(DOMAIN, unique_id)},
             manufacturer=MANUFACTURER,
             name=self.name,
             )
         
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
     async def _async_update_data(self):
         """Update data via library."""
+        requested = self.polling.due_devices(
+            thermostat["id"] for thermostat in self.daikinskyport.thermostatlist
+        )
+        success = False
         try:
-            current = await self.hass.async_add_executor_job(self.daikinskyport.update)
+            await self._async_fetch(requested)
+            success = True
+            self._cache.async_delay_save(self.daikinskyport.export_cache, CACHE_SAVE_DELAY)
+        finally:
+            # Set before the base class schedules the next refresh, failures included
+            self.update_interval = self.polling.next_interval(
+                self.daikinskyport, requested, success
+            )
+            _LOGGER.debug("Next Daikin Skyport poll in %s", self.update_interval)
+        _LOGGER.debug("Daikin Skyport data updated successfully")
+        return self.daikinskyport.thermostats
+
+    async def _async_fetch(self, deviceids) -> None:
+        try:
+            await self.daikinskyport.update(deviceids)
             _LOGGER.debug("Daikin Skyport _async_update_data")
         except ExpiredTokenError:
             _LOGGER.debug("Daikin Skyport tokens expired")
-            await self.async_refresh()
-            await self.hass.async_add_executor_job(self.daikinskyport.update)
-        _LOGGER.debug("Daikin Skyport data updated successfully")
-        return
+            if not await self.async_refresh_tokens():
+                raise UpdateFailed("Unable to refresh Daikin Skyport tokens")
+            try:
+                await self.daikinskyport.update(deviceids)
+            except ExpiredTokenError as err:
+                raise UpdateFailed("Daikin Skyport rejected the refreshed tokens") from err
+
+    async def async_restore_cache(self) -> bool:
+        """Load the thermostats of the last good poll from storage, False if there are none."""
+        cache = await self._cache.async_load()
+        if not cache or not self.daikinskyport.restore_cache(cache):
+            return False
+        _LOGGER.debug("Restored %d Daikin Skyport thermostats from storage", len(self.daikinskyport.thermostats))
+        self.data = self.daikinskyport.thermostats
+        return True
 
-    async def async_refresh(self) -> bool:
-        """Refresh tokens and update config entry."""
-        _LOGGER.debug("Refreshing Daikin Skyport tokens and updating config entry")
-        if await self.hass.async_add_executor_job(self.daikinskyport.refresh_tokens):
-            self.hass.config_entries.async_update_entry(
-                self.entry,
-                data={
-                    CONF_NAME: self.name,
-                    CONF_REFRESH_TOKEN: self.daikinskyport.refresh_token,
-                    CONF_ACCESS_TOKEN: self.daikinskyport.access_token,
-                    CONF_EMAIL: self.daikinskyport.user_email,
-                    CONF_PASSWORD: self.daikinskyport.user_password,
-                },
+    async def async_save_cache(self) -> None:
+        """Write the current thermostats to storage now, e.g. before unloading."""
+        if self.daikinskyport.thermostats:
+            await self._cache.async_save(self.daikinskyport.export_cache())
+
+    @callback
+    def _async_command_sent(self, deviceid: str) -> None:
+        """Switch a device to fast polling after a command and pull the next poll in if it is further out."""
+        self.polling.note_command(deviceid)
+        interval = self.polling.time_to_next_poll()
+        if self.update_interval is not None and self.update_interval > interval:
+            self.update_interval = interval
+            self.async_cancel_command_poll()
+            self._command_poll = async_call_later(
+                self.hass, interval, self._async_poll_after_command
             )
+
+    async def _async_poll_after_command(self, _now) -> None:
+        """Poll once the devices a command was sent to are due."""
+        self._command_poll = None
+        await self.async_request_refresh()
+
+    @callback
+    def async_cancel_command_poll(self) -> None:
+        """Drop a poll pulled in by a command that has not run yet."""
+        if self._command_poll is not None:
+            self._command_poll()
+            self._command_poll = None
+
+    def device_available(self, index: int) -> bool:
+        """Return False once the last data of a thermostat is too old to show.
+
+        Idle thermostats are only polled every max update interval, the limit stays
+        clear of that.
+        """
+        age = self.daikinskyport.data_age(index)
+        return age is not None and age <= max(DATA_STALE_AFTER, 2 * self.polling.max_interval)
+
+    @callback
+    def async_apply_options(self) -> None:
+        """Pick up poll interval limits changed in the options."""
+        self.polling.set_limits(
+            self.entry.options.get(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL),
+            self.entry.options.get(CONF_MAX_UPDATE_INTERVAL, DEFAULT_MAX_UPDATE_INTERVAL),
+        )
+
+    async def async_refresh_tokens(self) -> bool:
+        """Refresh tokens, the config entry is updated through the token callback."""
+        _LOGGER.debug("Refreshing Daikin Skyport tokens")
+        if await self.daikinskyport.refresh_tokens():
             return True
         _LOGGER.error("Error refreshing Daikin Skyport tokens")
         return False
+
+    @callback
+    def _async_save_tokens(self) -> None:
+        """Write the current tokens to the config entry."""
+        _LOGGER.debug("Saving Daikin Skyport tokens to config entry")
+        self.hass.config_entries.async_update_entry(
+            self.entry,
+            data={
+                **self.entry.data,
+                CONF_REFRESH_TOKEN: self.daikinskyport.refresh_token,
+                CONF_ACCESS_TOKEN: self.daikinskyport.access_token,
+                CONF_ACCESS_TOKEN_EXPIRES: self.daikinskyport.access_token_expires,
+            },
+        )
+
+    @callback
+    def async_flush_tokens(self) -> None:
+        """Write any token change still waiting on the debouncer."""
+        self._token_debouncer.async_cancel()
+        self._async_save_tokens()
@@ -0,0 +1,420 @@
+''' asyncio client for the Daikin Skyport API, built on aiohttp.  It lives apart from
+daikinskyport.py so the blocking client can be used without aiohttp installed '''
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+
+from .daikinskyport import (
+    CircuitOpenError,
+    DaikinSkyport,
+    ExpiredTokenError,
+    P1P2_RESET_BODY,
+    _UNREACHED,
+    _WriteBuffer,
+    _json_loads,
+    _retry_after,
+    logger,
+)
+from .const import (
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_WRITE_COALESCE_WINDOW,
+    P1P2_RESET_DELAY,
+)
+
+
+class _Response(object):
+    ''' Status and body of a finished aiohttp request '''
+
+    __slots__ = ('status', 'content')
+
+    def __init__(self, status, content):
+        self.status = status
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncDaikinSkyport(DaikinSkyport):
+    ''' asyncio variant of DaikinSkyport built on aiohttp.  Every method that talks to the API is a coroutine. '''
+
+    _transport_errors = (aiohttp.ClientError, TimeoutError, CircuitOpenError)
+
+    def __init__(self, config, session=None, pool_size=DEFAULT_POOL_SIZE,
+                 max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 write_coalesce_window=DEFAULT_WRITE_COALESCE_WINDOW,
+                 retry_policies=None, circuit_breaker=None, rate_limiter=None,
+                 projection=None):
+        self._owns_session = session is None
+        self._client_session = session
+        self.write_coalesce_window = write_coalesce_window
+        self._write_windows = dict()
+        self._token_refresh = None
+        # P1P2 resets whose timer fired and whose request is in flight
+        self._reset_tasks = set()
+        super().__init__(config=config, pool_size=pool_size,
+                         max_concurrent_requests=max_concurrent_requests,
+                         retry_policies=retry_policies, circuit_breaker=circuit_breaker,
+                         rate_limiter=rate_limiter, projection=projection)
+
+    def _create_session(self, pool_size):
+        ''' Use the supplied aiohttp session or open a pooled one owned by the client '''
+        if self._client_session is not None:
+            return self._client_session
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+
+    def close(self):
+        ''' Schedule async_close() on the running loop and return its task '''
+        return asyncio.get_running_loop().create_task(self.async_close())
+
+    async def async_close(self):
+        ''' Cancel pending P1P2 resets and close the pooled connections if the client opened them '''
+        self.cancel_delayed_resets()
+        if self._owns_session:
+            await self._session.close()
+
+    async def _request(self, kind, method, url, **kwargs):
+        ''' Send a request under the circuit breaker and the retry policy for its kind.
+        Connection errors, timeouts and 5xx responses are retried with full-jitter backoff
+        until the policy runs out of attempts or its deadline passes.  Every attempt waits
+        for the rate limiter first, and a 429 is retried once its Retry-After has passed.
+        Returns a _Response '''
+        policy = self.retry_policies[kind]
+        # A recovery probe gets a single attempt
+        attempts = 1 if self.circuit.before_request() else policy.attempts
+        deadline = None
+        retry = 0
+        throttle = None
+        while True:
+            wait = self.rate_limiter.reserve(kind != 'get')
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if deadline is None:
+                # Time spent queued behind the rate limiter does not count against the deadline
+                deadline = time.monotonic() + policy.deadline
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # The rate limiter held the retry past the deadline
+                if throttle is None:
+                    self.circuit.record_failure()
+                raise TimeoutError("Deadline of %ss passed before %s %s was retried"
+                                   % (policy.deadline, method, url))
+            throttle = None
+            try:
+                async with asyncio.timeout(min(policy.timeout, remaining)):
+                    async with self._session.request(method, url, **kwargs) as request:
+                        if request.status == 429:
+                            throttle = _retry_after(request.headers.get('Retry-After'))
+                            self.rate_limiter.throttle(throttle)
+                            self.circuit.record_success()
+                        if request.status >= 500 or throttle is not None:
+                            request.raise_for_status()
+                        response = _Response(request.status, await request.read())
+            except (aiohttp.ClientError, TimeoutError) as e:
+                retry += 1
+                delay = policy.backoff(retry) if throttle is None else throttle
+                if retry >= attempts or time.monotonic() + delay >= deadline:
+                    if throttle is None:
+                        self.circuit.record_failure()
+                    raise
+                logger.debug("Retrying %s %s in %.2fs: %s", method, url, delay, repr(e))
+                if throttle is None:
+                    await asyncio.sleep(delay)
+            else:
+                self.circuit.record_success()
+                return response
+
+
+    async def request_tokens(self):
+        ''' Method to request API tokens from skyport '''
+        url = self.base_url + '/users/auth/login'
+        header = {'Accept': 'application/json',
+                  'Content-Type': 'application/json'}
+        data = {"email": self.user_email, "password": self.user_password}
+        try:
+            request = await self._request('auth', 'POST', url, headers=header, json=data)
+        except self._transport_errors as e:
+            logger.error("Error connecting to Daikin Skyport.  Possible connectivity outage."
+                        "Could not request token. %s", e)
+            return False
+        if request.status == 200:
+            return self._store_tokens(request.json())
+        logger.error('Error while requesting tokens from daikinskyport.com.'
+                    ' Status code: %s Message: %s', request.status, request.text)
+        return False
+
+
+    async def refresh_tokens(self, stale_token=None):
+        ''' Refresh the API tokens.  Concurrent callers await the same in-flight refresh, and a
+        caller that passes the token it found expired returns at once if it has already been replaced '''
+        if stale_token is not None and stale_token != self.access_token:
+            return True
+        if self._token_refresh is None:
+            self._token_refresh = asyncio.ensure_future(self._refresh_tokens())
+            self._token_refresh.add_done_callback(self._token_refresh_done)
+        return await asyncio.shield(self._token_refresh)
+
+    def _token_refresh_done(self, task):
+        self._token_refresh = None
+
+    async def ensure_token(self):
+        ''' Refresh the access token if it is missing or about to expire '''
+        if self.token_expiring():
+            await self.refresh_tokens(stale_token=self.access_token)
+
+    async def _refresh_tokens(self):
+        ''' Method to refresh API tokens from daikinskyport.com '''
+        url = self.base_url + '/users/auth/token'
+        header = {'Accept': 'application/json',
+                  'Content-Type': 'application/json'}
+        data = {'email': self.user_email,
+                  'refreshToken': self.refresh_token}
+        try:
+            request = await self._request('auth', 'POST', url, headers=header, json=data)
+        except self._transport_errors as e:
+            logger.warn("Error connecting to Daikin Skyport.  Could not refresh tokens. %s", e)
+            return False
+        if request.status == 200:
+            self._store_access_token(request.json())
+            return True
+        logger.warn("Could not refresh tokens, Trying to re-request. Status code: %s Message: %s ", request.status, request.text)
+        result = await self.request_tokens()
+        if result:
+            return True
+        return False
+
+
+    async def get_thermostats(self, deviceids=None):
+        ''' Set self.thermostats to a json list of thermostats from daikinskyport.com.
+        deviceids limits the poll to those devices, the /devices listing is then only
+        fetched every DEVICE_LIST_INTERVAL '''
+        self.poll_results = dict()
+        await self.ensure_token()
+        if self._device_list_stale(deviceids):
+            url = self.base_url + '/devices'
+            header = {'Content-Type': 'application/json;charset=UTF-8',
+                      'Authorization': 'Bearer ' + self.access_token}
+            try:
+                request = await self._request('get', 'GET', url, headers=header)
+            except CircuitOpenError as e:
+                logger.debug("Keeping the cached thermostat data: %s", e)
+                return self.thermostats
+            except (aiohttp.ClientError, TimeoutError) as e:
+                logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
+                return None
+            if request.status != 200:
+                self.authenticated = False
+                logger.debug("Error connecting to Daikin Skyport while attempting to get "
+                            "thermostat data. Status code: %s Message: %s", request.status, request.text)
+                raise ExpiredTokenError ("Daikin Skyport token expired")
+            self.authenticated = True
+            self._store_device_list(request.json())
+
+        requested = self._poll_targets(deviceids)
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def fetch(deviceid):
+            async with semaphore:
+                try:
+                    return await self._fetch_thermostat_info(deviceid)
+                except self._transport_errors as e:
+                    logger.warn("Error fetching data for device %s: %s", deviceid, repr(e))
+                    return _UNREACHED
+
+        # Every device is fetched before anything is merged so a poll never
+        # leaves self.thermostats half updated.  The first error cancels the other
+        # fetches and is raised as is, e.g. ExpiredTokenError for the caller to refresh
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(fetch(deviceid)) for deviceid in requested]
+        except BaseExceptionGroup as e:
+            raise e.exceptions[0] from None
+        fetched = {deviceid: task.result() for deviceid, task in zip(requested, tasks)}
+        self._store_thermostats([fetched.get(thermostat['id']) for thermostat in self.thermostatlist],
+                                requested)
+
+        return self.thermostats
+
+    async def get_thermostat_info(self, deviceid):
+        ''' Retrieve the device info for the specific device '''
+        payload = await self._fetch_thermostat_info(deviceid)
+        if payload is None:
+            return None
+        return _json_loads(payload)
+
+    async def _fetch_thermostat_info(self, deviceid):
+        ''' Retrieve the raw deviceData body for the specific device '''
+        url = self.base_url + '/deviceData/' + deviceid
+        header = {'Content-Type': 'application/json;charset=UTF-8',
+                  'Authorization': 'Bearer ' + self.access_token}
+        request = await self._request('get', 'GET', url, headers=header)
+        if request.status == 200:
+            self.authenticated = True
+            return request.content
+        if request.status == 400 and "DeviceOfflineException" in request.text:
+            logger.warn("Device is offline: %s", deviceid)
+            self.authenticated = True
+            return None
+        self.authenticated = False
+        logger.debug("Error connecting to Daikin Skyport while attempting to get "
+                    "thermostat data. Status code: %s Message: %s", request.status, request.text)
+        raise ExpiredTokenError ("Daikin Skyport token expired")
+
+
+    async def update(self, deviceids=None):
+        ''' Get new thermostat data from daikin skyport, for every device or only deviceids '''
+        return await self.get_thermostats(deviceids)
+
+    @asynccontextmanager
+    async def transaction(self, index):
+        ''' Merge every write to the thermostat made inside the block into a single PUT sent on exit.
+        Writes inside the block return a Future that is resolved with the result of that PUT '''
+        deviceID = self.thermostats[index]['id']
+        if deviceID in self._transactions:
+            yield self._transactions[deviceID].future
+            return
+        buffer = self._transactions[deviceID] = _WriteBuffer(asyncio.get_running_loop().create_future())
+        try:
+            yield buffer.future
+        except BaseException:
+            del self._transactions[deviceID]
+            # Nothing is sent, the values written in the block must not stay on display
+            self._discard_pending(deviceID, buffer.body)
+            buffer.future.set_result(None)
+            raise
+        del self._transactions[deviceID]
+        result = None
+        try:
+            if buffer.body:
+                result = await self._put_device_data(index, buffer.body, buffer.log_msg_action)
+        finally:
+            if result is None:
+                self._discard_pending(deviceID, buffer.body)
+            buffer.future.set_result(result)
+
+    async def make_request(self, index, body, log_msg_action):
+        ''' Send a change to the thermostat.  Writes to the same thermostat made within
+        write_coalesce_window of each other, or inside a transaction, share one PUT '''
+        deviceID = self.thermostats[index]['id']
+        self._note_write(deviceID, body)
+        buffer = self._transactions.get(deviceID)
+        if buffer is not None:
+            buffer.merge(body, log_msg_action)
+            return buffer.future
+        if self.write_coalesce_window <= 0:
+            return await self._put_device_data(index, body, log_msg_action)
+
+        buffer = self._write_windows.get(deviceID)
+        if buffer is not None:
+            buffer.merge(body, log_msg_action)
+            return await asyncio.shield(buffer.future)
+
+        # The first write in the window waits for the others and sends the merged body
+        buffer = self._write_windows[deviceID] = _WriteBuffer(asyncio.get_running_loop().create_future())
+        buffer.merge(body, log_msg_action)
+        result = None
+        try:
+            try:
+                await asyncio.sleep(self.write_coalesce_window)
+            finally:
+                del self._write_windows[deviceID]
+            result = await self._put_device_data(index, buffer.body, buffer.log_msg_action)
+        finally:
+            if result is None:
+                # Also reached when the task is cancelled before or while sending
+                self._discard_pending(deviceID, buffer.body)
+            buffer.future.set_result(result)
+        return result
+
+    async def _put_device_data(self, index, body, log_msg_action):
+        result = await self._send_device_data(index, body, log_msg_action)
+        if result is None:
+            self._discard_pending(self.thermostats[index]['id'], body)
+        return result
+
+    async def _send_device_data(self, index, body, log_msg_action, *, retry_count=0):
+        await self.ensure_token()
+        deviceID = self.thermostats[index]['id']
+        url = self.base_url + '/deviceData/' + deviceID
+        token = self.access_token
+        header = {'Content-Type': 'application/json;charset=UTF-8',
+                  'Authorization': 'Bearer ' + token}
+        logger.debug("Make Request: %s, Device: %s, Body: %s", log_msg_action, deviceID, body)
+        try:
+            request = await self._request('put', 'PUT', url, headers=header, json=body)
+        except self._transport_errors as e:
+            logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
+            return None
+        if request.status == 200:
+            return request
+        if (request.status == 401 and retry_count == 0 and
+              "authorization_expired" in request.text):
+            if await self.refresh_tokens(stale_token=token):
+                return await self._send_device_data(index, body, log_msg_action,
+                                                    retry_count=retry_count + 1)
+        else:
+            logger.warn(
+                "Error fetching data from Daikin Skyport while attempting to %s: %s",
+                log_msg_action, request.text)
+            return None
+
+    async def set_weekly_schedule(self, index, schedule):
+        ''' Upload a whole weekly schedule in one PUT, see _weekly_schedule_body for the format.
+        Only changed fields are sent, an unchanged schedule returns True without a request '''
+        body = self._weekly_schedule_body(index, schedule)
+        if not body:
+            return True
+        result = await self.make_request(index, body, "set weekly schedule")
+        self._apply_after(self.thermostats[index]['id'], body, result)
+        return result
+
+    async def set_fan_mode(self, index, fan_mode):
+        ''' Set fan mode. Values: auto (0), schedule (2), on (1) '''
+        body = self._fan_mode_body(index, fan_mode)
+        result = await self.make_request(index, body, "set fan mode")
+        self._reset_after(self.thermostats[index]['id'], result)
+        return result
+
+    _future_types = (asyncio.Future,)
+
+    def _schedule_reset(self, deviceid):
+        ''' Arm the P1P2 reset of a device on the event loop, replacing one already armed.
+        The reset goes out at its deadline whatever the poll schedule is '''
+        handle = self._reset_timers.pop(deviceid, None)
+        if handle is not None:
+            handle.cancel()
+        self._reset_timers[deviceid] = asyncio.get_running_loop().call_later(
+            P1P2_RESET_DELAY, self._start_reset, deviceid)
+
+    def _start_reset(self, deviceid):
+        self._reset_timers.pop(deviceid, None)
+        task = asyncio.ensure_future(self._send_reset(deviceid))
+        self._reset_tasks.add(task)
+        task.add_done_callback(self._reset_tasks.discard)
+
+    async def _send_reset(self, deviceid):
+        ''' The reset is a PUT of its own, it is never merged into an open transaction or
+        coalesce window and does not start a burst of fast polls '''
+        index = self._get_index(deviceid)
+        if index is None:
+            return None
+        body = dict(P1P2_RESET_BODY)
+        self._note_write(deviceid, body, notify=False)
+        logger.debug("Performing delayed reset for thermostat %s", deviceid)
+        return await self._put_device_data(index, body, "reset P1P2 fields")
+
+    def cancel_delayed_resets(self):
+        ''' Drop every P1P2 reset that has not been sent yet, including one in flight '''
+        for handle in self._reset_timers.values():
+            handle.cancel()
+        self._reset_timers.clear()
+        for task in self._reset_tasks:
+            task.cancel()
@@ -1,6 +1,7 @@
 """Support for Daikin Skyport Thermostats."""
+import asyncio
 import collections
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
 import voluptuous as vol
@@ -33,13 +34,20 @@ from homeassistant.const import (
 )
 
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers.event import async_track_point_in_utc_time
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.device_registry import DeviceInfo
 
 from . import DaikinSkyportData
+from .entity import DaikinSkyportEntity
 
 from .const import (
     _LOGGER,
@@ -50,6 +58,10 @@ from .const import (
     DAIKIN_HVAC_MODE_AUTO,
     DAIKIN_HVAC_MODE_AUXHEAT,
     COORDINATOR,
+    SCHEDULE_DAYS,
+    SCHEDULE_PARTS,
+    SCHEDULE_PART_FIELDS,
+    SERVICE_MAX_CONCURRENT_WRITES,
 )
 
 WEEKDAY = [ "Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
@@ -89,6 +101,16 @@ ATTR_SCHEDULE_HEATING_SETPOINT = "heat_temp_setpoint"
 ATTR_SCHEDULE_COOLING_SETPOINT = "cool_temp_setpoint"
 ATTR_SCHEDULE_MODE = "mode" #Unknown what this does right now
 ATTR_SCHEDULE_ACTION = "action" #Unknown what this does right now
+ATTR_SCHEDULE = "schedule"
+
+# Service field of a schedule part to the sched<Day>Part<n> key suffix
+SCHEDULE_PART_KEYS = {
+    ATTR_SCHEDULE_START_TIME: "Time",
+    ATTR_SCHEDULE_PART_ENABLED: "Enabled",
+    ATTR_SCHEDULE_PART_LABEL: "Label",
+    ATTR_SCHEDULE_HEATING_SETPOINT: "hsp",
+    ATTR_SCHEDULE_COOLING_SETPOINT: "csp",
+}
 
 #OneClean values
 ATTR_ONECLEAN_ENABLED = "enable"
@@ -158,18 +180,19 @@ SERVICE_RESUME_PROGRAM = "daikin_resume_program"
 SERVICE_SET_FAN_SCHEDULE = "daikin_set_fan_schedule"
 SERVICE_SET_NIGHT_MODE = "daikin_set_night_mode"
 SERVICE_SET_THERMOSTAT_SCHEDULE = "daikin_set_thermostat_schedule"
+SERVICE_SET_WEEKLY_SCHEDULE = "daikin_set_weekly_schedule"
 SERVICE_SET_ONECLEAN = "daikin_set_oneclean"
 SERVICE_PRIORITIZE_EFFICIENCY = "daikin_prioritize_efficiency"
 
 RESUME_PROGRAM_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids
     }
 )
 
 FAN_SCHEDULE_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
         vol.Optional(ATTR_FAN_START_TIME): cv.positive_int,
         vol.Optional(ATTR_FAN_STOP_TIME): cv.positive_int,
         vol.Optional(ATTR_FAN_INTERVAL): cv.positive_int,
@@ -179,7 +202,7 @@ FAN_SCHEDULE_SCHEMA = vol.Schema(
 
 NIGHT_MODE_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
         vol.Optional(ATTR_NIGHT_MODE_START_TIME): cv.positive_int,
         vol.Optional(ATTR_NIGHT_MODE_END_TIME): cv.positive_int,
         vol.Optional(ATTR_NIGHT_MODE_ENABLE): cv.boolean,
@@ -188,7 +211,7 @@ NIGHT_MODE_SCHEMA = vol.Schema(
 
 THERMOSTAT_SCHEDULE_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
         vol.Optional(ATTR_SCHEDULE_DAY): cv.string,
         vol.Optional(ATTR_SCHEDULE_START_TIME): cv.positive_int,
         vol.Optional(ATTR_SCHEDULE_PART): cv.positive_int,
@@ -199,20 +222,100 @@ THERMOSTAT_SCHEDULE_SCHEMA = vol.Schema(
     }
 )
 
+def weekday(value):
+    """Validate a day of the week, e.g. Monday or mon, as Mon."""
+    day = cv.string(value)[0:3].capitalize()
+    if day not in WEEKDAY:
+        raise vol.Invalid(f"Invalid weekday: {value}")
+    return day
+
+def unique_weekdays(value):
+    """Reject a schedule that names a day more than once, e.g. as Monday and mon."""
+    days = [weekday(day) for day in value]
+    for day in WEEKDAY:
+        if days.count(day) > 1:
+            raise vol.Invalid(f"{day} is given more than once")
+    return value
+
+SCHEDULE_PART_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_SCHEDULE_START_TIME): vol.All(vol.Coerce(int), vol.Range(min=0, max=96)),
+        vol.Optional(ATTR_SCHEDULE_PART_ENABLED): cv.boolean,
+        vol.Optional(ATTR_SCHEDULE_PART_LABEL): cv.string,
+        vol.Optional(ATTR_SCHEDULE_HEATING_SETPOINT): cv.positive_int,
+        vol.Optional(ATTR_SCHEDULE_COOLING_SETPOINT): cv.positive_int,
+    }
+)
+
+WEEKLY_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_SCHEDULE): vol.All(
+            dict,
+            unique_weekdays,
+            {weekday: vol.All(cv.ensure_list, vol.Length(max=6), [SCHEDULE_PART_SCHEMA])},
+        ),
+    }
+)
+
 ONECLEAN_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
         vol.Optional(ATTR_ONECLEAN_ENABLED): cv.boolean,
     }
 )
 
 EFFICIENCY_SCHEMA = vol.Schema(
     {
-        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_ENTITY_ID): cv.entity_ids,
         vol.Optional(ATTR_EFFICIENCY_ENABLED): cv.boolean,
     }
 )
 
+# deviceData keys the climate entity state is derived from
+THERMOSTAT_KEYS = (
+    "name",
+    "cspActive",
+    "hspActive",
+    "humSP",
+    "mode",
+    "fanCirculate",
+    "fanCirculateSpeed",
+    "geofencingAway",
+    "schedOverride",
+    "schedEnabled",
+    "ctSystemCapHumidification",
+    "tempIndoor",
+    "humIndoor",
+    "equipmentStatus",
+    "ctAHFanCurrentDemandStatus",
+    "ctAHCurrentIndoorAirflow",
+    "ctIFCIndoorBlowerAirflow",
+    "ctOutdoorCoolRequestedDemand",
+    "ctAHHeatRequestedDemand",
+    "ctOutdoorHeatRequestedDemand",
+    "ctOutdoorDeHumidificationRequestedDemand",
+    "ctAHHumidificationRequestedDemand",
+    "ctAHUnitType",
+    "ctAHMode",
+    "ctIFCUnitType",
+    "ctIFCOperatingHeatCoolMode",
+    "ctOutdoorMode",
+    "statFirmware",
+    "nightModeActive",
+    "nightModeEnabled",
+    "displayLockPIN",
+    "alertMediaAirFilterDays",
+)
+
+# deviceData keys of the weekly schedule behind the schedule_part and next_schedule_change attributes
+SCHEDULE_KEYS = ("schedEnabled", "timeZone") + tuple(
+    f"sched{day}Part{part}{field}"
+    for day in SCHEDULE_DAYS
+    for part in range(1, SCHEDULE_PARTS + 1)
+    for field in SCHEDULE_PART_FIELDS
+)
+
 SUPPORT_FLAGS = (
     ClimateEntityFeature.TARGET_TEMPERATURE
     | ClimateEntityFeature.PRESET_MODE
@@ -235,62 +338,39 @@ async def async_setup_entry(
         thermostat = coordinator.daikinskyport.get_thermostat(index)
         entities.append(Thermostat(coordinator, index, thermostat))
     
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
-    def resume_program_set_service(service: ServiceCall) -> None:
+    async def resume_program_set_service(service: ServiceCall) -> ServiceResponse:
         """Resume the schedule on the target thermostats."""
-        entity_ids = service.data[ATTR_ENTITY_ID]
+        return await _async_call_thermostats(
+            hass, service, "Resuming program",
+            lambda thermostat: thermostat.async_resume_program(),
+        )
 
-        _LOGGER.info("Resuming program for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.resume_program()
-                    _LOGGER.info("Program resumed for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
-
-    def set_fan_schedule_service(service):
+    async def set_fan_schedule_service(service: ServiceCall) -> ServiceResponse:
         """Set the fan schedule on the target thermostats."""
-        
         start = service.data.get(ATTR_FAN_START_TIME)
         stop = service.data.get(ATTR_FAN_STOP_TIME)
         interval = service.data.get(ATTR_FAN_INTERVAL)
         speed = service.data.get(ATTR_FAN_SPEED)
 
-        entity_ids = service.data[ATTR_ENTITY_ID]
+        return await _async_call_thermostats(
+            hass, service, "Setting fan schedule",
+            lambda thermostat: thermostat.async_set_fan_schedule(start, stop, interval, speed),
+        )
 
-        _LOGGER.info("Setting fan schedule for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.set_fan_schedule(start, stop, interval, speed)
-                    _LOGGER.info("Fan schedule set for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
-
-    def set_night_mode_service(service):
+    async def set_night_mode_service(service: ServiceCall) -> ServiceResponse:
         """Set night mode on the target thermostats."""
-        
         start = service.data.get(ATTR_NIGHT_MODE_START_TIME)
         stop = service.data.get(ATTR_NIGHT_MODE_END_TIME)
         enable = service.data.get(ATTR_NIGHT_MODE_ENABLE)
 
-        entity_ids = service.data[ATTR_ENTITY_ID]
+        return await _async_call_thermostats(
+            hass, service, "Setting night mode",
+            lambda thermostat: thermostat.async_set_night_mode(start, stop, enable),
+        )
 
-        _LOGGER.info("Setting night mode for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.set_night_mode(start, stop, enable)
-                    _LOGGER.info("Night mode set for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
-
-    def set_thermostat_schedule_service(service):
+    async def set_thermostat_schedule_service(service: ServiceCall) -> ServiceResponse:
         """Set the thermostat schedule on the target thermostats."""
         day = service.data.get(ATTR_SCHEDULE_DAY)
         start = service.data.get(ATTR_SCHEDULE_START_TIME)
@@ -300,55 +380,46 @@ async def async_setup_entry(
         heating = service.data.get(ATTR_SCHEDULE_HEATING_SETPOINT)
         cooling = service.data.get(ATTR_SCHEDULE_COOLING_SETPOINT)
 
-        entity_ids = service.data[ATTR_ENTITY_ID]
+        return await _async_call_thermostats(
+            hass, service, "Setting thermostat schedule",
+            lambda thermostat: thermostat.async_set_thermostat_schedule(
+                day, start, part, enable, label, heating, cooling
+            ),
+        )
 
-        _LOGGER.info("Setting thermostat schedule for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.set_thermostat_schedule(day, start, part, enable, label, heating, cooling)
-                    _LOGGER.info("Thermostat schedule set for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
-
-    def set_oneclean_service(service):
+    async def set_weekly_schedule_service(service: ServiceCall) -> ServiceResponse:
+        """Upload a weekly schedule to the target thermostats in one request each."""
+        schedule = service.data[ATTR_SCHEDULE]
+
+        return await _async_call_thermostats(
+            hass, service, "Setting weekly schedule",
+            lambda thermostat: thermostat.async_set_weekly_schedule(schedule),
+        )
+
+    async def set_oneclean_service(service: ServiceCall) -> ServiceResponse:
         """Enable/disable OneClean."""
         enable = service.data.get(ATTR_ONECLEAN_ENABLED)
 
-        entity_ids = service.data[ATTR_ENTITY_ID]
+        return await _async_call_thermostats(
+            hass, service, "Setting OneClean",
+            lambda thermostat: thermostat.async_set_oneclean(enable),
+        )
 
-        _LOGGER.info("Setting OneClean for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.set_oneclean(enable)
-                    _LOGGER.info("OneClean set for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
-
-    def set_efficiency_service(service):
+    async def set_efficiency_service(service: ServiceCall) -> ServiceResponse:
         """Enable/disable heat pump efficiency."""
         enable = service.data.get(ATTR_EFFICIENCY_ENABLED)
 
-        entity_ids = service.data[ATTR_ENTITY_ID]
-
-        _LOGGER.info("Setting efficiency for %s", entity_ids)
-        
-        for entity in entity_ids:
-            for thermostat in entities:
-                if thermostat.entity_id == entity:
-                    thermostat.set_efficiency(enable)
-                    _LOGGER.info("Efficiency set for %s", entity)
-                    thermostat.schedule_update_ha_state(True)
-                    break
+        return await _async_call_thermostats(
+            hass, service, "Setting efficiency",
+            lambda thermostat: thermostat.async_set_efficiency(enable),
+        )
 
     hass.services.async_register(
         DOMAIN,
         SERVICE_RESUME_PROGRAM,
         resume_program_set_service,
         schema=RESUME_PROGRAM_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.async_register(
@@ -356,6 +427,7 @@ async def async_setup_entry(
         SERVICE_SET_FAN_SCHEDULE,
         set_fan_schedule_service,
         schema=FAN_SCHEDULE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.async_register(
@@ -363,6 +435,7 @@ async def async_setup_entry(
         SERVICE_SET_NIGHT_MODE,
         set_night_mode_service,
         schema=NIGHT_MODE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.async_register(
@@ -370,6 +443,15 @@ async def async_setup_entry(
         SERVICE_SET_THERMOSTAT_SCHEDULE,
         set_thermostat_schedule_service,
         schema=THERMOSTAT_SCHEDULE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_WEEKLY_SCHEDULE,
+        set_weekly_schedule_service,
+        schema=WEEKLY_SCHEDULE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.async_register(
@@ -377,6 +459,7 @@ async def async_setup_entry(
         SERVICE_SET_ONECLEAN,
         set_oneclean_service,
         schema=ONECLEAN_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.async_register(
@@ -384,9 +467,63 @@ async def async_setup_entry(
         SERVICE_PRIORITIZE_EFFICIENCY,
         set_efficiency_service,
         schema=EFFICIENCY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
-class Thermostat(ClimateEntity):
+async def _async_call_thermostats(
+    hass: HomeAssistant, service: ServiceCall, action: str, call
+) -> ServiceResponse:
+    """Run a service call on the target thermostats concurrently.
+
+    Every thermostat is written to before this returns, at most
+    SERVICE_MAX_CONCURRENT_WRITES at a time.  The outcome per entity is the
+    service response, without one a failure on any entity raises once all
+    writes are done.
+    """
+    index = {}
+    for data in hass.data.get(DOMAIN, {}).values():
+        index.update(data[COORDINATOR].climate_entities)
+    entity_ids = service.data[ATTR_ENTITY_ID]
+
+    _LOGGER.info("%s for %s", action, entity_ids)
+
+    semaphore = asyncio.Semaphore(SERVICE_MAX_CONCURRENT_WRITES)
+
+    async def run(entity_id):
+        thermostat = index.get(entity_id)
+        if thermostat is None:
+            raise HomeAssistantError(f"{entity_id} is not a Daikin Skyport thermostat")
+        async with semaphore:
+            return await call(thermostat)
+
+    outcomes = await asyncio.gather(*map(run, entity_ids), return_exceptions=True)
+
+    results = {}
+    failed = []
+    for entity_id, outcome in zip(entity_ids, outcomes):
+        if isinstance(outcome, ServiceValidationError) and not service.return_response:
+            # The call itself is wrong, report why rather than which thermostats failed
+            raise outcome
+        if isinstance(outcome, BaseException):
+            error = str(outcome) or type(outcome).__name__
+        elif outcome is None:
+            error = "Daikin Skyport did not accept the change"
+        else:
+            results[entity_id] = {"success": True}
+            _LOGGER.info("%s done for %s", action, entity_id)
+            continue
+        results[entity_id] = {"success": False, "error": error}
+        failed.append(f"{entity_id} ({error})")
+        _LOGGER.error("%s failed for %s: %s", action, entity_id, error)
+
+    if service.return_response:
+        return {"results": results}
+    if failed:
+        raise HomeAssistantError(f"{action} failed for {', '.join(failed)}")
+    return None
+
+
+class Thermostat(DaikinSkyportEntity, ClimateEntity):
     """A thermostat class for Daikin Skyport Thermostats."""
 
     _attr_precision = PRECISION_TENTHS
@@ -397,31 +534,15 @@ class Thermostat(ClimateEntity):
     _attr_name = None
     _attr_has_entity_name = True
     _enable_turn_on_off_backwards_compatibility = False
+    _keys = THERMOSTAT_KEYS + SCHEDULE_KEYS
 
-    def __init__(self, data, thermostat_index, thermostat):
+    def __init__(self, coordinator, thermostat_index, thermostat):
         """Initialize the thermostat."""
-        self.data = data
-        self.thermostat_index = thermostat_index
+        super().__init__(coordinator, thermostat_index)
         self.thermostat = thermostat
         self._name = self.thermostat["name"]
         self._attr_unique_id = f"{self.thermostat['id']}-climate"
-        self._cool_setpoint = self.thermostat["cspActive"]
-        self._heat_setpoint = self.thermostat["hspActive"]
-        self._attr_target_humidity = self.thermostat.get("humSP")
-        self._hvac_mode = DAIKIN_HVAC_TO_HASS[self.thermostat["mode"]]
-        if DAIKIN_FAN_TO_HASS[self.thermostat["fanCirculate"]] == FAN_ON:
-            self._fan_mode = DAIKIN_FAN_TO_HASS[self.thermostat["fanCirculateSpeed"] + 3]
-        else:
-            self._fan_mode = DAIKIN_FAN_TO_HASS[self.thermostat["fanCirculate"]]
-        self._fan_speed = DAIKIN_FAN_SPEED_TO_HASS[self.thermostat["fanCirculateSpeed"]]
-        if self.thermostat["geofencingAway"]:
-            self._preset_mode = PRESET_AWAY
-        elif self.thermostat["schedOverride"] == 1:
-            self._preset_mode = PRESET_TEMP_HOLD
-        elif self.thermostat["schedEnabled"]:
-            self._preset_mode = PRESET_SCHEDULE
-        else:
-            self._preset_mode = PRESET_MANUAL
+        self._update_from_thermostat()
 
         self._operation_list = []
         if self.thermostat["ctSystemCapHeat"]:
@@ -439,17 +560,68 @@ class Thermostat(ClimateEntity):
                               PRESET_AWAY
                               }
         self._fan_modes = [FAN_AUTO, FAN_ON, FAN_LOW, FAN_MEDIUM, FAN_HIGH, FAN_SCHEDULE]
-        self.update_without_throttle = False
+        self._schedule_timer = None
+        self._last_success = coordinator.daikinskyport.last_success(thermostat_index)
+
+    async def async_added_to_hass(self) -> None:
+        """Add the thermostat to the entity_id index the services look entities up in."""
+        await super().async_added_to_hass()
+        self.coordinator.climate_entities[self.entity_id] = self
+        self._async_track_schedule()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Drop the thermostat from the entity_id index."""
+        self.coordinator.climate_entities.pop(self.entity_id, None)
+        self._async_cancel_schedule_timer()
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def _async_track_schedule(self) -> None:
+        """Write the state again when the next schedule part starts."""
+        self._async_cancel_schedule_timer()
+        transition = self.coordinator.daikinskyport.get_schedule(self._index).next_transition()
+        if transition is not None:
+            self._schedule_timer = async_track_point_in_utc_time(
+                self.hass, self._async_schedule_part_started, transition[0]
+            )
 
-    async def async_update(self):
-        """Get the latest state from the thermostat."""
-        if self.update_without_throttle:
-            await self.data._async_update_data(no_throttle=True)
-            self.update_without_throttle = False
-        else:
-            await self.data._async_update_data()
+    @callback
+    def _async_cancel_schedule_timer(self) -> None:
+        if self._schedule_timer is not None:
+            self._schedule_timer()
+            self._schedule_timer = None
 
-        self.thermostat = self.data.daikinskyport.get_thermostat(self.thermostat_index)
+    @callback
+    def _async_schedule_part_started(self, now: datetime) -> None:
+        self._schedule_timer = None
+        self.async_write_ha_state()
+        self._async_track_schedule()
+
+    @property
+    def thermostat_index(self) -> int:
+        """Index of the thermostat in the client's thermostat list."""
+        return self._index
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Pick up the new snapshot of the thermostat before looking for changes in it."""
+        daikinskyport = self.coordinator.daikinskyport
+        self.thermostat = daikinskyport.get_thermostat(self._index)
+        generation = self._generation
+        last_success = daikinskyport.last_success(self._index)
+        answered = last_success != self._last_success
+        self._last_success = last_success
+        super()._handle_coordinator_update()
+        if answered and self._generation == generation:
+            # An unchanged poll still refreshes the last_success attribute
+            self.async_write_ha_state()
+        if self._generation != generation and daikinskyport.keys_changed_since(
+            self._index, SCHEDULE_KEYS, generation
+        ):
+            self._async_track_schedule()
+
+    def _update_from_thermostat(self):
+        """Derive the entity state from the thermostat data."""
         self._cool_setpoint = self.thermostat["cspActive"]
         self._heat_setpoint = self.thermostat["hspActive"]
         self._attr_target_humidity = self.thermostat.get("humSP")
@@ -468,15 +640,6 @@ class Thermostat(ClimateEntity):
         else:
             self._preset_mode = PRESET_MANUAL
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        return self.data.device_info
-
-    @property
-    def available(self):
-        """Return if device is available."""
-        return True #TBD: Need to determine how to tell if the thermostat is available or not
-
     @property
     def supported_features(self):
         """Return the list of supported features."""
@@ -613,9 +776,15 @@ class Thermostat(ClimateEntity):
         if "ctOutdoorMode" in self.thermostat:
             outdoor_mode = self.thermostat["ctOutdoorMode"].strip()
 
+        schedule = self.coordinator.daikinskyport.get_schedule(self.thermostat_index)
+        schedule_part = schedule.active_part()
+        next_change = schedule.next_transition()
+
         return {
             "fan": self.fan,
             "schedule_mode": self.thermostat["schedEnabled"],
+            "schedule_part": schedule_part.label if schedule_part else None,
+            "next_schedule_change": next_change[0].isoformat() if next_change else None,
             "fan_cfm": fan_cfm,
             "fan_demand": fan_demand,
             "cooling_demand": cooling_demand,
@@ -629,42 +798,50 @@ class Thermostat(ClimateEntity):
             "indoor_mode": indoor_mode,
             "outdoor_mode": outdoor_mode,
             "thermostat_unlocked": bool(self.thermostat["displayLockPIN"] == 0),
-            "media_filter_days": self.thermostat["alertMediaAirFilterDays"]
+            "media_filter_days": self.thermostat["alertMediaAirFilterDays"],
+            "last_success": (
+                datetime.fromtimestamp(self._last_success, timezone.utc).isoformat()
+                if self._last_success is not None else None
+            ),
         }
 
 
-    def set_preset_mode(self, preset_mode):
+    async def async_set_preset_mode(self, preset_mode):
         """Activate a preset."""
         if preset_mode == self.preset_mode:
             return
 
-        if preset_mode == PRESET_AWAY:
-            self.data.daikinskyport.set_away(self.thermostat_index, True)
+        if preset_mode not in self._preset_modes:
+            return
 
-        elif preset_mode == PRESET_SCHEDULE:
-            self.data.daikinskyport.set_away(self.thermostat_index, False)
-            self.resume_program()
+        # Send the away and hold changes as a single request
+        daikinskyport = self.coordinator.daikinskyport
+        async with daikinskyport.transaction(self.thermostat_index):
+            if preset_mode == PRESET_AWAY:
+                await daikinskyport.set_away(self.thermostat_index, True)
 
-        elif preset_mode == PRESET_MANUAL:
-            self.data.daikinskyport.set_away(self.thermostat_index, False)
-            self.data.daikinskyport.set_permanent_hold(self.thermostat_index)
-            
-        elif preset_mode == PRESET_TEMP_HOLD:
-            self.data.daikinskyport.set_away(self.thermostat_index, False)
-            self.data.daikinskyport.set_temp_hold(self.thermostat_index)
-        else:
-            return
+            elif preset_mode == PRESET_SCHEDULE:
+                await daikinskyport.set_away(self.thermostat_index, False)
+                await self.async_resume_program()
+
+            elif preset_mode == PRESET_MANUAL:
+                await daikinskyport.set_away(self.thermostat_index, False)
+                await daikinskyport.set_permanent_hold(self.thermostat_index)
+
+            elif preset_mode == PRESET_TEMP_HOLD:
+                await daikinskyport.set_away(self.thermostat_index, False)
+                await daikinskyport.set_temp_hold(self.thermostat_index)
         
         self._preset_mode = preset_mode
 
-        self.update_without_throttle = True
+        self.async_write_ha_state()
 
     @property
     def preset_modes(self):
         """Return available preset modes."""
         return list(self._preset_modes)
 
-    def set_auto_temp_hold(self, heat_temp, cool_temp):
+    async def async_set_auto_temp_hold(self, heat_temp, cool_temp):
         """Set temperature hold in auto mode."""
         if cool_temp is not None:
             cool_temp_setpoint = cool_temp
@@ -677,13 +854,13 @@ class Thermostat(ClimateEntity):
             heat_temp_setpoint = self.thermostat["hspHome"]
 
         if self._preset_mode == PRESET_MANUAL:
-            self.data.daikinskyport.set_permanent_hold(
+            await self.coordinator.daikinskyport.set_permanent_hold(
                 self.thermostat_index,
                 cool_temp_setpoint,
                 heat_temp_setpoint
         )
         else:
-            self.data.daikinskyport.set_temp_hold(
+            await self.coordinator.daikinskyport.set_temp_hold(
                 self.thermostat_index,
                 cool_temp_setpoint,
                 heat_temp_setpoint,
@@ -701,39 +878,42 @@ class Thermostat(ClimateEntity):
             isinstance(cool_temp, (int, float)),
         )
 
-        self.update_without_throttle = True
+        self.async_write_ha_state()
 
-    def set_fan_mode(self, fan_mode):
+    async def async_set_fan_mode(self, fan_mode):
         """Set the fan mode.  Valid values are "on", "auto", or "schedule"."""
         if fan_mode in {FAN_ON, FAN_AUTO, FAN_SCHEDULE}:
-            self.data.daikinskyport.set_fan_mode(
+            await self.coordinator.daikinskyport.set_fan_mode(
                 self.thermostat_index,
                 FAN_TO_DAIKIN_FAN[fan_mode]
             )
             
             self._fan_mode = fan_mode
-            self.update_without_throttle = True
+            self.async_write_ha_state()
 
             _LOGGER.debug("Setting fan mode to: %s", fan_mode)
         elif fan_mode in {FAN_LOW, FAN_MEDIUM, FAN_HIGH}:
-            # Start the fan if it's off.  
-            if self._fan_mode == FAN_AUTO:
-                self.data.daikinskyport.set_fan_mode(
+            daikinskyport = self.coordinator.daikinskyport
+            # Send the fan mode and speed changes as a single request
+            async with daikinskyport.transaction(self.thermostat_index):
+                # Start the fan if it's off.  
+                if self._fan_mode == FAN_AUTO:
+                    await daikinskyport.set_fan_mode(
+                        self.thermostat_index,
+                        FAN_TO_DAIKIN_FAN[FAN_ON]
+                    )
+                    
+                    self._fan_mode = fan_mode
+
+                    _LOGGER.debug("Setting fan mode to: %s", fan_mode)
+
+                await daikinskyport.set_fan_speed(
                     self.thermostat_index,
-                    FAN_TO_DAIKIN_FAN[FAN_ON]
+                    FAN_TO_DAIKIN_FAN[fan_mode]
                 )
-                
-                self._fan_mode = fan_mode
-
-                _LOGGER.debug("Setting fan mode to: %s", fan_mode)
-
-            self.data.daikinskyport.set_fan_speed(
-                self.thermostat_index,
-                FAN_TO_DAIKIN_FAN[fan_mode]
-            )
             
             self._fan_speed = FAN_TO_DAIKIN_FAN[fan_mode]
-            self.update_without_throttle = True
+            self.async_write_ha_state()
 
             _LOGGER.debug("Setting fan speed to: %s", self._fan_speed)
         else:
@@ -742,7 +922,7 @@ class Thermostat(ClimateEntity):
             return
 
 
-    def set_temp_hold(self, temp):
+    async def async_set_temp_hold(self, temp):
         """Set temperature hold in modes other than auto."""
         if self.hvac_mode == HVACMode.HEAT:
             heat_temp = temp
@@ -750,12 +930,12 @@ class Thermostat(ClimateEntity):
         elif self.hvac_mode == HVACMode.COOL:
             cool_temp = temp
             heat_temp = self.thermostat["hspHome"]
-        self.set_auto_temp_hold(heat_temp, cool_temp)
+        await self.async_set_auto_temp_hold(heat_temp, cool_temp)
 
         self._cool_setpoint = cool_temp
         self._heat_setpoint = heat_temp
 
-    def set_temperature(self, **kwargs):
+    async def async_set_temperature(self, **kwargs):
         """Set new target temperature."""
         low_temp = kwargs.get(ATTR_TARGET_TEMP_LOW)
         high_temp = kwargs.get(ATTR_TARGET_TEMP_HIGH)
@@ -764,23 +944,20 @@ class Thermostat(ClimateEntity):
         if self.hvac_mode == HVACMode.AUTO and (
             low_temp is not None or high_temp is not None
         ):
-            self.set_auto_temp_hold(low_temp, high_temp)
+            await self.async_set_auto_temp_hold(low_temp, high_temp)
         elif temp is not None:
-            self.set_temp_hold(temp)
+            await self.async_set_temp_hold(temp)
         else:
             _LOGGER.error("Missing valid arguments for set_temperature in %s", kwargs)
 
-        self._cool_setpoint = high_temp
-        self._heat_setpoint = low_temp
-
 
-    def set_humidity(self, humidity):
+    async def async_set_humidity(self, humidity):
         """Set the humidity level."""
-        self.data.daikinskyport.set_humidity(self.thermostat_index, humidity)
+        await self.coordinator.daikinskyport.set_humidity(self.thermostat_index, humidity)
         self._attr_target_humidity = humidity
-        self.update_without_throttle = True
+        self.async_write_ha_state()
 
-    def set_hvac_mode(self, hvac_mode):
+    async def async_set_hvac_mode(self, hvac_mode):
         """Set HVAC mode (auto, auxHeatOnly, cool, heat, off)."""
         daikin_value = next(
             (k for k, v in DAIKIN_HVAC_TO_HASS.items() if v == hvac_mode), None
@@ -788,18 +965,19 @@ class Thermostat(ClimateEntity):
         if daikin_value is None:
             _LOGGER.error("Invalid mode for set_hvac_mode: %s", hvac_mode)
             return
-        self.data.daikinskyport.set_hvac_mode(self.thermostat_index, daikin_value)
+        await self.coordinator.daikinskyport.set_hvac_mode(self.thermostat_index, daikin_value)
         self._hvac_mode = hvac_mode
-        self.update_without_throttle = True
+        self.async_write_ha_state()
 
-    def resume_program(self):
+    async def async_resume_program(self):
         """Resume the thermostat schedule program."""
-        self.data.daikinskyport.resume_program(
+        result = await self.coordinator.daikinskyport.resume_program(
             self.thermostat_index
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
-    def set_fan_schedule(self, start=None, stop=None, interval=None, speed=None):
+    async def async_set_fan_schedule(self, start=None, stop=None, interval=None, speed=None):
         """Set the thermostat fan schedule."""
         if start is None:
             start = self.thermostat["fanCirculateStart"]
@@ -807,12 +985,13 @@ class Thermostat(ClimateEntity):
             stop = self.thermostat["fanCirculateStop"]
         if interval is None:
             interval = self.thermostat["fanCirculateDuration"]
-        self.data.daikinskyport.set_fan_schedule(
+        result = await self.coordinator.daikinskyport.set_fan_schedule(
             self.thermostat_index, start, stop, interval, speed
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
-    def set_night_mode(self, start=None, stop=None, enable=None):
+    async def async_set_night_mode(self, start=None, stop=None, enable=None):
         """Set the thermostat night mode."""
         if start is None:
             start = self.thermostat["nightModeStart"]
@@ -820,52 +999,78 @@ class Thermostat(ClimateEntity):
             stop = self.thermostat["nightModeStop"]
         if enable is None:
             enable = self.thermostat["nightModeEnabled"]
-        self.data.daikinskyport.set_night_mode(
+        result = await self.coordinator.daikinskyport.set_night_mode(
             self.thermostat_index, start, stop, enable
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
-    def set_thermostat_schedule(self, day=None, start=None, part=None, enable=None, label=None, heating=None, cooling=None):
+    async def async_set_thermostat_schedule(self, day=None, start=None, part=None, enable=None, label=None, heating=None, cooling=None):
         """Set the thermostat schedule."""
+        schedule = self.coordinator.daikinskyport.get_schedule(self.thermostat_index)
         if day is None:
-            now = datetime.now()
-            day = now.strftime("%a")
+            day = datetime.now(schedule.tz).strftime("%a")
         else:
             day = day[0:3].capitalize()
             if day not in WEEKDAY:
-                _LOGGER.error("Invalid weekday: %s", day)
-                return None
+                raise ServiceValidationError(f"Invalid weekday: {day}")
         if part is None:
             part = 1
         prefix = "sched" + day + "Part" + str(part)
+        current = schedule.part(day, part)
+        if current is None:
+            raise ServiceValidationError(f"{self._name} has no schedule part {part} on {day}")
         if start is None:
-            start = self.thermostat[prefix + "Time"]
+            start = current.time
         if enable is None:
-            enable = self.thermostat[prefix + "Enabled"]
+            enable = current.enabled
         if label is None:
-            label = self.thermostat[prefix + "Label"]
+            label = current.label
         if heating is None:
-            heating = self.thermostat[prefix + "hsp"]
+            heating = current.hsp
         if cooling is None:
-            cooling = self.thermostat[prefix + "csp"]
-        self.data.daikinskyport.set_thermostat_schedule(
+            cooling = current.csp
+        result = await self.coordinator.daikinskyport.set_thermostat_schedule(
             self.thermostat_index, prefix, start, enable, label, heating, cooling
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
-    def set_oneclean(self, enable):
+    async def async_set_weekly_schedule(self, schedule):
+        """Set the whole weekly schedule, sending only the parts that changed."""
+        try:
+            result = await self.coordinator.daikinskyport.set_weekly_schedule(
+                self.thermostat_index,
+                {
+                    day: [
+                        {SCHEDULE_PART_KEYS[field]: value for field, value in part.items()}
+                        for part in parts
+                    ]
+                    for day, parts in schedule.items()
+                },
+            )
+        except ValueError as err:
+            raise ServiceValidationError(f"{self._name}: {err}") from err
+        # The snapshot holds the new schedule once the upload went through
+        self._async_track_schedule()
+        self.async_write_ha_state()
+        return result
+
+    async def async_set_oneclean(self, enable):
         """Enable/disable OneClean."""
-        self.data.daikinskyport.set_fan_clean(
+        result = await self.coordinator.daikinskyport.set_fan_clean(
             self.thermostat_index, enable
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
-    def set_efficiency(self, enable):
+    async def async_set_efficiency(self, enable):
         """Enable/disable heat pump efficiency."""
-        self.data.daikinskyport.set_dual_fuel_efficiency(
+        result = await self.coordinator.daikinskyport.set_dual_fuel_efficiency(
             self.thermostat_index, enable
         )
-        self.update_without_throttle = True
+        self.async_write_ha_state()
+        return result
 
     def hold_preference(self):
         """Return user preference setting for hold time."""
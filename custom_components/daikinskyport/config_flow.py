@@ -2,14 +2,13 @@ from __future__ import annotations
 
 import asyncio
 from typing import Any
-from requests.exceptions import RequestException
-from async_timeout import timeout
 from homeassistant import config_entries
 from homeassistant.const import CONF_EMAIL, CONF_PASSWORD, CONF_NAME
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.schema_config_entry_flow import (
     SchemaFlowFormStep,
     SchemaOptionsFlowHandler,
@@ -18,13 +17,24 @@ from .const import (
     DOMAIN,
     CONF_ACCESS_TOKEN,
     CONF_REFRESH_TOKEN,
+    CONF_ACCESS_TOKEN_EXPIRES,
+    CONF_MIN_UPDATE_INTERVAL,
+    CONF_MAX_UPDATE_INTERVAL,
+    DEFAULT_MIN_UPDATE_INTERVAL,
+    DEFAULT_MAX_UPDATE_INTERVAL,
 )
 import voluptuous as vol
-from .daikinskyport import DaikinSkyport
+from .async_daikinskyport import AsyncDaikinSkyport
 
 OPTIONS_SCHEMA = vol.Schema(
     {
         vol.Optional(CONF_NAME, default="Daikin"): str,
+        vol.Optional(CONF_MIN_UPDATE_INTERVAL, default=DEFAULT_MIN_UPDATE_INTERVAL): vol.All(
+            vol.Coerce(int), vol.Range(min=5)
+        ),
+        vol.Optional(CONF_MAX_UPDATE_INTERVAL, default=DEFAULT_MAX_UPDATE_INTERVAL): vol.All(
+            vol.Coerce(int), vol.Range(min=5)
+        ),
     }
 )
 OPTIONS_FLOW = {
@@ -39,11 +49,11 @@ class DaikinSkyportConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_user(self, user_input=None):
         self._abort_if_unique_id_configured()
         if user_input is not None:
-            daikinskyport = DaikinSkyport(config={
+            daikinskyport = AsyncDaikinSkyport(config={
               'EMAIL': user_input[CONF_EMAIL],
               'PASSWORD': user_input[CONF_PASSWORD],
-            })
-            result = await self.hass.async_add_executor_job(daikinskyport.request_tokens)
+            }, session=async_get_clientsession(self.hass))
+            result = await daikinskyport.request_tokens()
             if result is None:
                 raise HomeAssistantError("Authentication failure. Verify username and password are correct.")
 
@@ -53,6 +63,7 @@ class DaikinSkyportConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             user_input[CONF_ACCESS_TOKEN] = daikinskyport.access_token
             user_input[CONF_REFRESH_TOKEN] = daikinskyport.refresh_token
+            user_input[CONF_ACCESS_TOKEN_EXPIRES] = daikinskyport.access_token_expires
 
             return self.async_create_entry(
                 title=user_input[CONF_NAME], data=user_input
@@ -5,49 +5,6 @@ _LOGGER = logging.getLogger(__package__)
 DOMAIN = "daikinskyport"
 MANUFACTURER = "Daikin"
 
-# Full list of HA conditions as of 10/2023
-from homeassistant.components.weather import (
-    ATTR_CONDITION_CLEAR_NIGHT,
-    ATTR_CONDITION_CLOUDY,
-    ATTR_CONDITION_EXCEPTIONAL,
-    ATTR_CONDITION_FOG,
-    ATTR_CONDITION_HAIL,
-    ATTR_CONDITION_LIGHTNING,
-    ATTR_CONDITION_LIGHTNING_RAINY,
-    ATTR_CONDITION_PARTLYCLOUDY,
-    ATTR_CONDITION_POURING,
-    ATTR_CONDITION_RAINY,
-    ATTR_CONDITION_SNOWY,
-    ATTR_CONDITION_SNOWY_RAINY,
-    ATTR_CONDITION_SUNNY,
-    ATTR_CONDITION_WINDY,
-    ATTR_CONDITION_WINDY_VARIANT,
-)
-
-# Map Daikin weather icons to HA conditions (weather icons are always the same, *Cond change with language)
-# Unknown entries are unverifed.  Taken from Weather Underground icon names
-DAIKIN_WEATHER_ICON_TO_HASS = {
-    "sunny": ATTR_CONDITION_SUNNY, #Unknown
-    "mostlysunny": ATTR_CONDITION_SUNNY, #Unknown
-    "partlysunny": ATTR_CONDITION_PARTLYCLOUDY, #Unknown
-    "partlycloudy": ATTR_CONDITION_PARTLYCLOUDY,
-    "clear": ATTR_CONDITION_CLEAR_NIGHT, #Unknown
-    "mostlycloudy": ATTR_CONDITION_CLOUDY,
-    "cloudy": ATTR_CONDITION_CLOUDY, #Unknown
-    "rain": ATTR_CONDITION_RAINY,
-    "chancerain": ATTR_CONDITION_RAINY,
-    "snow": ATTR_CONDITION_SNOWY, #Unknown
-    "chancesnow": ATTR_CONDITION_SNOWY, #Unknown
-    "chanceflurries": ATTR_CONDITION_SNOWY, #Unknown
-    "flurries": ATTR_CONDITION_SNOWY, #Unknown
-    "tstorms": ATTR_CONDITION_LIGHTNING,
-    "chancetstorms": ATTR_CONDITION_LIGHTNING,
-    "fog": ATTR_CONDITION_FOG, #Unknown
-    "hazy": "hazy", #Unknown
-    "sleet": "sleet", #Unknown
-    "chancesleet": "sleet",  #Unknown
-}
-
 # The multiplier applied by the API to percentage values.
 DAIKIN_PERCENT_MULTIPLIER = 2
 
@@ -59,6 +16,133 @@ DAIKIN_HVAC_MODE_AUTO = 3
 DAIKIN_HVAC_MODE_AUXHEAT = 4
 
 CONF_REFRESH_TOKEN = "refresh_token"
+CONF_BASE_URL = "base_url"
 CONF_ACCESS_TOKEN = "access_token"
+CONF_ACCESS_TOKEN_EXPIRES = "access_token_expires"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_MAX_UPDATE_INTERVAL = "max_update_interval"
 
 COORDINATOR = "coordinator"
+
+API_URL = "https://api.daikinskyport.com"
+
+# Bounds in seconds of the adaptive poll interval, adjustable in the options
+DEFAULT_MIN_UPDATE_INTERVAL = 15
+DEFAULT_MAX_UPDATE_INTERVAL = 300
+
+# Seconds of fast polling after a command is sent
+COMMAND_POLL_BURST = 120
+
+# Seconds of fast polling after a schedule, fan circulation or night mode transition
+SCHEDULE_BOUNDARY_WINDOW = 120
+
+# Growth of the poll interval on each poll that finds every device idle
+IDLE_BACKOFF_FACTOR = 1.5
+
+# Shortest gap in seconds between two staggered polls, devices due within one tick are fetched together
+POLL_TICK = 5
+
+# Seconds between refreshes of the /devices listing during staggered polling
+DEVICE_LIST_INTERVAL = 900
+
+# Seconds after a fan mode change before the P1P2 field settings are reset
+P1P2_RESET_DELAY = 15
+
+# Number of thermostats a climate service call writes to at once
+SERVICE_MAX_CONCURRENT_WRITES = 8
+
+# Days, parts per day and per-part fields of the sched<Day>Part<n><Field> keys
+SCHEDULE_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+SCHEDULE_PARTS = 6
+SCHEDULE_PART_FIELDS = ("Time", "Enabled", "Label", "hsp", "csp")
+
+# Seconds a device that did not answer is left alone, doubling per failed poll up to the max
+OFFLINE_BACKOFF_BASE = 30
+OFFLINE_BACKOFF_MAX = 1800
+
+# Age in seconds after which the last data of a thermostat is stale and its entities unavailable
+DATA_STALE_AFTER = 900
+
+# Number of keep-alive connections kept open to the Skyport API
+DEFAULT_POOL_SIZE = 10
+
+# Number of /deviceData requests allowed in flight at once during a poll
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+
+# Attempts, seconds per attempt and overall deadline in seconds for each kind of API call
+RETRY_POLICIES = {
+    "get": (3, 10, 20),
+    "put": (3, 10, 20),
+    "auth": (2, 15, 30),
+}
+
+# Retry n waits a random time between 0 and min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2**n) seconds
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 8
+
+# Consecutive failed requests after which requests fail fast and cached data is served
+CIRCUIT_FAILURE_THRESHOLD = 5
+
+# Seconds before a single recovery probe is let through, doubled after each failed probe
+CIRCUIT_RESET_TIMEOUT = 30
+CIRCUIT_RESET_MAX = 600
+
+# Seconds to wait for further writes to the same thermostat before sending one merged PUT
+DEFAULT_WRITE_COALESCE_WINDOW = 0.05
+
+# Seconds a written value is shown over polled data while waiting for the API to report it
+PENDING_WRITE_TIMEOUT = 90
+
+# Seconds before the access token expires at which it is refreshed proactively
+TOKEN_REFRESH_MARGIN = 300
+
+# Seconds to wait for further token changes before writing them to the config entry
+TOKEN_SAVE_COOLDOWN = 10
+
+# Version of the stored snapshot cache and seconds to collect polls before writing it
+CACHE_STORAGE_VERSION = 1
+CACHE_SAVE_DELAY = 60
+
+# Requests per second and burst size allowed per account for reads (GET) and writes (PUT, auth)
+READ_RATE_LIMIT = (5, 20)
+WRITE_RATE_LIMIT = (2, 10)
+
+# Seconds to pause all requests after a 429 without a usable Retry-After header
+RATE_LIMIT_BACKOFF = 30
+
+# deviceData keys the integration reads or writes, everything else is dropped when a
+# body is decoded.  Entries ending in "*" keep every key with that prefix
+DEVICE_DATA_KEYS = (
+    "mode", "equipmentStatus", "timeZone", "statFirmware", "displayLockPIN",
+    "alertMediaAirFilterDays",
+    "tempIndoor", "humIndoor", "tempOutdoor", "humOutdoor",
+    "cspActive", "hspActive", "cspHome", "hspHome", "cspAway", "hspAway",
+    "humSP", "dehumSP", "geofencingAway",
+    "schedEnabled", "schedOverride", "schedOverrideDuration",
+    "fanCirculate", "fanCirculateSpeed", "fanCirculateDuration",
+    "fanCirculateStart", "fanCirculateStop", "oneCleanFanActive",
+    "nightModeActive", "nightModeEnabled", "nightModeStart", "nightModeStop",
+    "aqOutdoorAvailable", "aqOutdoorParticles", "aqOutdoorValue", "aqOutdoorOzone",
+    "aqIndoorAvailable", "aqIndoorParticlesValue", "aqIndoorValue", "aqIndoorVOCValue",
+    "ctSystemCapHeat", "ctSystemCapHumidification", "ctDualFuelFurnaceLockoutEnable",
+    "ctIndoorPower",
+    "ctAHUnitType", "ctAHMode", "ctAHCurrentIndoorAirflow", "ctAHFanCurrentDemandStatus",
+    "ctAHHeatRequestedDemand", "ctAHHumidificationRequestedDemand",
+    "ctAHCriticalFault", "ctAHMinorFault",
+    "ctIFCUnitType", "ctIFCOperatingHeatCoolMode", "ctIFCIndoorBlowerAirflow",
+    "ctIFCFanRequestedDemandPercent", "ctIFCCurrentFanActualStatus",
+    "ctIFCCoolRequestedDemandPercent", "ctIFCCurrentCoolActualStatus",
+    "ctIFCHeatRequestedDemandPercent", "ctIFCCurrentHeatActualStatus",
+    "ctIFCHumRequestedDemandPercent", "ctIFCDehumRequestedDemandPercent",
+    "ctIFCCriticalFault", "ctIFCMinorFault",
+    "ctOutdoorMode", "ctOutdoorNoofCoolStages", "ctOutdoorAirTemperature", "ctOutdoorPower",
+    "ctOutdoorFrequencyInPercent", "ctOutdoorFanRequestedDemandPercentage",
+    "ctOutdoorHeatRequestedDemand", "ctOutdoorCoolRequestedDemand",
+    "ctOutdoorDeHumidificationRequestedDemand",
+    "ctOutdoorCriticalFault", "ctOutdoorMinorFault",
+    "ctEEVCoilCriticalFault", "ctEEVCoilMinorFault",
+    "ctStatCriticalFault", "ctStatMinorFault",
+    "P1P2*",
+    "sched*",
+    "weather*",
+)
@@ -1,26 +1,329 @@
 ''' Python Code for Communication with the Daikin Skyport Thermostat.  This is taken mostly from pyecobee, so much credit to those contributors'''
-import requests
+import email.utils
+import random
+import threading
 import json
 import os
+import hashlib
 import logging
 from time import sleep
 import time
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from contextlib import contextmanager
 
-from requests.exceptions import RequestException
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-from .const import DAIKIN_PERCENT_MULTIPLIER
+from .schedule import WeeklySchedule
+from .snapshot import Schema, Snapshot
+from .const import (
+    API_URL,
+    DAIKIN_PERCENT_MULTIPLIER,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEVICE_LIST_INTERVAL,
+    P1P2_RESET_DELAY,
+    OFFLINE_BACKOFF_BASE,
+    OFFLINE_BACKOFF_MAX,
+    SCHEDULE_DAYS,
+    SCHEDULE_PARTS,
+    SCHEDULE_PART_FIELDS,
+    RETRY_POLICIES,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    CIRCUIT_RESET_MAX,
+    PENDING_WRITE_TIMEOUT,
+    TOKEN_REFRESH_MARGIN,
+    READ_RATE_LIMIT,
+    WRITE_RATE_LIMIT,
+    RATE_LIMIT_BACKOFF,
+)
 
 logger = logging.getLogger('daikinskyport')
 
+# orjson decodes a full deviceData body several times faster than json
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Only the blocking client uses requests, it is imported by _import_requests so the
+# asyncio client never loads it and urllib3
+requests = None
+RequestException = None
+HTTPAdapter = None
+
+
+def _import_requests():
+    global requests, RequestException, HTTPAdapter
+    if requests is None:
+        import requests as _requests
+        from requests.adapters import HTTPAdapter
+        from requests.exceptions import RequestException
+        requests = _requests
+
 NEXT_SCHEDULE = 1
 
+# Sensors whose value depends on more than their own deviceData key
+SENSOR_EXTRA_KEYS = {
+    "ctIndoorPower": ("equipmentStatus",),
+}
+
+_MISSING = object()
+
+# Fetch result of a device the API could not be reached for, as opposed to None for a
+# device the API reported offline.  Only the latter counts against the device
+_UNREACHED = object()
+
+FAULT_SENSORS = (
+    ("ctAHCriticalFault", "Air Handler Critical Fault"),
+    ("ctAHMinorFault", "Air Handler Minor Fault"),
+    ("ctEEVCoilCriticalFault", "EEV Coil Critical Fault"),
+    ("ctEEVCoilMinorFault", "EEV Coil Minor Fault"),
+    ("ctIFCCriticalFault", "Indoor Furnace Critical Fault"),
+    ("ctIFCMinorFault", "Indoor Furnace Minor Fault"),
+    ("ctOutdoorCriticalFault", "Outdoor Critical Fault"),
+    ("ctOutdoorMinorFault", "Outdoor Minor Fault"),
+    ("ctStatCriticalFault", "Thermostat Critical Fault"),
+    ("ctStatMinorFault", "Thermostat Minor Fault"),
+)
+
+# Body sent after a fan mode change to return the P1P2 field settings to idle
+P1P2_RESET_BODY = {
+    "P1P2FieldSettingModeNumber": 0,
+    "P1P2FieldSettingUnitNumChangeRequest": False,
+    "P1P2SentFieldSettingSW3": 15,
+    "P1P2SentFieldSettingSW6": 15
+}
+
+def _compile_projection(projection):
+    ''' Split deviceData key names into a set of exact keys and a tuple of "prefix*" prefixes '''
+    if projection is None:
+        return None
+    keys = frozenset(key for key in projection if not key.endswith('*'))
+    prefixes = tuple(key[:-1] for key in projection if key.endswith('*'))
+    return keys, prefixes
+
 class ExpiredTokenError(Exception):
     """Raised when Daikin Skyport API returns a code indicating expired credentials."""
 
     pass
 
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+    pass
+
+class RetryPolicy(object):
+    ''' Retry and timeout settings for one kind of API call '''
+
+    __slots__ = ('attempts', 'timeout', 'deadline', 'backoff_base', 'backoff_max')
+
+    def __init__(self, attempts, timeout, deadline,
+                 backoff_base=RETRY_BACKOFF_BASE, backoff_max=RETRY_BACKOFF_MAX):
+        self.attempts = attempts
+        self.timeout = timeout
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, retry):
+        ''' Full-jitter delay before the given retry, 1 being the first '''
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+class DeviceHealth(object):
+    ''' Poll history of one device.  After the API reports it offline the device
+    is left alone for an exponentially growing delay, from OFFLINE_BACKOFF_BASE up to
+    OFFLINE_BACKOFF_MAX seconds.  The last good snapshot stays in self.thermostats and
+    last_success tells how old it is '''
+
+    __slots__ = ('failures', 'last_success', 'last_failure', 'retry_at')
+
+    def __init__(self):
+        self.failures = 0
+        # Wall clock times
+        self.last_success = None
+        self.last_failure = None
+        # Monotonic time before which the device is not polled
+        self.retry_at = 0.0
+
+    def record_success(self, now):
+        self.failures = 0
+        self.last_success = now
+        self.retry_at = 0.0
+
+    def record_failure(self, now):
+        ''' Count a failed fetch and return the seconds until the device is tried again '''
+        self.failures += 1
+        self.last_failure = now
+        delay = min(OFFLINE_BACKOFF_MAX, OFFLINE_BACKOFF_BASE * 2 ** (self.failures - 1))
+        self.retry_at = time.monotonic() + delay
+        return delay
+
+    def backing_off(self, now=None):
+        return self.retry_at > (time.monotonic() if now is None else now)
+
+class CircuitBreaker(object):
+    ''' Fail fast while the Skyport API is unreachable.
+
+    After failure_threshold consecutive failed requests the circuit opens and requests raise
+    CircuitOpenError without touching the network.  Once the reset timeout has passed a single
+    probe request is let through: success closes the circuit, failure reopens it and doubles the
+    timeout up to reset_max '''
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=CIRCUIT_RESET_TIMEOUT, reset_max=CIRCUIT_RESET_MAX):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset_max = reset_max
+        self.failures = 0
+        self.opened_at = None
+        self._timeout = reset_timeout
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_request(self):
+        ''' Raise CircuitOpenError unless a request may be sent now.
+        Returns True if the request is the recovery probe '''
+        if self.opened_at is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self.opened_at < self._timeout:
+                raise CircuitOpenError("Daikin Skyport API unavailable, next attempt in %.0fs"
+                                       % (self._timeout - (now - self.opened_at)))
+            # A probe that never reported back is given up on after one timeout
+            if self._probe_started is not None and now - self._probe_started < self._timeout:
+                raise CircuitOpenError("Daikin Skyport API recovery probe in progress")
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        if self.failures == 0 and self.opened_at is None:
+            return
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info("Daikin Skyport API is reachable again")
+            self.failures = 0
+            self.opened_at = None
+            self._probe_started = None
+            self._timeout = self.reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probe_started is not None:
+                self._timeout = min(self._timeout * 2, self.reset_max)
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+            elif self.opened_at is None and self.failures >= self.failure_threshold:
+                logger.warn("Daikin Skyport API is failing, pausing requests for %ss", self._timeout)
+                self.opened_at = time.monotonic()
+
+class TokenBucket(object):
+    ''' Token bucket handing out reservations: a caller takes a token and waits the returned time '''
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+class RateLimiter(object):
+    ''' Request budget for one Skyport account, shared by every client in the process.
+
+    Reads and writes draw from separate token buckets.  A read that arrives while writes are
+    queued is scheduled after them, and a 429 from the API pauses every request in the
+    process until its Retry-After has passed '''
+
+    # Set by the last 429, shared by all accounts
+    _throttled_until = 0.0
+
+    def __init__(self, read_rate=READ_RATE_LIMIT[0], read_burst=READ_RATE_LIMIT[1],
+                 write_rate=WRITE_RATE_LIMIT[0], write_burst=WRITE_RATE_LIMIT[1]):
+        self._read = TokenBucket(read_rate, read_burst)
+        self._write = TokenBucket(write_rate, write_burst)
+        self._writes_clear_at = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, write):
+        ''' Take a read or write token and return the seconds to wait before sending '''
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, RateLimiter._throttled_until)
+            if write:
+                start = max(start, now + self._write.reserve(now))
+                self._writes_clear_at = max(self._writes_clear_at, start)
+            else:
+                start = max(start, now + self._read.reserve(now), self._writes_clear_at)
+            return start - now
+
+    @classmethod
+    def throttle(cls, seconds):
+        ''' Hold back every request in the process for the given number of seconds '''
+        cls._throttled_until = max(cls._throttled_until, time.monotonic() + seconds)
+
+_rate_limiters = dict()
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(account):
+    ''' Return the process-wide RateLimiter for an account, creating it on first use '''
+    key = (account or '').lower()
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = _rate_limiters[key] = RateLimiter()
+        return limiter
+
+def _retry_after(value):
+    ''' Seconds to wait from a Retry-After header, given either in seconds or as an HTTP date '''
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return RATE_LIMIT_BACKOFF
+
+class _WriteBuffer(object):
+    ''' Request bodies waiting to be sent to one device in a single PUT '''
+
+    __slots__ = ('body', 'actions', 'future')
+
+    def __init__(self, future):
+        self.body = dict()
+        self.actions = list()
+        self.future = future
+
+    def merge(self, body, log_msg_action):
+        ''' Add a body to the buffer, later values win for the same key '''
+        self.body.update(body)
+        self.actions.append(log_msg_action)
+
+    @property
+    def log_msg_action(self):
+        return ", ".join(self.actions)
+
 def config_from_file(filename, config=None):
     ''' Small configuration file management function'''
     if config:
@@ -47,11 +350,56 @@ def config_from_file(filename, config=None):
 class DaikinSkyport(object):
     ''' Class for storing Daikin Skyport Thermostats and Sensors '''
 
-    def __init__(self, config_filename=None, user_email=None, user_password=None, config=None):
+    def __init__(self, config_filename=None, user_email=None, user_password=None, config=None,
+                 pool_size=DEFAULT_POOL_SIZE, max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 retry_policies=None, circuit_breaker=None, rate_limiter=None,
+                 projection=None):
         self.thermostats = list()
         self.thermostatlist = list()
         self.authenticated = False
-        self.skip_next = False
+        self._pending_writes = dict()
+        self.max_concurrent_requests = max_concurrent_requests
+        # Fetches deviceData for the blocking client, started on the first poll
+        self._executor = None
+        # Incremented on every poll and write, used to tell entities which keys changed
+        self.generation = 0
+        self.changed_keys = dict()
+        self._key_generations = dict()
+        self._device_generations = dict()
+        # Compiled WeeklySchedule per device id, dropped when a sched* key changes
+        self._schedules = dict()
+        self._payload_hashes = dict()
+        self._sensor_indexes = dict()
+        self._transactions = dict()
+        # deviceData keys to keep, see _compile_projection.  None keeps every key
+        self._projection = _compile_projection(projection)
+        self._key_sets = dict()
+        self._schemas = dict()
+        # Key sets and schemas are shared by every device reporting the same keys
+        self._shared_key_sets = dict()
+        self.key_set_changes = 0
+        self._token_lock = threading.Lock()
+        # Called with no arguments whenever the tokens change, e.g. to persist them
+        self.token_callback = None
+        # Called with the device id after a write is sent, e.g. to poll that device sooner
+        self.write_callback = None
+        # DeviceHealth by device id
+        self.health = dict()
+        # Devices asked for in the last poll, True for those whose deviceData came back,
+        # False for offline ones and None where the API itself could not be reached
+        self.poll_results = dict()
+        self._device_list_due = 0.0
+        # Armed P1P2 reset timers by device id
+        self._reset_timers = dict()
+        # The blocking client sends P1P2 resets from timer threads.  This guards the pending
+        # writes, transactions, reset timers and thermostat list they share with the caller
+        self._state_lock = threading.RLock()
+        # RetryPolicy per kind of call: "get", "put" and "auth"
+        self.retry_policies = {kind: RetryPolicy(*settings) for kind, settings in RETRY_POLICIES.items()}
+        if retry_policies is not None:
+            self.retry_policies.update(retry_policies)
+        self.circuit = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+        self._session = self._create_session(pool_size)
 
         if config is None:
             self.file_based_config = True
@@ -81,275 +429,688 @@ class DaikinSkyport(object):
             self.refresh_token = config['REFRESH_TOKEN']
         else:
             self.refresh_token = ''
+
+        # Shared with every other client for the same account unless one is passed in
+        if rate_limiter is None:
+            rate_limiter = get_rate_limiter(config.get('EMAIL'))
+        self.rate_limiter = rate_limiter
+
+        # Wall clock time the access token expires at, None when unknown
+        self.access_token_expires = config.get('ACCESS_TOKEN_EXPIRES')
+
+        # BASE_URL or the DAIKINSKYPORT_API_URL environment variable point the client at
+        # another server, e.g. the local stand-in used for load testing
+        self.base_url = (config.get('BASE_URL') or os.environ.get('DAIKINSKYPORT_API_URL')
+                         or API_URL).rstrip('/')
 #            self.request_tokens()
 #            return
 
 #        self.update()
 
+    def _create_session(self, pool_size):
+        ''' Create the keep-alive session shared by all API calls.  Retries are done by _request '''
+        _import_requests()
+        # Errors raised by _request when the API could not be reached
+        self._transport_errors = (RequestException, CircuitOpenError)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        http = requests.Session()
+        http.mount("https://", adapter)
+        http.mount("http://", adapter)
+        return http
+
+    def _request(self, kind, method, url, **kwargs):
+        ''' Send a request under the circuit breaker and the retry policy for its kind.
+        Connection errors, timeouts and 5xx responses are retried with full-jitter backoff
+        until the policy runs out of attempts or its deadline passes.  Every attempt waits
+        for the rate limiter first, and a 429 is retried once its Retry-After has passed '''
+        policy = self.retry_policies[kind]
+        # A recovery probe gets a single attempt
+        attempts = 1 if self.circuit.before_request() else policy.attempts
+        deadline = None
+        retry = 0
+        throttle = None
+        while True:
+            wait = self.rate_limiter.reserve(kind != 'get')
+            if wait > 0:
+                sleep(wait)
+            if deadline is None:
+                # Time spent queued behind the rate limiter does not count against the deadline
+                deadline = time.monotonic() + policy.deadline
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # The rate limiter held the retry past the deadline
+                if throttle is None:
+                    self.circuit.record_failure()
+                raise requests.Timeout("Deadline of %ss passed before %s %s was retried"
+                                       % (policy.deadline, method, url))
+            timeout = min(policy.timeout, remaining)
+            throttle = None
+            try:
+                response = self._session.request(method, url, timeout=timeout, **kwargs)
+                if response.status_code == 429:
+                    throttle = _retry_after(response.headers.get('Retry-After'))
+                    self.rate_limiter.throttle(throttle)
+                    self.circuit.record_success()
+                if response.status_code >= 500 or throttle is not None:
+                    response.raise_for_status()
+            except RequestException as e:
+                retry += 1
+                delay = policy.backoff(retry) if throttle is None else throttle
+                if retry >= attempts or time.monotonic() + delay >= deadline:
+                    if throttle is None:
+                        self.circuit.record_failure()
+                    raise
+                logger.debug("Retrying %s %s in %.2fs: %s", method, url, delay, repr(e))
+                if throttle is None:
+                    sleep(delay)
+            else:
+                self.circuit.record_success()
+                return response
+
+
+    def close(self):
+        ''' Cancel pending P1P2 resets and close the pooled connections '''
+        self.cancel_delayed_resets()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._session.close()
+
     def request_tokens(self):
         ''' Method to request API tokens from skyport '''
-        url = 'https://api.daikinskyport.com/users/auth/login'
+        url = self.base_url + '/users/auth/login'
         header = {'Accept': 'application/json',
                   'Content-Type': 'application/json'}
         data = {"email": self.user_email, "password": self.user_password}
         try:
-            request = requests.post(url, headers=header, json=data)
-        except RequestException as e:
+            request = self._request('auth', 'POST', url, headers=header, json=data)
+        except self._transport_errors as e:
             logger.error("Error connecting to Daikin Skyport.  Possible connectivity outage."
                         "Could not request token. %s", e)
             return False
-        if request.status_code == requests.codes.ok:
-            json_data = request.json()
-            self.access_token = json_data['accessToken']
-            self.refresh_token = json_data['refreshToken']
-            if self.refresh_token is None:
-                logger.error("Auth did not return a refresh token.")
-            else:
-                if self.file_based_config:
-                    self.write_tokens_to_file()
-                return json_data
+        if request.status_code == 200:
+            return self._store_tokens(request.json())
         else:
             logger.error('Error while requesting tokens from daikinskyport.com.'
                         ' Status code: %s Message: %s', request.status_code, request.text)
             return False
 
-    def refresh_tokens(self):
+    def refresh_tokens(self, stale_token=None):
+        ''' Refresh the API tokens.  Concurrent callers share a single refresh, and a caller
+        that passes the token it found expired returns at once if it has already been replaced '''
+        with self._token_lock:
+            if stale_token is not None and stale_token != self.access_token:
+                return True
+            return self._refresh_tokens()
+
+    def ensure_token(self):
+        ''' Refresh the access token if it is missing or about to expire '''
+        if self.token_expiring():
+            self.refresh_tokens(stale_token=self.access_token)
+
+    def _refresh_tokens(self):
         ''' Method to refresh API tokens from daikinskyport.com '''
-        url = 'https://api.daikinskyport.com/users/auth/token'
+        url = self.base_url + '/users/auth/token'
         header = {'Accept': 'application/json',
                   'Content-Type': 'application/json'}
         data = {'email': self.user_email,
                   'refreshToken': self.refresh_token}
-        request = requests.post(url, headers=header, json=data)
-        if request.status_code == requests.codes.ok:
-            json_data = request.json()
-            self.access_token = json_data['accessToken']
-            if self.file_based_config:
-                self.write_tokens_to_file()
+        try:
+            request = self._request('auth', 'POST', url, headers=header, json=data)
+        except self._transport_errors as e:
+            logger.warn("Error connecting to Daikin Skyport.  Could not refresh tokens. %s", e)
+            return False
+        if request.status_code == 200:
+            self._store_access_token(request.json())
             return True
         else:
             logger.warn("Could not refresh tokens, Trying to re-request. Status code: %s Message: %s ", request.status_code, request.text)
             result = self.request_tokens()
-            if result is not None:
+            if result:
                 return True
             return False
 
-    def get_thermostats(self):
-        ''' Set self.thermostats to a json list of thermostats from daikinskyport.com '''
-        url = 'https://api.daikinskyport.com/devices'
-        header = {'Content-Type': 'application/json;charset=UTF-8',
-                  'Authorization': 'Bearer ' + self.access_token}
-        retry_strategy = Retry(total=8, backoff_factor=0.1)
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        http = requests.Session()
-        http.mount("https://", adapter)
-        http.mount("http://", adapter)
-
-        try:
-            request = http.get(url, headers=header)
-        except RequestException as e:
-            logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
-            return None
-        if request.status_code == requests.codes.ok:
+    def get_thermostats(self, deviceids=None):
+        ''' Set self.thermostats to a json list of thermostats from daikinskyport.com.
+        deviceids limits the poll to those devices, the /devices listing is then only
+        fetched every DEVICE_LIST_INTERVAL '''
+        self.poll_results = dict()
+        self.ensure_token()
+        if self._device_list_stale(deviceids):
+            url = self.base_url + '/devices'
+            header = {'Content-Type': 'application/json;charset=UTF-8',
+                      'Authorization': 'Bearer ' + self.access_token}
+            try:
+                request = self._request('get', 'GET', url, headers=header)
+            except CircuitOpenError as e:
+                logger.debug("Keeping the cached thermostat data: %s", e)
+                return self.thermostats
+            except RequestException as e:
+                logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
+                return None
+            if request.status_code != 200:
+                self.authenticated = False
+                logger.debug("Error connecting to Daikin Skyport while attempting to get "
+                            "thermostat data. Status code: %s Message: %s", request.status_code, request.text)
+                raise ExpiredTokenError ("Daikin Skyport token expired")
             self.authenticated = True
-            self.thermostatlist = request.json()
-            
-            for thermostat in self.thermostatlist:
-                overwrite = False
-                thermostat_info = self.get_thermostat_info(thermostat['id'])
-                if thermostat_info == None:
-                    continue
-                
-                thermostat_info['name'] = thermostat['name']
-                thermostat_info['id'] = thermostat['id']
-                thermostat_info['model'] = thermostat['model']
-                
-                for index in range(len(self.thermostats)):
-                    if thermostat['id'] == self.thermostats[index]['id']:
-                        overwrite = True
-                        
-                        if 'delayed_reset_timestamp' in self.thermostats[index]:
-                            thermostat_info['delayed_reset_timestamp'] = self.thermostats[index]['delayed_reset_timestamp']
-                        
-                        self.thermostats[index] = thermostat_info
-                if not overwrite:
-                    thermostat_info['delayed_reset_timestamp'] = None
-                    self.thermostats.append(thermostat_info)
-
-            return self.thermostats
-        else:
-            self.authenticated = False
-            logger.debug("Error connecting to Daikin Skyport while attempting to get "
-                        "thermostat data. Status code: %s Message: %s", request.status_code, request.text)
-            raise ExpiredTokenError ("Daikin Skyport token expired")
+            self._store_device_list(request.json())
+
+        requested = self._poll_targets(deviceids)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests,
+                                                thread_name_prefix='daikinskyport')
+
+        def fetch(deviceid):
+            try:
+                return self._fetch_thermostat_info(deviceid)
+            except self._transport_errors as e:
+                logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
+                return _UNREACHED
+
+        futures = {deviceid: self._executor.submit(fetch, deviceid) for deviceid in requested}
+        done, not_done = wait(futures.values(), return_when=FIRST_EXCEPTION)
+        # Anything else, e.g. an expired token, fails the whole poll.  Fetches that
+        # have not started yet are dropped rather than sent with the same token
+        for future in not_done:
+            future.cancel()
+        for future in done:
+            future.result()
+        fetched = {deviceid: future.result() for deviceid, future in futures.items()}
+        with self._state_lock:
+            self._store_thermostats([fetched.get(thermostat['id']) for thermostat in self.thermostatlist],
+                                    requested)
+
+        return self.thermostats
+
+    def _device_list_stale(self, deviceids):
+        ''' True if the poll has to start with the /devices listing '''
+        return (deviceids is None or not self.thermostatlist
+                or time.monotonic() >= self._device_list_due)
+
+    def _store_device_list(self, thermostatlist):
+        self.thermostatlist = thermostatlist
+        self._device_list_due = time.monotonic() + DEVICE_LIST_INTERVAL
+
+    def _poll_targets(self, deviceids):
+        ''' Ids of the listed devices to fetch deviceData for, all of them if deviceids is None.
+        Devices backing off after failed fetches are left out '''
+        now = time.monotonic()
+        health = self.health
+        return [thermostat['id'] for thermostat in self.thermostatlist
+                if (deviceids is None or thermostat['id'] in deviceids)
+                and not (thermostat['id'] in health and health[thermostat['id']].backing_off(now))]
+
+    def last_success(self, index):
+        ''' Wall clock time the deviceData of the thermostat at index last came back, None if never '''
+        health = self.health.get(self.thermostats[index]['id'])
+        return None if health is None else health.last_success
+
+    def data_age(self, index):
+        ''' Seconds since the deviceData of the thermostat at index last came back, None if never '''
+        last_success = self.last_success(index)
+        if last_success is None:
             return None
+        return time.time() - last_success
+
+    def retry_in(self, deviceid):
+        ''' Seconds until a device that failed to answer is polled again, 0 if it is not backing off '''
+        health = self.health.get(deviceid)
+        if health is None:
+            return 0
+        return max(0, health.retry_at - time.monotonic())
+
+    def export_cache(self):
+        ''' The device list and snapshots as plain JSON data for restore_cache.
+        Devices reporting the same keys share one key list, each snapshot is its value list
+        plus the wall clock time its deviceData last came back '''
+        schemas = dict()
+        thermostats = list()
+        for thermostat in self.thermostats:
+            keys, values, extra = thermostat.compact()
+            health = self.health.get(thermostat['id'])
+            thermostats.append([schemas.setdefault(keys, len(schemas)), values, extra,
+                                None if health is None else health.last_success])
+        return {'devices': self.thermostatlist,
+                'schemas': [list(keys) for keys in schemas],
+                'thermostats': thermostats}
+
+    def restore_cache(self, cache):
+        ''' Start from what export_cache returned, e.g. to show the last known state before the
+        first poll.  The next poll fetches everything again.  Returns False if cache is unusable '''
+        try:
+            schemas = [Schema.for_keys(keys) for keys in cache['schemas']]
+            thermostats = list()
+            health = dict()
+            for schema_index, values, extra, last_success in cache['thermostats']:
+                schema = schemas[schema_index]
+                if len(values) != len(schema):
+                    raise ValueError("value count does not match the keys")
+                thermostat = Snapshot(schema, values, extra)
+                if last_success is not None:
+                    health[thermostat['id']] = DeviceHealth()
+                    health[thermostat['id']].last_success = last_success
+                thermostats.append(thermostat)
+            thermostatlist = list(cache['devices'])
+        except (KeyError, IndexError, TypeError, ValueError) as err:
+            logger.warning("Ignoring unusable Daikin Skyport cache: %s", err)
+            return False
+        if not thermostats:
+            return False
+        self.thermostatlist = thermostatlist
+        self.thermostats = thermostats
+        self.health.update(health)
+        # The listing is fetched again by the first poll
+        self._device_list_due = 0.0
+        return True
 
     def get_thermostat_info(self, deviceid):
         ''' Retrieve the device info for the specific device '''
-        url = 'https://api.daikinskyport.com/deviceData/' + deviceid
+        payload = self._fetch_thermostat_info(deviceid)
+        if payload is None:
+            return None
+        return _json_loads(payload)
+
+    def _fetch_thermostat_info(self, deviceid):
+        ''' Retrieve the raw deviceData body for the specific device '''
+        url = self.base_url + '/deviceData/' + deviceid
         header = {'Content-Type': 'application/json;charset=UTF-8',
                   'Authorization': 'Bearer ' + self.access_token}
-        retry_strategy = Retry(total=8, backoff_factor=0.1)
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        http = requests.Session()
-        http.mount("https://", adapter)
-        http.mount("http://", adapter)
+        request = self._request('get', 'GET', url, headers=header)
+        if request.status_code == 200:
+            self.authenticated = True
+            return request.content
+        if request.status_code == 400 and "DeviceOfflineException" in request.text:
+            logger.warn("Device is offline: %s", deviceid)
+            self.authenticated = True
+            return None
+        self.authenticated = False
+        logger.debug("Error connecting to Daikin Skyport while attempting to get "
+                    "thermostat data. Status code: %s Message: %s", request.status_code, request.text)
+        raise ExpiredTokenError ("Daikin Skyport token expired")
 
-        try:
-            request = http.get(url, headers=header)
-            request.raise_for_status()
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 400 and e.response.json().get("message") == "DeviceOfflineException":
-                logger.warn("Device is offline: %s", deviceid)
-                self.authenticated = True
-                return None
-            else:
-                self.authenticated = False
-            logger.debug("Error connecting to Daikin Skyport while attempting to get "
-                        "thermostat data. Status code: %s Message: %s", request.status_code, request.text)
-            raise ExpiredTokenError ("Daikin Skyport token expired")
+
+    def _store_tokens(self, json_data):
+        ''' Save the tokens returned by a login request '''
+        self.access_token = json_data['accessToken']
+        self.refresh_token = json_data['refreshToken']
+        self._store_token_expiry(json_data)
+        if self.refresh_token is None:
+            logger.error("Auth did not return a refresh token.")
             return None
-        if request.status_code == requests.codes.ok:
-            self.authenticated = True
-            return request.json()
+        self._tokens_updated()
+        return json_data
+
+    def _store_access_token(self, json_data):
+        ''' Save the access token returned by a token refresh '''
+        self.access_token = json_data['accessToken']
+        if json_data.get('refreshToken'):
+            self.refresh_token = json_data['refreshToken']
+        self._store_token_expiry(json_data)
+        self._tokens_updated()
+
+    def _store_token_expiry(self, json_data):
+        ''' Work out when the new access token expires from accessTokenExpiresIn '''
+        expires_in = json_data.get('accessTokenExpiresIn')
+        if expires_in:
+            self.access_token_expires = time.time() + expires_in
         else:
-            self.authenticated = False
-            logger.debug("Error connecting to Daikin Skyport while attempting to get "
-                        "thermostat data. Status code: %s Message: %s", request.status_code, request.text)
-            raise ExpiredTokenError ("Daikin Skyport token expired")
-            return None
+            self.access_token_expires = None
+
+    def _tokens_updated(self):
+        if self.file_based_config:
+            self.write_tokens_to_file()
+        if self.token_callback is not None:
+            self.token_callback()
+
+    def token_expiring(self):
+        ''' True if the access token is missing or within TOKEN_REFRESH_MARGIN of expiring '''
+        if not self.access_token:
+            return True
+        if self.access_token_expires is None:
+            return False
+        return time.time() >= self.access_token_expires - TOKEN_REFRESH_MARGIN
+
+    def _store_thermostats(self, results, requested=None):
+        ''' Merge the raw deviceData bodies for self.thermostatlist in one pass.
+        results is in the same order as self.thermostatlist, None for devices that were not fetched
+        or are offline and _UNREACHED where the request failed on the way.  requested holds the ids
+        the poll asked for, None if it asked for every device.  Only offline devices count towards
+        their DeviceHealth backoff, outages of the API are left to the circuit breaker '''
+        self.generation += 1
+        self.changed_keys = dict()
+        self.poll_results = dict()
+        if requested is not None:
+            requested = set(requested)
+        now = time.time()
+        for thermostat, payload in zip(self.thermostatlist, results):
+            deviceid = thermostat['id']
+            if payload is _UNREACHED:
+                self.poll_results[deviceid] = None
+                continue
+            if requested is None or deviceid in requested:
+                self.poll_results[deviceid] = payload is not None
+                self._record_health(deviceid, payload is not None, now)
+            if payload is None:
+                continue
+            self._store_thermostat(thermostat, payload)
+
+    def _record_health(self, deviceid, success, now):
+        health = self.health.get(deviceid)
+        if health is None:
+            health = self.health[deviceid] = DeviceHealth()
+        if success:
+            if health.failures:
+                logger.info("Device %s is answering again after %d failed polls", deviceid, health.failures)
+            health.record_success(now)
+            return
+        delay = health.record_failure(now)
+        logger.info("Device %s did not answer %d time(s), keeping its last data, next poll in %.0fs",
+                    deviceid, health.failures, delay)
+
+    def _store_thermostat(self, thermostat, payload):
+        ''' Diff a raw deviceData body against the previous snapshot and merge it into self.thermostats '''
+        deviceid = thermostat['id']
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        index = self._get_index(deviceid)
+
+        if (index is not None and self._payload_hashes.get(deviceid) == digest
+                and not self._pending_writes.get(deviceid)):
+            # Same body as last time, only the /devices fields can have changed
+            previous = self.thermostats[index]
+            changed = {key for key in ('name', 'model') if previous[key] != thermostat[key]}
+            for key in changed:
+                previous[key] = thermostat[key]
+        else:
+            thermostat_info = self._decode(deviceid, payload)
+            thermostat_info['name'] = thermostat['name']
+            thermostat_info['id'] = deviceid
+            thermostat_info['model'] = thermostat['model']
+            self._apply_pending(deviceid, thermostat_info)
+            if index is None:
+                self.thermostats.append(thermostat_info)
+                changed = set(thermostat_info)
+            else:
+                previous = self.thermostats[index]
+                changed = thermostat_info.changed_keys(previous)
+                self.thermostats[index] = thermostat_info
+            self._payload_hashes[deviceid] = digest
+
+        self.changed_keys[deviceid] = changed
+        self._mark_changed(deviceid, changed)
+
+    def _decode(self, deviceid, payload):
+        ''' Decode a deviceData body into a Snapshot of the projected keys '''
+        data = _json_loads(payload)
+        key_set = self._key_sets.get(deviceid)
+        # len() settles almost every poll, the set compare runs in C otherwise
+        if key_set is None or len(key_set) != len(data) or data.keys() != key_set:
+            self._key_set_changed(deviceid, key_set, data)
+        return Snapshot.from_dict(self._schemas[deviceid], data)
+
+    def _key_set_changed(self, deviceid, previous, data):
+        ''' Remember the keys a device reports and work out which of them to keep '''
+        key_set = frozenset(data)
+        key_set, schema = self._shared_key_sets.setdefault(key_set, (key_set, None))
+        if previous is not None:
+            self.key_set_changes += 1
+            logger.info("deviceData keys changed for %s, added: %s removed: %s", deviceid,
+                        sorted(key_set - previous), sorted(previous - key_set))
+        if schema is None:
+            if self._projection is None:
+                schema = Schema.for_keys(data)
+            else:
+                keys, prefixes = self._projection
+                schema = Schema.for_keys(key for key in data if key in keys or key.startswith(prefixes))
+            self._shared_key_sets[key_set] = (key_set, schema)
+        self._key_sets[deviceid] = key_set
+        self._schemas[deviceid] = schema
+
+    def _mark_changed(self, deviceid, keys):
+        ''' Record that keys of a device changed in the current generation '''
+        generations = self._key_generations.setdefault(deviceid, dict())
+        for key in keys:
+            generations[key] = self.generation
+        if keys:
+            self._device_generations[deviceid] = self.generation
+            if deviceid in self._schedules and any(
+                    key.startswith('sched') or key == 'timeZone' for key in keys):
+                del self._schedules[deviceid]
+
+    def _note_write(self, deviceid, body, notify=True):
+        ''' Flag the keys written to a device as changed and hold the written values
+        over the polled data until a poll confirms them or PENDING_WRITE_TIMEOUT passes.
+        notify is False for writes the user did not ask for, they do not call write_callback '''
+        self.generation += 1
+        self._payload_hashes.pop(deviceid, None)
+        self._mark_changed(deviceid, body.keys())
+        deadline = time.monotonic() + PENDING_WRITE_TIMEOUT
+        pending = self._pending_writes.setdefault(deviceid, dict())
+        for key, value in body.items():
+            pending[key] = (value, deadline)
+        if notify and self.write_callback is not None:
+            self.write_callback(deviceid)
+
+    def _discard_pending(self, deviceid, body):
+        ''' Drop the overlay for a write that did not reach the API so the next poll wins '''
+        pending = self._pending_writes.get(deviceid)
+        if not pending:
+            return
+        self._payload_hashes.pop(deviceid, None)
+        for key, value in body.items():
+            if key in pending and pending[key][0] == value:
+                del pending[key]
+
+    def _apply_pending(self, deviceid, thermostat_info):
+        ''' Layer the pending writes for a device over freshly polled data.
+        Values the poll confirms, and values older than PENDING_WRITE_TIMEOUT, are retired '''
+        pending = self._pending_writes.get(deviceid)
+        if not pending:
+            return
+        now = time.monotonic()
+        for key, (value, deadline) in list(pending.items()):
+            if thermostat_info.get(key, _MISSING) == value or now >= deadline:
+                del pending[key]
+            else:
+                thermostat_info[key] = value
+
+    def _get_index(self, deviceid):
+        ''' Return the index in self.thermostats of a device id, None if it is not known '''
+        for index, thermostat in enumerate(self.thermostats):
+            if thermostat['id'] == deviceid:
+                return index
+        return None
+
+    def keys_changed_since(self, index, keys, generation):
+        ''' Return True if any of keys changed for the thermostat at index after generation '''
+        generations = self._key_generations.get(self.thermostats[index]['id'], {})
+        return any(generations.get(key, 0) > generation for key in keys)
+
+    def get_sensor_keys(self, key):
+        ''' Return the deviceData keys a sensor value is derived from '''
+        return (key,) + SENSOR_EXTRA_KEYS.get(key, ())
 
     def get_thermostat(self, index):
         ''' Return a single thermostat based on index '''
         return self.thermostats[index]
 
+    def get_schedule(self, index):
+        ''' Return the compiled WeeklySchedule of the thermostat at index.
+        It is rebuilt only after one of the sched* keys changed '''
+        thermostat = self.thermostats[index]
+        schedule = self._schedules.get(thermostat['id'])
+        if schedule is None:
+            schedule = self._schedules[thermostat['id']] = WeeklySchedule.from_thermostat(thermostat)
+        return schedule
+
     def get_sensors(self, index):
         ''' Return sensors based on index '''
         sensors = list()
         thermostat = self.thermostats[index]
         name = thermostat['name']
-        sensors.append({"name": f"{name} Outdoor", "value": thermostat['tempOutdoor'], "type": "temperature"})
-        sensors.append({"name": f"{name} Outdoor", "value": thermostat['humOutdoor'], "type": "humidity"})
+        sensors.append({"name": f"{name} Outdoor", "value": thermostat['tempOutdoor'], "type": "temperature", "key": "tempOutdoor"})
+        sensors.append({"name": f"{name} Outdoor", "value": thermostat['humOutdoor'], "type": "humidity", "key": "humOutdoor"})
         if "ctOutdoorFanRequestedDemandPercentage" in thermostat:
-            sensors.append({"name": f"{name} Outdoor fan", "value": round(thermostat['ctOutdoorFanRequestedDemandPercentage'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Outdoor fan", "value": round(thermostat['ctOutdoorFanRequestedDemandPercentage'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctOutdoorFanRequestedDemandPercentage"})
         if "ctOutdoorHeatRequestedDemand" in thermostat:
-            sensors.append({"name": f"{name} Outdoor heat pump", "value": round(thermostat['ctOutdoorHeatRequestedDemand'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Outdoor heat pump", "value": round(thermostat['ctOutdoorHeatRequestedDemand'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctOutdoorHeatRequestedDemand"})
         if "ctOutdoorCoolRequestedDemand" in thermostat:
-            sensors.append({"name": f"{name} Outdoor cooling", "value": round(thermostat['ctOutdoorCoolRequestedDemand'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Outdoor cooling", "value": round(thermostat['ctOutdoorCoolRequestedDemand'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctOutdoorCoolRequestedDemand"})
         if "ctOutdoorPower" in thermostat:
-            sensors.append({"name": f"{name} Outdoor", "value": thermostat['ctOutdoorPower'] * 10, "type": "power"})
+            sensors.append({"name": f"{name} Outdoor", "value": thermostat['ctOutdoorPower'] * 10, "type": "power", "key": "ctOutdoorPower"})
         if "ctOutdoorFrequencyInPercent" in thermostat:
-            sensors.append({"name": f"{name} Outdoor", "value": round(thermostat['ctOutdoorFrequencyInPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "frequency_percent"})
+            sensors.append({"name": f"{name} Outdoor", "value": round(thermostat['ctOutdoorFrequencyInPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "frequency_percent", "key": "ctOutdoorFrequencyInPercent"})
         if "tempIndoor" in thermostat:
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['tempIndoor'], "type": "temperature"})
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['tempIndoor'], "type": "temperature", "key": "tempIndoor"})
         if "humIndoor" in thermostat:
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['humIndoor'], "type": "humidity"})
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['humIndoor'], "type": "humidity", "key": "humIndoor"})
         if "ctIFCFanRequestedDemandPercent" in thermostat:
-            sensors.append({"name": f"{name} Indoor fan", "value": round(thermostat['ctIFCFanRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Indoor fan", "value": round(thermostat['ctIFCFanRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctIFCFanRequestedDemandPercent"})
         if "ctIFCCurrentFanActualStatus" in thermostat:
-            sensors.append({"name": f"{name} Indoor fan", "value": round(thermostat['ctIFCCurrentFanActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status"})
+            sensors.append({"name": f"{name} Indoor fan", "value": round(thermostat['ctIFCCurrentFanActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status", "key": "ctIFCCurrentFanActualStatus"})
         if "ctIFCCoolRequestedDemandPercent" in thermostat:
-            sensors.append({"name": f"{name} Indoor cooling", "value": round(thermostat['ctIFCCoolRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Indoor cooling", "value": round(thermostat['ctIFCCoolRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctIFCCoolRequestedDemandPercent"})
         if "ctIFCCurrentCoolActualStatus" in thermostat:
-            sensors.append({"name": f"{name} Indoor cooling", "value": round(thermostat['ctIFCCurrentCoolActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status"})
+            sensors.append({"name": f"{name} Indoor cooling", "value": round(thermostat['ctIFCCurrentCoolActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status", "key": "ctIFCCurrentCoolActualStatus"})
         if "ctIFCHeatRequestedDemandPercent" in thermostat:
-            sensors.append({"name": f"{name} Indoor furnace", "value": round(thermostat['ctIFCHeatRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Indoor furnace", "value": round(thermostat['ctIFCHeatRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctIFCHeatRequestedDemandPercent"})
         if "ctIFCCurrentHeatActualStatus" in thermostat:
-            sensors.append({"name": f"{name} Indoor furnace", "value": round(thermostat['ctIFCCurrentHeatActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status"})
+            sensors.append({"name": f"{name} Indoor furnace", "value": round(thermostat['ctIFCCurrentHeatActualStatus'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "actual_status", "key": "ctIFCCurrentHeatActualStatus"})
         if "ctIFCHumRequestedDemandPercent" in thermostat:
-            sensors.append({"name": f"{name} Indoor humidifier", "value": round(thermostat['ctIFCHumRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Indoor humidifier", "value": round(thermostat['ctIFCHumRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctIFCHumRequestedDemandPercent"})
         if "ctIFCDehumRequestedDemandPercent" in thermostat:
-            sensors.append({"name": f"{name} Indoor dehumidifier", "value": round(thermostat['ctIFCDehumRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand"})
+            sensors.append({"name": f"{name} Indoor dehumidifier", "value": round(thermostat['ctIFCDehumRequestedDemandPercent'] / DAIKIN_PERCENT_MULTIPLIER, 1), "type": "demand", "key": "ctIFCDehumRequestedDemandPercent"})
         if "ctOutdoorAirTemperature" in thermostat:
-            sensors.append({"name": f"{name} Outdoor air", "value": round(((thermostat['ctOutdoorAirTemperature'] / 10) - 32) * 5 / 9, 1), "type": "temperature"})
+            sensors.append({"name": f"{name} Outdoor air", "value": round(((thermostat['ctOutdoorAirTemperature'] / 10) - 32) * 5 / 9, 1), "type": "temperature", "key": "ctOutdoorAirTemperature"})
         if "ctIFCIndoorBlowerAirflow" in thermostat:
-            sensors.append({"name": f"{name} Indoor furnace blower", "value": thermostat['ctIFCIndoorBlowerAirflow'], "type": "airflow"})
+            sensors.append({"name": f"{name} Indoor furnace blower", "value": thermostat['ctIFCIndoorBlowerAirflow'], "type": "airflow", "key": "ctIFCIndoorBlowerAirflow"})
         if "ctAHCurrentIndoorAirflow" in thermostat:
-            sensors.append({"name": f"{name} Indoor air handler blower", "value": thermostat['ctAHCurrentIndoorAirflow'], "type": "airflow"})
+            sensors.append({"name": f"{name} Indoor air handler blower", "value": thermostat['ctAHCurrentIndoorAirflow'], "type": "airflow", "key": "ctAHCurrentIndoorAirflow"})
 
         ''' if equipment is idle, set power to zero rather than accept bogus data '''
         if thermostat['equipmentStatus'] == 5:
-            sensors.append({"name": f"{name} Indoor", "value": 0, "type": "power"})
+            sensors.append({"name": f"{name} Indoor", "value": 0, "type": "power", "key": "ctIndoorPower"})
         elif "ctIndoorPower" in thermostat:
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['ctIndoorPower'], "type": "power"})
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['ctIndoorPower'], "type": "power", "key": "ctIndoorPower"})
 
 
         if self.thermostats[index]['aqOutdoorAvailable']:
-            sensors.append({"name": f"{name} Outdoor", "value": thermostat['aqOutdoorParticles'], "type": "particle"})
-            sensors.append({"name": f"{name} Outdoor", "value": thermostat['aqOutdoorValue'], "type": "score"})
-            sensors.append({"name": f"{name} Outdoor", "value": round(thermostat['aqOutdoorOzone'] * 1.96), "type": "ozone"})
+            sensors.append({"name": f"{name} Outdoor", "value": thermostat['aqOutdoorParticles'], "type": "particle", "key": "aqOutdoorParticles"})
+            sensors.append({"name": f"{name} Outdoor", "value": thermostat['aqOutdoorValue'], "type": "score", "key": "aqOutdoorValue"})
+            sensors.append({"name": f"{name} Outdoor", "value": round(thermostat['aqOutdoorOzone'] * 1.96), "type": "ozone", "key": "aqOutdoorOzone"})
         if self.thermostats[index]['aqIndoorAvailable']:
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorParticlesValue'], "type": "particle"})
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorValue'], "type": "score"})
-            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorVOCValue'], "type": "VOC"})
-
-        fault_sensors = [
-            ("ctAHCriticalFault", "Air Handler Critical Fault"),
-            ("ctAHMinorFault", "Air Handler Minor Fault"),
-            ("ctEEVCoilCriticalFault", "EEV Coil Critical Fault"),
-            ("ctEEVCoilMinorFault", "EEV Coil Minor Fault"),
-            ("ctIFCCriticalFault", "Indoor Furnace Critical Fault"),
-            ("ctIFCMinorFault", "Indoor Furnace Minor Fault"),
-            ("ctOutdoorCriticalFault", "Outdoor Critical Fault"),
-            ("ctOutdoorMinorFault", "Outdoor Minor Fault"),
-            ("ctStatCriticalFault", "Thermostat Critical Fault"),
-            ("ctStatMinorFault", "Thermostat Minor Fault"),
-        ]
-
-        for fault_key, fault_name in fault_sensors:
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorParticlesValue'], "type": "particle", "key": "aqIndoorParticlesValue"})
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorValue'], "type": "score", "key": "aqIndoorValue"})
+            sensors.append({"name": f"{name} Indoor", "value": thermostat['aqIndoorVOCValue'], "type": "VOC", "key": "aqIndoorVOCValue"})
+
+        for fault_key, fault_name in FAULT_SENSORS:
             if fault_key in thermostat:
-                sensors.append({"name": f"{name} {fault_name}", "value": thermostat[fault_key], "type": "fault_code"})
+                sensors.append({"name": f"{name} {fault_name}", "value": thermostat[fault_key], "type": "fault_code", "key": fault_key})
 
         return sensors
 
+    def get_sensor_index(self, index):
+        ''' Return the sensors of a thermostat keyed by their deviceData key.
+        The index is only rebuilt when the thermostat data has changed since it was last built '''
+        deviceid = self.thermostats[index]['id']
+        generation = self._device_generations.get(deviceid, 0)
+        cached = self._sensor_indexes.get(deviceid)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        sensor_index = {sensor["key"]: sensor for sensor in self.get_sensors(index)}
+        self._sensor_indexes[deviceid] = (generation, sensor_index)
+        return sensor_index
+
     def write_tokens_to_file(self):
         ''' Write api tokens to a file '''
         config = dict()
         config['ACCESS_TOKEN'] = self.access_token
         config['REFRESH_TOKEN'] = self.refresh_token
+        config['ACCESS_TOKEN_EXPIRES'] = self.access_token_expires
         config['EMAIL'] = self.user_email
         if self.file_based_config:
             config_from_file(self.config_filename, config)
         else:
             self.config = config
 
-    def update(self):
-        ''' Get new thermostat data from daikin skyport '''
-        if self.skip_next:
-            logger.debug("Skipping update due to setting change")
-            self.skip_next = False
+    def update(self, deviceids=None):
+        ''' Get new thermostat data from daikin skyport, for every device or only deviceids '''
+        return self.get_thermostats(deviceids)
+
+    @contextmanager
+    def transaction(self, index):
+        ''' Merge every write to the thermostat made inside the block into a single PUT sent on exit.
+        Writes inside the block return a Future that is resolved with the result of that PUT '''
+        deviceID = self.thermostats[index]['id']
+        with self._state_lock:
+            buffer = self._transactions.get(deviceID)
+            if buffer is None:
+                buffer = self._transactions[deviceID] = _WriteBuffer(Future())
+                nested = False
+            else:
+                nested = True
+        if nested:
+            yield buffer.future
             return
-        
-        result = self.get_thermostats()
-        self.check_and_perform_delayed_resets()
+        try:
+            yield buffer.future
+        except BaseException:
+            with self._state_lock:
+                del self._transactions[deviceID]
+                # Nothing is sent, the values written in the block must not stay on display
+                self._discard_pending(deviceID, buffer.body)
+            buffer.future.set_result(None)
+            raise
+        with self._state_lock:
+            del self._transactions[deviceID]
+        result = None
+        try:
+            if buffer.body:
+                result = self._put_device_data(index, buffer.body, buffer.log_msg_action)
+        finally:
+            if result is None:
+                with self._state_lock:
+                    self._discard_pending(deviceID, buffer.body)
+            buffer.future.set_result(result)
+
+    def make_request(self, index, body, log_msg_action):
+        ''' Send a change to the thermostat, or queue it if a transaction is open for it '''
+        deviceID = self.thermostats[index]['id']
+        with self._state_lock:
+            self._note_write(deviceID, body)
+            buffer = self._transactions.get(deviceID)
+            if buffer is not None:
+                buffer.merge(body, log_msg_action)
+                return buffer.future
+        return self._put_device_data(index, body, log_msg_action)
 
+    def _put_device_data(self, index, body, log_msg_action):
+        result = self._send_device_data(index, body, log_msg_action)
+        if result is None:
+            with self._state_lock:
+                self._discard_pending(self.thermostats[index]['id'], body)
         return result
 
-    def make_request(self, index, body, log_msg_action, *, retry_count=0):
-        self.skip_next = True
+    def _send_device_data(self, index, body, log_msg_action, *, retry_count=0):
+        self.ensure_token()
         deviceID = self.thermostats[index]['id']
-        url = 'https://api.daikinskyport.com/deviceData/' + deviceID
+        url = self.base_url + '/deviceData/' + deviceID
+        token = self.access_token
         header = {'Content-Type': 'application/json;charset=UTF-8',
-                  'Authorization': 'Bearer ' + self.access_token}
+                  'Authorization': 'Bearer ' + token}
         logger.debug("Make Request: %s, Device: %s, Body: %s", log_msg_action, deviceID, body)
-        retry_strategy = Retry(total=8, backoff_factor=0.1,)
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        http = requests.Session()
-        http.mount("https://", adapter)
-        http.mount("http://", adapter)
-
         try:
-            request = http.put(url, headers=header, json=body)
-        except RequestException as e:
+            request = self._request('put', 'PUT', url, headers=header, json=body)
+        except self._transport_errors as e:
             logger.warn("Error connecting to Daikin Skyport.  Possible connectivity outage: %s", e)
             return None
-        if request.status_code == requests.codes.ok:
+        if request.status_code == 200:
             return request
         elif (request.status_code == 401 and retry_count == 0 and
               request.json()['error'] == 'authorization_expired'):
-            if self.refresh_tokens():
-                return self.make_request(index, body, log_msg_action,
-                                         retry_count=retry_count + 1)
+            if self.refresh_tokens(stale_token=token):
+                return self._send_device_data(index, body, log_msg_action,
+                                              retry_count=retry_count + 1)
         else:
             logger.warn(
                 "Error fetching data from Daikin Skyport while attempting to %s: %s",
@@ -381,8 +1142,61 @@ class DaikinSkyport(object):
         log_msg_action = "set thermostat schedule"
         return self.make_request(index, body, log_msg_action)
 
-    def set_fan_mode(self, index, fan_mode):
-        ''' Set fan mode. Values: auto (0), schedule (2), on (1) '''
+    def _weekly_schedule_body(self, index, schedule):
+        ''' Build the body for a weekly schedule, holding only the sched* fields that differ
+        from the current snapshot.  The snapshot is only updated once the PUT went through.
+        schedule maps a day (Mon-Sun) to a list of up to 6 parts, each a dict of any of
+        Time, Enabled, Label, hsp and csp.  Fields left out keep their current value '''
+        thermostat = self.thermostats[index]
+        body = dict()
+        for day, parts in schedule.items():
+            if day not in SCHEDULE_DAYS:
+                raise ValueError(f"Invalid weekday: {day}")
+            if len(parts) > SCHEDULE_PARTS:
+                raise ValueError(f"{day} has more than {SCHEDULE_PARTS} schedule parts")
+            for part, fields in enumerate(parts, 1):
+                prefix = f"sched{day}Part{part}"
+                for field, value in fields.items():
+                    if field not in SCHEDULE_PART_FIELDS:
+                        raise ValueError(f"Invalid schedule field: {field}")
+                    key = prefix + field
+                    if key not in thermostat or thermostat[key] != value:
+                        body[key] = value
+        return body
+
+    def set_weekly_schedule(self, index, schedule):
+        ''' Upload a whole weekly schedule in one PUT, see _weekly_schedule_body for the format.
+        Only changed fields are sent, an unchanged schedule returns True without a request '''
+        body = self._weekly_schedule_body(index, schedule)
+        if not body:
+            return True
+        result = self.make_request(index, body, "set weekly schedule")
+        self._apply_after(self.thermostats[index]['id'], body, result)
+        return result
+
+    def _apply_after(self, deviceid, body, result):
+        ''' Copy a written body into the snapshot once its PUT has been accepted.  Inside a
+        transaction result is the future of the PUT sent when the block exits '''
+        def sent(future):
+            if not future.cancelled() and future.result() is not None:
+                self._apply_write(deviceid, body)
+
+        if isinstance(result, self._future_types):
+            result.add_done_callback(sent)
+        elif result is not None:
+            self._apply_write(deviceid, body)
+
+    def _apply_write(self, deviceid, body):
+        with self._state_lock:
+            index = self._get_index(deviceid)
+            if index is None:
+                return
+            self.generation += 1
+            self.thermostats[index].update(body)
+            self._mark_changed(deviceid, body.keys())
+
+    def _fan_mode_body(self, index, fan_mode):
+        ''' Build the request body for a fan mode change '''
 
         # Map fan modes to P1P2 switch values
         FAN_MODE_TO_SW = {0: 2, 1: 1}
@@ -396,44 +1210,72 @@ class DaikinSkyport(object):
             "P1P2SentFieldSettingSW6": switch_value
         }
 
-        log_msg_action = "set fan mode"
         self.thermostats[index]["fanCirculate"] = fan_mode
+        return body
+
+    def set_fan_mode(self, index, fan_mode):
+        ''' Set fan mode. Values: auto (0), schedule (2), on (1) '''
+        body = self._fan_mode_body(index, fan_mode)
+        log_msg_action = "set fan mode"
         
         # Send initial request
         result = self.make_request(index, body, log_msg_action)
         
-        # Send delayed reset request
-        if result and result.status_code == requests.codes.ok:
-            # Mark this thermostat for delayed reset
-            # The coordinator will handle the actual reset after 15 seconds
-            self.thermostats[index]["delayed_reset_timestamp"] = time.time()
-            logger.debug("Fan mode set successfully, marked for delayed reset")
+        # The P1P2 fields are reset P1P2_RESET_DELAY seconds after the change went through
+        self._reset_after(self.thermostats[index]['id'], result)
         
         return result
 
-    def check_and_perform_delayed_resets(self):
-        """Check if any thermostats need delayed resets and perform them."""
-        current_time = time.time()
-        
-        for index, thermostat in enumerate(self.thermostats):
-            if thermostat.get("delayed_reset_timestamp"):
-                # Check if 15 seconds have passed
-                if current_time - thermostat["delayed_reset_timestamp"] >= 15:
-                    logger.debug(f"Performing delayed reset for thermostat {index}")
-                    
-                    # Perform the delayed reset
-                    reset_body = {
-                        "P1P2FieldSettingModeNumber": 0,
-                        "P1P2FieldSettingUnitNumChangeRequest": False,
-                        "P1P2SentFieldSettingSW3": 15,
-                        "P1P2SentFieldSettingSW6": 15
-                    }
-                    
-                    reset_log_msg = "reset P1P2 fields"
-                    self.make_request(index, reset_body, reset_log_msg)
-                    
-                    # Clear the delayed reset
-                    thermostat["delayed_reset_timestamp"] = None
+    # Future returned by writes made inside a transaction
+    _future_types = (Future,)
+
+    def _reset_after(self, deviceid, result):
+        ''' Arm the P1P2 reset once the fan mode PUT has been accepted.  Inside a transaction
+        result is the future of the PUT sent when the block exits, the reset waits for it '''
+        def sent(future):
+            if not future.cancelled() and future.result() is not None:
+                self._schedule_reset(deviceid)
+                logger.debug("Fan mode set successfully, P1P2 reset scheduled")
+
+        if isinstance(result, self._future_types):
+            result.add_done_callback(sent)
+        elif result is not None:
+            self._schedule_reset(deviceid)
+            logger.debug("Fan mode set successfully, P1P2 reset scheduled")
+
+    def _schedule_reset(self, deviceid):
+        ''' Start the P1P2 reset timer of a device, replacing one already running '''
+        timer = threading.Timer(P1P2_RESET_DELAY, self._send_reset, (deviceid,))
+        timer.daemon = True
+        with self._state_lock:
+            previous = self._reset_timers.pop(deviceid, None)
+            if previous is not None:
+                previous.cancel()
+            self._reset_timers[deviceid] = timer
+        timer.start()
+
+    def _send_reset(self, deviceid):
+        ''' Runs on the timer thread.  The reset is a PUT of its own, it is never merged into
+        a transaction the caller's thread has open and does not start a burst of fast polls '''
+        body = dict(P1P2_RESET_BODY)
+        with self._state_lock:
+            if self._reset_timers.get(deviceid) is not threading.current_thread():
+                # Replaced or cancelled while this timer was firing
+                return None
+            del self._reset_timers[deviceid]
+            index = self._get_index(deviceid)
+            if index is None:
+                return None
+            self._note_write(deviceid, body, notify=False)
+        logger.debug("Performing delayed reset for thermostat %s", deviceid)
+        return self._put_device_data(index, body, "reset P1P2 fields")
+
+    def cancel_delayed_resets(self):
+        ''' Drop every P1P2 reset that has not been sent yet '''
+        with self._state_lock:
+            for timer in self._reset_timers.values():
+                timer.cancel()
+            self._reset_timers.clear()
 
     def set_fan_speed(self, index, fan_speed):
         ''' Set fan speed. Values: low (0), medium (1), high (2) '''
@@ -561,4 +1403,3 @@ class DaikinSkyport(object):
 
         log_msg_action = "set humidity level"
         return self.make_request(index, body, log_msg_action)
-    
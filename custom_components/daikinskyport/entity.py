@@ -0,0 +1,54 @@
+"""Base entity for the Daikin Skyport platforms."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from homeassistant.core import callback
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from . import DaikinSkyportData
+
+
+class DaikinSkyportEntity(CoordinatorEntity[DaikinSkyportData]):
+    """Entity of one thermostat that writes its state only when something it shows changed.
+
+    Subclasses list the deviceData keys they use in _keys and derive their state
+    from the thermostat data in _update_from_thermostat.
+    """
+
+    _keys: Iterable[str] = ()
+
+    def __init__(self, coordinator: DaikinSkyportData, index: int) -> None:
+        """Initialize the entity for the thermostat at index."""
+        super().__init__(coordinator)
+        self._index = index
+        self._generation = coordinator.daikinskyport.generation
+        self._available = True
+
+    @property
+    def available(self) -> bool:
+        """Return False once the thermostat data has gone stale."""
+        return super().available and self.coordinator.device_available(self._index)
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        """Return device information for this Daikin Skyport thermostat."""
+        return self.coordinator.device_info
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only when a key the entity uses or its availability has changed."""
+        daikinskyport = self.coordinator.daikinskyport
+        if not daikinskyport.keys_changed_since(self._index, self._keys, self._generation):
+            if self.available != self._available:
+                self._available = self.available
+                self.async_write_ha_state()
+            return
+        self._generation = daikinskyport.generation
+        self._update_from_thermostat()
+        self._available = self.available
+        self.async_write_ha_state()
+
+    def _update_from_thermostat(self) -> None:
+        """Derive the entity state from the thermostat data."""
@@ -0,0 +1,199 @@
+"""Adaptive poll interval for the Daikin Skyport coordinator."""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from .const import (
+    COMMAND_POLL_BURST,
+    IDLE_BACKOFF_FACTOR,
+    POLL_TICK,
+    SCHEDULE_BOUNDARY_WINDOW,
+)
+from .schedule import MINUTES_PER_DAY, MINUTES_PER_SLOT, WeeklySchedule
+
+EQUIPMENT_IDLE = 5
+FAN_SCHEDULE = 2
+
+
+def daily_transitions(thermostat) -> list[int]:
+    """Return the times of day, in 15 minute slots, of fan circulation and night mode changes."""
+    slots = []
+    if thermostat.get("fanCirculate") == FAN_SCHEDULE:
+        slots.extend((thermostat.get("fanCirculateStart", 0), thermostat.get("fanCirculateStop", 0)))
+    if thermostat.get("nightModeEnabled"):
+        slots.extend((thermostat.get("nightModeStart", 0), thermostat.get("nightModeStop", 0)))
+    return slots
+
+
+def transition_distance(
+    thermostat, schedule: WeeklySchedule, now: datetime
+) -> tuple[float | None, float | None]:
+    """Return the seconds since the last and until the next transition of a thermostat.
+
+    Schedule parts come from the compiled schedule, fan circulation and night
+    mode repeat every day.
+    """
+    since, until = schedule.transitions(now)
+    local = now.astimezone(schedule.tz)
+    minute = local.hour * 60 + local.minute + local.second / 60
+    for slot in daily_transitions(thermostat):
+        delta = slot * MINUTES_PER_SLOT - minute
+        before = -delta % MINUTES_PER_DAY
+        after = delta % MINUTES_PER_DAY or MINUTES_PER_DAY
+        since = before if since is None else min(since, before)
+        until = after if until is None else min(until, after)
+    return (
+        None if since is None else since * 60,
+        None if until is None else until * 60,
+    )
+
+
+class DevicePoll:
+    """Poll state of one thermostat."""
+
+    __slots__ = ("interval", "due", "last_command")
+
+    def __init__(self, interval: float, due: float) -> None:
+        self.interval = interval
+        self.due = due
+        self.last_command: float | None = None
+
+
+class AdaptivePolling:
+    """Schedule the poll of each thermostat on its own phase and interval.
+
+    A thermostat is polled at min_interval while its equipment is running, for
+    COMMAND_POLL_BURST seconds after a command to it and within
+    SCHEDULE_BOUNDARY_WINDOW after one of its schedule, fan circulation or night
+    mode transitions, and its poll before a transition is moved to just after it.
+    Idle polls stretch its interval by IDLE_BACKOFF_FACTOR and offline polls double
+    it, both up to max_interval.  A thermostat the API could not be reached for is
+    tried again after min_interval with its interval unchanged, the circuit breaker
+    of the client decides when requests actually go out during an outage.  Newly seen thermostats are spread
+    evenly over their first interval so a large account is not fetched in bursts.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, interval: float) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.devices: dict[str, DevicePoll] = {}
+
+    def set_limits(self, min_interval: float, max_interval: float) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        for device in self.devices.values():
+            device.interval = min(max(device.interval, self.min_interval), self.max_interval)
+
+    def due_devices(self, deviceids, now: float | None = None) -> set[str] | None:
+        """Return the devices to fetch in this poll, None for all of them."""
+        if not self.devices:
+            return None
+        if now is None:
+            now = time.monotonic()
+        devices = self.devices
+        return {
+            deviceid
+            for deviceid in deviceids
+            if deviceid not in devices or devices[deviceid].due <= now + POLL_TICK
+        }
+
+    def poll_all_now(self) -> None:
+        """Make every device due, e.g. for a refresh requested by the user."""
+        now = time.monotonic()
+        for device in self.devices.values():
+            device.due = min(device.due, now)
+
+    def note_command(self, deviceid: str, now: float | None = None) -> None:
+        """Start a burst of fast polls of a device after a command was sent to it."""
+        device = self.devices.get(deviceid)
+        if device is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        device.last_command = now
+        device.interval = self.min_interval
+        device.due = min(device.due, now + self.min_interval)
+
+    def _busy(
+        self, device: DevicePoll, thermostat, schedule: WeeklySchedule, now: float, wall: datetime
+    ) -> tuple[bool, float | None]:
+        busy = device.last_command is not None and now - device.last_command < COMMAND_POLL_BURST
+        if thermostat.get("equipmentStatus", EQUIPMENT_IDLE) != EQUIPMENT_IDLE:
+            busy = True
+        since, until = transition_distance(thermostat, schedule, wall)
+        if since is not None and since < SCHEDULE_BOUNDARY_WINDOW:
+            busy = True
+        return busy, until
+
+    def _reschedule(self, device: DevicePoll, daikinskyport, index, ok: bool, now: float, wall: datetime) -> None:
+        if not ok or index is None:
+            device.interval = min(self.max_interval, device.interval * 2)
+            device.due = now + device.interval
+            return
+        busy, next_transition = self._busy(
+            device, daikinskyport.thermostats[index], daikinskyport.get_schedule(index), now, wall
+        )
+        if busy:
+            device.interval = self.min_interval
+        else:
+            device.interval = min(self.max_interval, device.interval * IDLE_BACKOFF_FACTOR)
+        interval = device.interval
+        if next_transition is not None and next_transition < interval:
+            interval = max(self.min_interval, next_transition + self.min_interval)
+        device.due = now + interval
+
+    def next_interval(
+        self,
+        daikinskyport,
+        requested,
+        success: bool,
+        now: float | None = None,
+        wall: datetime | None = None,
+    ) -> timedelta:
+        """Reschedule the devices of the poll that just finished and return the time to the next poll.
+
+        requested is what due_devices returned for that poll.
+        """
+        if now is None:
+            now = time.monotonic()
+        if wall is None:
+            wall = datetime.now(timezone.utc)
+        listed = [thermostat["id"] for thermostat in daikinskyport.thermostatlist]
+        indexes = {thermostat["id"]: index for index, thermostat in enumerate(daikinskyport.thermostats)}
+        results = daikinskyport.poll_results
+
+        new = [deviceid for deviceid in listed if deviceid not in self.devices]
+        for deviceid in new:
+            self.devices[deviceid] = DevicePoll(self.interval, now)
+        for deviceid in self.devices.keys() - set(listed):
+            del self.devices[deviceid]
+        for deviceid in listed:
+            if deviceid not in results and not (requested is None or deviceid in requested):
+                continue
+            device = self.devices[deviceid]
+            # None when the poll failed before this device was fetched or the API was unreachable
+            result = results.get(deviceid) if success else None
+            if result is None:
+                device.due = now + self.min_interval
+                continue
+            self._reschedule(device, daikinskyport, indexes.get(deviceid), result, now, wall)
+            if not result:
+                # Offline devices are not fetched again before their backoff ends
+                device.due = max(device.due, now + daikinskyport.retry_in(deviceid))
+        # Spread devices seen for the first time evenly over their next interval
+        for position, deviceid in enumerate(new):
+            device = self.devices[deviceid]
+            device.due += device.interval * position / len(new)
+
+        return self.time_to_next_poll(now)
+
+    def time_to_next_poll(self, now: float | None = None) -> timedelta:
+        """Return the time until the earliest device is due, at least POLL_TICK."""
+        if not self.devices:
+            return timedelta(seconds=self.interval)
+        if now is None:
+            now = time.monotonic()
+        return timedelta(seconds=max(POLL_TICK, min(device.due for device in self.devices.values()) - now))
@@ -0,0 +1,116 @@
+''' Compiled weekly schedule of a thermostat.
+
+The sched<Day>Part<n>{Time,Enabled,Label,hsp,csp} keys are read once into a
+table of parts and a timeline of the enabled ones sorted by their start in
+minutes from Monday 00:00 thermostat time.  The active part, the next
+transition and the setpoints at any moment are then a bisect away.  Times
+are in the thermostat's own time zone (its timeZone key). '''
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .const import SCHEDULE_DAYS, SCHEDULE_PARTS
+
+MINUTES_PER_SLOT = 15
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# time is the sched*Time slot of the day, start the same moment in minutes from Monday 00:00
+SchedulePart = namedtuple('SchedulePart',
+                          ('day', 'part', 'time', 'start', 'enabled', 'label', 'hsp', 'csp'))
+
+
+def thermostat_timezone(thermostat):
+    ''' Time zone of a thermostat, UTC if it has none or an unknown one '''
+    try:
+        return ZoneInfo(thermostat.get('timeZone') or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def minute_of_week(local):
+    ''' Minutes from Monday 00:00 of a local datetime '''
+    return local.weekday() * MINUTES_PER_DAY + local.hour * 60 + local.minute + local.second / 60
+
+
+class WeeklySchedule(object):
+    ''' Sorted week timeline of the schedule parts of one thermostat '''
+
+    __slots__ = ('enabled', 'parts', 'timeline', 'starts', 'tz')
+
+    def __init__(self, parts, enabled=True, tz=timezone.utc):
+        self.enabled = enabled
+        self.parts = {(part.day, part.part): part for part in parts}
+        self.timeline = sorted((part for part in parts if part.enabled), key=lambda part: part.start)
+        self.starts = [part.start for part in self.timeline]
+        self.tz = tz
+
+    @classmethod
+    def from_thermostat(cls, thermostat):
+        ''' Compile the sched* keys of a thermostat snapshot '''
+        parts = list()
+        for day_index, day in enumerate(SCHEDULE_DAYS):
+            for part in range(1, SCHEDULE_PARTS + 1):
+                prefix = f"sched{day}Part{part}"
+                slot = thermostat.get(prefix + 'Time')
+                if slot is None:
+                    continue
+                parts.append(SchedulePart(
+                    day, part, slot, day_index * MINUTES_PER_DAY + slot * MINUTES_PER_SLOT,
+                    bool(thermostat.get(prefix + 'Enabled')), thermostat.get(prefix + 'Label'),
+                    thermostat.get(prefix + 'hsp'), thermostat.get(prefix + 'csp')))
+        return cls(parts, bool(thermostat.get('schedEnabled')), thermostat_timezone(thermostat))
+
+    def __bool__(self):
+        return self.enabled and bool(self.timeline)
+
+    def part(self, day, part):
+        ''' The part as stored, enabled or not, None if the thermostat does not report it '''
+        return self.parts.get((day, part))
+
+    def _locate(self, when):
+        ''' Minute of the week of when and the timeline position of the part active then '''
+        local = (when or datetime.now(timezone.utc)).astimezone(self.tz)
+        minute = minute_of_week(local)
+        # -1 wraps around to the last part of the previous week
+        return local, minute, bisect_right(self.starts, minute) - 1
+
+    def active_part(self, when=None):
+        ''' The part in effect at when (default now), None if the schedule is off or empty '''
+        if not self:
+            return None
+        return self.timeline[self._locate(when)[2]]
+
+    def setpoints_at(self, when=None):
+        ''' (hsp, csp) the schedule asks for at when, None if the schedule is off or empty '''
+        part = self.active_part(when)
+        if part is None:
+            return None
+        return part.hsp, part.csp
+
+    def transitions(self, when=None):
+        ''' Minutes since the active part started and until the next one starts, (None, None)
+        if the schedule is off or empty '''
+        if not self:
+            return None, None
+        _, minute, position = self._locate(when)
+        since = (minute - self.starts[position]) % MINUTES_PER_WEEK
+        following = self.starts[(position + 1) % len(self.starts)]
+        until = (following - minute) % MINUTES_PER_WEEK or MINUTES_PER_WEEK
+        return since, until
+
+    def next_transition(self, when=None):
+        ''' (time, part) of the next part to start after when, None if the schedule is off or empty.
+        time is an aware datetime in the thermostat's time zone '''
+        if not self:
+            return None
+        local, minute, position = self._locate(when)
+        part = self.timeline[(position + 1) % len(self.timeline)]
+        week_start = (local - timedelta(days=local.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        start = week_start + timedelta(minutes=part.start)
+        if part.start <= minute:
+            start += timedelta(days=7)
+        # Wall clock arithmetic, the zone resolves the offset of the new time itself
+        return start, part
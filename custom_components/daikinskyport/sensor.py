@@ -15,12 +15,11 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.device_registry import DeviceInfo
 from . import DaikinSkyportData
+from .entity import DaikinSkyportEntity
 
 from .const import (
     _LOGGER,
@@ -135,6 +134,7 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: DaikinSkyportData = data[COORDINATOR]
 
+    entities = []
     for index in range(len(coordinator.daikinskyport.thermostats)):
         sensors = coordinator.daikinskyport.get_sensors(index)
         for sensor in sensors:
@@ -143,28 +143,27 @@ async def async_setup_entry(
                                       "power", "frequency_percent","actual_status",
                                       "airflow", "fault_code") or sensor["value"] == 127.5 or sensor["value"] == 65535:
                 continue
-            async_add_entities([DaikinSkyportSensor(coordinator, sensor["name"], sensor["type"], index)], True)
+            entities.append(DaikinSkyportSensor(coordinator, sensor["name"], sensor["type"], index, sensor["key"]))
 
-class DaikinSkyportSensor(SensorEntity):
+    async_add_entities(entities)
+
+class DaikinSkyportSensor(DaikinSkyportEntity, SensorEntity):
     """Representation of a Daikin sensor."""
 
-    def __init__(self, data, sensor_name, sensor_type, sensor_index):
+    def __init__(self, coordinator, sensor_name, sensor_type, sensor_index, sensor_key):
         """Initialize the sensor."""
-        self.data = data
+        super().__init__(coordinator, sensor_index)
         self._name = f"{sensor_name} {SENSOR_TYPES[sensor_type]['device_class']}"
-        self._attr_unique_id = f"{data.daikinskyport.thermostats[sensor_index]['id']}-{self._name}"
-        self._model = f"{data.daikinskyport.thermostats[sensor_index]['model']}"
+        self._attr_unique_id = f"{coordinator.daikinskyport.thermostats[sensor_index]['id']}-{self._name}"
+        self._model = f"{coordinator.daikinskyport.thermostats[sensor_index]['model']}"
         self._sensor_name = sensor_name
         self._type = sensor_type
-        self._index = sensor_index
         self._state = None
         self._native_unit_of_measurement = SENSOR_TYPES[sensor_type]["native_unit_of_measurement"]
         self._attr_state_class = SENSOR_TYPES[sensor_type]['state_class']
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device information for this Daikin Skyport thermostat."""
-        return self.data.device_info
+        self._key = sensor_key
+        self._keys = coordinator.daikinskyport.get_sensor_keys(sensor_key)
+        self._update_from_thermostat()
 
     @property
     def name(self):
@@ -193,20 +192,17 @@ class DaikinSkyportSensor(SensorEntity):
         """Return the unit of measurement this sensor expresses itself in."""
         return self._native_unit_of_measurement
 
-    async def async_update(self):
-        """Get the latest state of the sensor."""
-        await self.data._async_update_data()
-        sensors = self.data.daikinskyport.get_sensors(self._index)
-        for sensor in sensors:
-            if sensor["type"] == self._type and self._sensor_name == sensor["name"]:
-                # A fault code of 255 indicates that component (eg, the air
-                # handler) is not present and therefore has no valid state. Experience
-                # shows that 255 also indicates an issue with the component. In
-                # either case, we do not return any value for the sensor.
-                if sensor["type"] == "fault_code":
-                    if sensor["value"] == 255:
-                        continue
-                    else:
-                        self._state = sensor["value"]
-                elif not sensor["value"] == 65535 and not sensor["value"] == 655350:
-                    self._state = sensor["value"]
+    def _update_from_thermostat(self):
+        """Read the sensor value from the thermostat data."""
+        sensor = self.coordinator.daikinskyport.get_sensor_index(self._index).get(self._key)
+        if sensor is None or sensor["type"] != self._type:
+            return
+        # A fault code of 255 indicates that component (eg, the air
+        # handler) is not present and therefore has no valid state. Experience
+        # shows that 255 also indicates an issue with the component. In
+        # either case, we do not return any value for the sensor.
+        if sensor["type"] == "fault_code":
+            if sensor["value"] != 255:
+                self._state = sensor["value"]
+        elif not sensor["value"] == 65535 and not sensor["value"] == 655350:
+            self._state = sensor["value"]
@@ -0,0 +1,150 @@
+''' Compact storage for thermostat deviceData.
+
+Every device reporting the same set of keys shares one Schema, an interned
+key to slot table.  A Snapshot holds only a flat list of values in schema
+order plus a small dict for the keys added locally (name, id, model, ...), so
+a thermostat costs one list instead of a ~900 entry dict, and copying it for
+diffing or history is a single list copy. '''
+import sys
+from collections.abc import MutableMapping
+
+_MISSING = object()
+
+
+class Schema(object):
+    ''' Ordered deviceData keys shared by every snapshot with the same key set '''
+
+    __slots__ = ('keys', 'slots')
+
+    _schemas = dict()
+
+    def __init__(self, keys):
+        self.keys = tuple(sys.intern(key) for key in keys)
+        self.slots = {key: slot for slot, key in enumerate(self.keys)}
+
+    @classmethod
+    def for_keys(cls, keys):
+        ''' Return the shared schema for these keys, creating it on first use '''
+        keys = tuple(keys)
+        schema = cls._schemas.get(keys)
+        if schema is None:
+            schema = cls._schemas.setdefault(keys, cls(keys))
+        return schema
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"<Schema {len(self.keys)} keys>"
+
+
+class Snapshot(MutableMapping):
+    ''' deviceData of one thermostat, stored as values in Schema slot order.
+    Behaves like the dict it replaces, keys outside the schema go to a small overflow dict '''
+
+    __slots__ = ('schema', 'values', 'extra')
+
+    def __init__(self, schema, values, extra=None):
+        self.schema = schema
+        self.values = values
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, schema, data):
+        ''' Build a snapshot from a decoded body that has every key of the schema '''
+        return cls(schema, list(map(data.__getitem__, schema.keys)))
+
+    def __getitem__(self, key):
+        slot = self.schema.slots.get(key)
+        if slot is not None:
+            value = self.values[slot]
+            if value is not _MISSING:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        slot = self.schema.slots.get(key)
+        if slot is not None:
+            value = self.values[slot]
+            return default if value is _MISSING else value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        slot = self.schema.slots.get(key)
+        if slot is not None:
+            return self.values[slot] is not _MISSING
+        return self.extra is not None and key in self.extra
+
+    def __setitem__(self, key, value):
+        slot = self.schema.slots.get(key)
+        if slot is not None:
+            self.values[slot] = value
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        slot = self.schema.slots.get(key)
+        if slot is not None and self.values[slot] is not _MISSING:
+            self.values[slot] = _MISSING
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for key, value in zip(self.schema.keys, self.values):
+            if value is not _MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        length = len(self.values) - self.values.count(_MISSING)
+        if self.extra:
+            length += len(self.extra)
+        return length
+
+    def _items(self):
+        for key, value in zip(self.schema.keys, self.values):
+            if value is not _MISSING:
+                yield key, value
+        if self.extra:
+            yield from self.extra.items()
+
+    def copy(self):
+        ''' Cheap copy sharing the schema '''
+        return Snapshot(self.schema, self.values[:], dict(self.extra) if self.extra else None)
+
+    def as_dict(self):
+        return dict(self._items())
+
+    def compact(self):
+        ''' (keys, values, extra) for storage, keys is the schema's own tuple unless slots are empty '''
+        if _MISSING not in self.values:
+            return self.schema.keys, self.values, self.extra
+        items = [(key, value) for key, value in zip(self.schema.keys, self.values) if value is not _MISSING]
+        return tuple(key for key, _ in items), [value for _, value in items], self.extra
+
+    def changed_keys(self, other):
+        ''' Keys whose value differs from, or is missing in, another mapping '''
+        if isinstance(other, Snapshot) and other.schema is self.schema:
+            changed = {key for key, new, old in zip(self.schema.keys, self.values, other.values)
+                       if new != old}
+            extra = self.extra or {}
+            other_extra = other.extra or {}
+            changed.update(key for key, value in extra.items()
+                           if other_extra.get(key, _MISSING) != value)
+            changed.update(other_extra.keys() - extra.keys())
+            return changed
+        changed = {key for key, value in self._items() if other.get(key, _MISSING) != value}
+        changed.update(other.keys() - self.keys())
+        return changed
+
+    def __repr__(self):
+        return f"Snapshot({self.as_dict()!r})"
@@ -4,19 +4,18 @@ from typing import Any
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 
 from .const import (
-    _LOGGER,
     COORDINATOR,
     DOMAIN,
     DAIKIN_HVAC_MODE_AUXHEAT,
     DAIKIN_HVAC_MODE_HEAT
 )
 from . import DaikinSkyportData
+from .entity import DaikinSkyportEntity
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
@@ -26,23 +25,26 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: DaikinSkyportData = data[COORDINATOR]
 
+    entities = []
     for index in range(len(coordinator.daikinskyport.thermostats)):
         thermostat = coordinator.daikinskyport.get_thermostat(index)
-        async_add_entities([DaikinSkyportAuxHeat(coordinator, thermostat["name"], index)], True)
+        entities.append(DaikinSkyportAuxHeat(coordinator, thermostat["name"], index))
 
-class DaikinSkyportAuxHeat(SwitchEntity):
+    async_add_entities(entities)
+
+class DaikinSkyportAuxHeat(DaikinSkyportEntity, SwitchEntity):
     """Representation of Daikin Skyport aux_heat data."""
 
     _attr_has_entity_name = True
     _attr_name = None
+    _keys = ("mode",)
 
-    def __init__(self, data, name, index):
+    def __init__(self, coordinator, name, index):
         """Initialize the Daikin Skyport aux_heat platform."""
-        self.data = data
+        super().__init__(coordinator, index)
         self._name = f"{name} Aux Heat"
-        self._attr_unique_id = f"{data.daikinskyport.thermostats[index]['id']}-{self._name}"
-        self._index = index
-        self.aux_on = False
+        self._attr_unique_id = f"{coordinator.daikinskyport.thermostats[index]['id']}-{self._name}"
+        self._update_from_thermostat()
 
     @property
     def name(self) -> str:
@@ -54,31 +56,25 @@ class DaikinSkyportAuxHeat(SwitchEntity):
         """Status of the switch."""
         return self.aux_on
 
-    def turn_on(self, **kwargs: Any) -> None:
+    async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn on the switch."""
-        send_command = self.data.daikinskyport.set_hvac_mode(self._index, DAIKIN_HVAC_MODE_AUXHEAT)
+        send_command = await self.coordinator.daikinskyport.set_hvac_mode(self._index, DAIKIN_HVAC_MODE_AUXHEAT)
         if send_command:
             self.aux_on = True
-            self.schedule_update_ha_state()
+            self.async_write_ha_state()
         else:
             raise HomeAssistantError(f"Error {send_command}: Failed to turn on {self._name}")
 
-    def turn_off(self, **kwargs: Any) -> None:
+    async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn off the switch."""
-        if self.data.daikinskyport.get_thermostat(self._index)['mode'] == DAIKIN_HVAC_MODE_AUXHEAT:
-            self.data.daikinskyport.set_hvac_mode(self._index, DAIKIN_HVAC_MODE_HEAT)
+        if self.coordinator.daikinskyport.get_thermostat(self._index)['mode'] == DAIKIN_HVAC_MODE_AUXHEAT:
+            await self.coordinator.daikinskyport.set_hvac_mode(self._index, DAIKIN_HVAC_MODE_HEAT)
         self.aux_on = False
-        self.schedule_update_ha_state()
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        return self.data.device_info
+        self.async_write_ha_state()
 
-    async def async_update(self) -> None:
-        """Get the latest state of the switch."""
-        _LOGGER.debug("Updating switch entity")
-        await self.data._async_update_data()
-        thermostat = self.data.daikinskyport.get_thermostat(self._index)
+    def _update_from_thermostat(self) -> None:
+        """Derive the switch state from the thermostat mode."""
+        thermostat = self.coordinator.daikinskyport.get_thermostat(self._index)
         if thermostat['mode'] == DAIKIN_HVAC_MODE_AUXHEAT:
             self.aux_on = True
         else:
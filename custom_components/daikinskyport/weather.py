@@ -1,9 +1,23 @@
 """Support for displaying weather info from Daikin Skyport API."""
 from datetime import datetime, timedelta
-from pytz import timezone, utc
 import logging
 
 from homeassistant.components.weather import (
+    ATTR_CONDITION_CLEAR_NIGHT,
+    ATTR_CONDITION_CLOUDY,
+    ATTR_CONDITION_EXCEPTIONAL,
+    ATTR_CONDITION_FOG,
+    ATTR_CONDITION_HAIL,
+    ATTR_CONDITION_LIGHTNING,
+    ATTR_CONDITION_LIGHTNING_RAINY,
+    ATTR_CONDITION_PARTLYCLOUDY,
+    ATTR_CONDITION_POURING,
+    ATTR_CONDITION_RAINY,
+    ATTR_CONDITION_SNOWY,
+    ATTR_CONDITION_SNOWY_RAINY,
+    ATTR_CONDITION_SUNNY,
+    ATTR_CONDITION_WINDY,
+    ATTR_CONDITION_WINDY_VARIANT,
     ATTR_FORECAST_CONDITION,
     ATTR_FORECAST_NATIVE_TEMP,
     ATTR_FORECAST_HUMIDITY,
@@ -19,19 +33,41 @@ from homeassistant.const import (
     UnitOfTemperature,
 )
 from homeassistant.util import dt as dt_util
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigEntry
 
 from .const import (
     _LOGGER,
-    DAIKIN_WEATHER_ICON_TO_HASS,
     COORDINATOR,
     DOMAIN,
 )
 from . import DaikinSkyportData
+from .entity import DaikinSkyportEntity
+
+# Map Daikin weather icons to HA conditions (weather icons are always the same, *Cond change with language)
+# Unknown entries are unverifed.  Taken from Weather Underground icon names
+DAIKIN_WEATHER_ICON_TO_HASS = {
+    "sunny": ATTR_CONDITION_SUNNY, #Unknown
+    "mostlysunny": ATTR_CONDITION_SUNNY, #Unknown
+    "partlysunny": ATTR_CONDITION_PARTLYCLOUDY, #Unknown
+    "partlycloudy": ATTR_CONDITION_PARTLYCLOUDY,
+    "clear": ATTR_CONDITION_CLEAR_NIGHT, #Unknown
+    "mostlycloudy": ATTR_CONDITION_CLOUDY,
+    "cloudy": ATTR_CONDITION_CLOUDY, #Unknown
+    "rain": ATTR_CONDITION_RAINY,
+    "chancerain": ATTR_CONDITION_RAINY,
+    "snow": ATTR_CONDITION_SNOWY, #Unknown
+    "chancesnow": ATTR_CONDITION_SNOWY, #Unknown
+    "chanceflurries": ATTR_CONDITION_SNOWY, #Unknown
+    "flurries": ATTR_CONDITION_SNOWY, #Unknown
+    "tstorms": ATTR_CONDITION_LIGHTNING,
+    "chancetstorms": ATTR_CONDITION_LIGHTNING,
+    "fog": ATTR_CONDITION_FOG, #Unknown
+    "hazy": "hazy", #Unknown
+    "sleet": "sleet", #Unknown
+    "chancesleet": "sleet",  #Unknown
+}
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
@@ -41,11 +77,14 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: DaikinSkyportData = data[COORDINATOR]
 
+    entities = []
     for index in range(len(coordinator.daikinskyport.thermostats)):
         thermostat = coordinator.daikinskyport.get_thermostat(index)
-        async_add_entities([DaikinSkyportWeather(coordinator, thermostat["name"], index)], True)
+        entities.append(DaikinSkyportWeather(coordinator, thermostat["name"], index))
 
-class DaikinSkyportWeather(WeatherEntity):
+    async_add_entities(entities)
+
+class DaikinSkyportWeather(DaikinSkyportEntity, WeatherEntity):
     """Representation of Daikin Skyport weather data."""
 
     _attr_native_temperature_unit = UnitOfTemperature.CELSIUS
@@ -53,13 +92,15 @@ class DaikinSkyportWeather(WeatherEntity):
     _attr_name = None
     _attr_supported_features = WeatherEntityFeature.FORECAST_DAILY
 
-    def __init__(self, data, name, index):
+    def __init__(self, coordinator, name, index):
         """Initialize the Daikin Skyport weather platform."""
-        self.data = data
+        super().__init__(coordinator, index)
         self._name = name
-        self._attr_unique_id = f"{data.daikinskyport.thermostats[index]['id']}-{self._name}"
-        self._index = index
+        self._attr_unique_id = f"{coordinator.daikinskyport.thermostats[index]['id']}-{self._name}"
         self.weather = None
+        thermostat = coordinator.daikinskyport.thermostats[index]
+        self._keys = [key for key in thermostat if key.startswith('weather')] + ['timeZone']
+        self._update_from_thermostat()
 
     async def async_forecast_daily(self) -> list[Forecast] | None:
         """Return the daily forecast in native units.
@@ -122,15 +163,18 @@ class DaikinSkyportWeather(WeatherEntity):
         except ValueError:
             return None
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        return self.data.device_info
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Also refresh the forecast subscribers when the weather data has changed."""
+        generation = self._generation
+        super()._handle_coordinator_update()
+        if self._generation != generation:
+            self.hass.async_create_task(self.async_update_listeners(("daily",)))
 
-    async def async_update(self) -> None:
-        """Get the latest state of the sensor."""
-        await self.data._async_update_data()
+    def _update_from_thermostat(self) -> None:
+        """Copy the weather keys out of the thermostat data."""
         self.weather = dict()
-        thermostat = self.data.daikinskyport.get_thermostat(self._index)
+        thermostat = self.coordinator.daikinskyport.get_thermostat(self._index)
         for key in thermostat:
             if key.startswith('weather'):
                 self.weather[key] = thermostat[key]
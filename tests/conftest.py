@@ -0,0 +1,85 @@
+"""Shared fixtures for the unit tests.
+
+The client, polling, schedule and snapshot modules run without Home Assistant.
+Unless Home Assistant is installed the integration package is registered here
+without executing its __init__, so those tests only need the client's own
+requirements, and the tests of the Home Assistant side are skipped.
+Thermostat data comes from the local API stand-in in benchmarks/.
+"""
+import json
+import random
+import sys
+import types
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+try:
+    import homeassistant  # noqa: F401
+except ImportError:
+    for name, path in (
+        ("custom_components", ROOT / "custom_components"),
+        ("custom_components.daikinskyport", ROOT / "custom_components" / "daikinskyport"),
+    ):
+        if name not in sys.modules:
+            package = types.ModuleType(name)
+            package.__path__ = [str(path)]
+            sys.modules[name] = package
+else:
+    sys.path.insert(0, str(ROOT))
+
+from custom_components.daikinskyport.daikinskyport import DaikinSkyport, RateLimiter  # noqa: E402
+from skyport_mock import make_device_data, start_mock_server  # noqa: E402
+
+
+def make_client(count=1, **options):
+    """Return a client holding count thermostats merged from full-size payloads."""
+    client = DaikinSkyport(config={"EMAIL": "test@example.com", "PASSWORD": "test"}, **options)
+    client.thermostatlist = [
+        {"id": f"device-{index}", "name": f"Thermostat {index}", "model": "ONEPLUS"}
+        for index in range(count)
+    ]
+    client._store_thermostats([
+        json.dumps(make_device_data(index, index % 2 == 1, random.Random(index))).encode()
+        for index in range(count)
+    ])
+    return client
+
+
+@asynccontextmanager
+async def mock_client(devices=1, **options):
+    """Start the API stand-in and yield it with a logged in AsyncDaikinSkyport that polled it once.
+
+    The client gets a rate limiter of its own that never holds requests back.
+    """
+    from custom_components.daikinskyport.async_daikinskyport import AsyncDaikinSkyport
+
+    mock, runner, base_url = await start_mock_server(devices=devices, drift=False)
+    client = AsyncDaikinSkyport(
+        config={"EMAIL": "test@example.com", "PASSWORD": "test", "BASE_URL": base_url},
+        rate_limiter=RateLimiter(1000, 1000, 1000, 1000),
+        **options,
+    )
+    try:
+        assert await client.request_tokens()
+        await client.update()
+        yield mock, client
+    finally:
+        await client.async_close()
+        await runner.cleanup()
+
+
+def puts(mock):
+    """Number of deviceData PUTs the stand-in received."""
+    return mock.stats["PUT /deviceData/{device_id}"]
+
+
+@pytest.fixture
+def client():
+    client = make_client(2)
+    yield client
+    client.close()
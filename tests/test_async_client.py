@@ -0,0 +1,95 @@
+"""Round trips of the asyncio client against the local API stand-in."""
+import asyncio
+
+import pytest
+
+from conftest import mock_client, puts
+from custom_components.daikinskyport.async_daikinskyport import AsyncDaikinSkyport
+from custom_components.daikinskyport.daikinskyport import ExpiredTokenError, RateLimiter
+from skyport_mock import start_mock_server
+
+
+def test_login_stores_tokens_the_api_accepts():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            assert mock.stats["POST /users/auth/login"] == 1
+            assert client.authenticated
+            assert client.access_token in mock.access_tokens
+            assert client.refresh_token in mock.refresh_tokens
+            assert client.access_token_expires is not None
+
+    asyncio.run(scenario())
+
+
+def test_rejected_login_leaves_the_client_unauthenticated():
+    async def scenario():
+        mock, runner, base_url = await start_mock_server(drift=False)
+        client = AsyncDaikinSkyport(
+            config={"EMAIL": "test@example.com", "PASSWORD": "", "BASE_URL": base_url},
+            rate_limiter=RateLimiter(1000, 1000, 1000, 1000),
+        )
+        try:
+            assert not await client.request_tokens()
+            assert not client.authenticated
+            assert not mock.access_tokens
+        finally:
+            await client.async_close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_poll_reads_every_device():
+    async def scenario():
+        async with mock_client(devices=3) as (mock, client):
+            assert [thermostat["id"] for thermostat in client.thermostats] == [
+                device["id"] for device in mock.devices]
+            for thermostat in client.thermostats:
+                data = mock.device_data[thermostat["id"]]
+                assert thermostat["name"] == next(
+                    device["name"] for device in mock.devices if device["id"] == thermostat["id"])
+                assert thermostat["mode"] == data["mode"]
+                assert thermostat["tempIndoor"] == data["tempIndoor"]
+            assert mock.stats["GET /deviceData/{device_id}"] == 3
+
+            deviceid = client.thermostats[1]["id"]
+            mock.device_data[deviceid]["tempIndoor"] += 1
+            await client.update()
+            assert client.thermostats[1]["tempIndoor"] == mock.device_data[deviceid]["tempIndoor"]
+            assert client.poll_results == dict.fromkeys(mock.device_data, True)
+
+    asyncio.run(scenario())
+
+
+def test_write_reaches_the_device_and_survives_the_next_poll():
+    async def scenario():
+        async with mock_client(write_coalesce_window=0) as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            mode = (client.thermostats[0]["mode"] + 1) % 4
+            assert await client.set_hvac_mode(0, mode) is not None
+            assert puts(mock) == 1
+            assert mock.device_data[deviceid]["mode"] == mode
+
+            await client.update()
+            assert client.thermostats[0]["mode"] == mode
+
+    asyncio.run(scenario())
+
+
+def test_expired_token_is_refreshed_and_the_poll_retried():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            refresh_token = client.refresh_token
+            mock.access_tokens.clear()
+            with pytest.raises(ExpiredTokenError):
+                await client.update()
+
+            assert await client.refresh_tokens()
+            assert mock.stats["POST /users/auth/token"] == 1
+            assert client.access_token in mock.access_tokens
+            # The API keeps the refresh token when it only issues a new access token
+            assert client.refresh_token == refresh_token
+            assert await client.update() is client.thermostats
+            assert client.authenticated
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+"""Snapshot cache export and restore."""
+import json
+
+import pytest
+
+from conftest import make_client
+
+
+def round_trip(client):
+    """Export through JSON, as the cache is stored, into a fresh client."""
+    restored = make_client(0)
+    assert restored.restore_cache(json.loads(json.dumps(client.export_cache())))
+    return restored
+
+
+def test_round_trip_restores_devices_snapshots_and_data_age():
+    client = make_client(3)
+    client.thermostats[1]["name"] = "Renamed"
+    restored = round_trip(client)
+    assert restored.thermostatlist == client.thermostatlist
+    assert [thermostat.as_dict() for thermostat in restored.thermostats] == [
+        thermostat.as_dict() for thermostat in client.thermostats
+    ]
+    assert restored.data_age(0) == pytest.approx(client.data_age(0), abs=1)
+    # The listing is fetched again by the first poll
+    assert restored._device_list_stale(None)
+
+
+def test_devices_with_the_same_keys_share_one_key_list():
+    client = make_client(4)
+    cache = client.export_cache()
+    assert len(cache["schemas"]) == 1
+    restored = round_trip(client)
+    assert len({id(thermostat.schema) for thermostat in restored.thermostats}) == 1
+
+
+@pytest.mark.parametrize("cache", [
+    None,
+    {},
+    {"devices": [], "schemas": [], "thermostats": []},
+    {"devices": [], "schemas": [["id"]], "thermostats": [[1, ["device-0"], None, None]]},
+    {"devices": [], "schemas": [["id", "name"]], "thermostats": [[0, ["device-0"], None, None]]},
+    {"devices": [], "schemas": [["id"]], "thermostats": [[0, ["device-0"]]]},
+])
+def test_unusable_cache_is_rejected(cache):
+    client = make_client(1)
+    before = client.thermostats
+    assert not client.restore_cache(cache)
+    assert client.thermostats is before
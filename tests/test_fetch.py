@@ -0,0 +1,72 @@
+"""Concurrent deviceData fetches of a poll."""
+import asyncio
+import threading
+
+import pytest
+
+from conftest import make_client, mock_client
+from custom_components.daikinskyport.daikinskyport import ExpiredTokenError
+
+
+def test_first_error_cancels_the_other_fetches():
+    async def scenario():
+        async with mock_client(devices=3) as (mock, client):
+            first, *others = [thermostat["id"] for thermostat in client.thermostatlist]
+            cancelled = []
+
+            async def fetch(deviceid):
+                if deviceid == first:
+                    raise ExpiredTokenError("Daikin Skyport token expired")
+                try:
+                    await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    cancelled.append(deviceid)
+                    raise
+
+            client._fetch_thermostat_info = fetch
+            with pytest.raises(ExpiredTokenError):
+                await asyncio.wait_for(client.get_thermostats(), 5)
+            assert sorted(cancelled) == sorted(others)
+
+    asyncio.run(scenario())
+
+
+def blocking_client():
+    client = make_client(3)
+    client.access_token = "token"
+    client.access_token_expires = None
+    client._device_list_due = float("inf")
+    return client
+
+
+def test_blocking_poll_fails_without_waiting_for_slow_fetches():
+    client = blocking_client()
+    release = threading.Event()
+    finished = []
+
+    def fetch(deviceid):
+        if deviceid == "device-0":
+            raise ExpiredTokenError("Daikin Skyport token expired")
+        release.wait(5)
+        finished.append(deviceid)
+
+    client._fetch_thermostat_info = fetch
+    try:
+        with pytest.raises(ExpiredTokenError):
+            client.get_thermostats(["device-0", "device-1", "device-2"])
+        assert finished == []
+    finally:
+        release.set()
+        client.close()
+
+
+def test_blocking_polls_share_one_executor():
+    client = blocking_client()
+    client._fetch_thermostat_info = lambda deviceid: None
+    client.get_thermostats(["device-0"])
+    executor = client._executor
+    client.get_thermostats(["device-0"])
+    assert client._executor is executor
+    client.close()
+    assert client._executor is None
+    assert executor._shutdown
@@ -0,0 +1,105 @@
+"""Offline-device backoff, and API outages that must not count against devices."""
+import asyncio
+import time
+
+import pytest
+
+from conftest import make_client
+from custom_components.daikinskyport.async_daikinskyport import AsyncDaikinSkyport
+from custom_components.daikinskyport.const import OFFLINE_BACKOFF_BASE, OFFLINE_BACKOFF_MAX
+from custom_components.daikinskyport.daikinskyport import _UNREACHED, DeviceHealth, RetryPolicy
+from custom_components.daikinskyport.polling import AdaptivePolling
+from skyport_mock import start_mock_server
+
+
+def test_backoff_doubles_up_to_the_maximum_and_ends_on_success():
+    health = DeviceHealth()
+    delays = [health.record_failure(1000.0) for _ in range(12)]
+    assert delays[:3] == [OFFLINE_BACKOFF_BASE, 2 * OFFLINE_BACKOFF_BASE, 4 * OFFLINE_BACKOFF_BASE]
+    assert delays[-1] == OFFLINE_BACKOFF_MAX
+    assert health.backing_off()
+    health.record_success(2000.0)
+    assert (health.failures, health.last_success, health.last_failure) == (0, 2000.0, 1000.0)
+    assert not health.backing_off()
+
+
+def test_offline_device_keeps_its_last_data_and_is_skipped(client):
+    deviceid = client.thermostatlist[0]["id"]
+    before = client.thermostats[0].copy()
+    client._store_thermostats([None, None])
+    assert client.poll_results == {deviceid: False, "device-1": False}
+    assert client.health[deviceid].failures == 1
+    assert 0 < client.retry_in(deviceid) <= OFFLINE_BACKOFF_BASE
+    assert client.thermostats[0].changed_keys(before) == set()
+    assert client._poll_targets(None) == []
+
+
+def test_unreachable_api_does_not_count_against_devices(client):
+    client._store_thermostats([_UNREACHED, _UNREACHED])
+    assert client.poll_results == {"device-0": None, "device-1": None}
+    assert all(health.failures == 0 for health in client.health.values())
+    assert client.retry_in("device-0") == 0
+    assert client._poll_targets(None) == ["device-0", "device-1"]
+
+
+async def poll(client, polling):
+    requested = polling.due_devices([thermostat["id"] for thermostat in client.thermostatlist])
+    await client.update(requested)
+    return requested, polling.next_interval(client, requested, True)
+
+
+def test_outage_leaves_devices_out_of_backoff():
+    async def scenario():
+        mock, runner, base_url = await start_mock_server(devices=3, offline=1)
+        client = AsyncDaikinSkyport(
+            config={"EMAIL": "outage@example.com", "PASSWORD": "test", "BASE_URL": base_url},
+            retry_policies={"get": RetryPolicy(1, 2, 2)},
+        )
+        polling = AdaptivePolling(15, 300, 30)
+        try:
+            await client.request_tokens()
+            await poll(client, polling)
+            offline = mock.devices[0]["id"]
+            assert client.health[offline].failures == 1
+            assert polling.devices[offline].due - time.monotonic() > 15
+
+            mock.error_rate = 1.0
+            for _ in range(8):
+                polling.poll_all_now()
+                await poll(client, polling)
+            assert client.circuit.is_open
+            online = [device["id"] for device in mock.devices[1:]]
+            for deviceid in online:
+                assert client.health[deviceid].failures == 0
+                assert client.retry_in(deviceid) == 0
+                assert client.poll_results[deviceid] is None
+            # The offline device's count only moves on answers from the API
+            assert client.health[offline].failures == 1
+            # The online devices keep the data of the last good poll
+            assert [thermostat["id"] for thermostat in client.thermostats] == online
+        finally:
+            await client.async_close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_last_success_and_data_age_follow_the_answers(client):
+    answered = client.last_success(0)
+    assert answered is not None
+    assert 0 <= client.data_age(0) < 5
+    client.health["device-0"].last_success -= 600
+    client._store_thermostats([None, None])
+    # An offline poll keeps the time of the last answer
+    assert client.last_success(0) == answered - 600
+    assert client.data_age(0) == pytest.approx(600, abs=5)
+    client.health["device-0"].retry_at = 0.0
+    client._store_thermostats([_UNREACHED, None])
+    assert client.last_success(0) == answered - 600
+
+
+def test_thermostat_without_an_answer_has_no_data_age():
+    client = make_client(1)
+    del client.health["device-0"]
+    assert client.last_success(0) is None
+    assert client.data_age(0) is None
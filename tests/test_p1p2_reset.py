@@ -0,0 +1,93 @@
+"""Timer-driven P1P2 reset after a fan mode change."""
+import asyncio
+
+import pytest
+
+import custom_components.daikinskyport.async_daikinskyport as async_daikinskyport
+import custom_components.daikinskyport.daikinskyport as daikinskyport
+from conftest import mock_client, puts
+
+DELAY = 0.2
+
+
+@pytest.fixture(autouse=True)
+def short_reset_delay(monkeypatch):
+    monkeypatch.setattr(async_daikinskyport, "P1P2_RESET_DELAY", DELAY)
+    monkeypatch.setattr(daikinskyport, "P1P2_RESET_DELAY", DELAY)
+
+
+def test_reset_is_sent_at_its_deadline_as_a_put_of_its_own():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            commands = []
+            client.write_callback = commands.append
+            assert await client.set_fan_mode(0, 1) is not None
+            assert mock.device_data[deviceid]["P1P2FieldSettingModeNumber"] == 12
+            assert commands == [deviceid]
+            # A transaction open when the timer fires does not take the reset in
+            async with client.transaction(0):
+                await client.set_hvac_mode(0, 2)
+                await asyncio.sleep(DELAY * 2)
+                assert puts(mock) == 2
+                assert mock.device_data[deviceid]["P1P2FieldSettingModeNumber"] == 0
+                assert mock.device_data[deviceid]["P1P2SentFieldSettingSW3"] == 15
+            assert puts(mock) == 3
+            # The reset does not start a burst of fast polls
+            assert commands == [deviceid, deviceid]
+            assert not client._reset_timers
+
+    asyncio.run(scenario())
+
+
+def test_changing_the_fan_mode_again_replaces_the_pending_reset():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            await client.set_fan_mode(0, 1)
+            await asyncio.sleep(DELAY / 2)
+            await client.set_fan_mode(0, 0)
+            await asyncio.sleep(DELAY * 0.75)
+            # The first reset would have been due by now
+            assert puts(mock) == 2
+            await asyncio.sleep(DELAY)
+            assert puts(mock) == 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_reset_is_not_sent():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            await client.set_fan_mode(0, 1)
+            client.cancel_delayed_resets()
+            await asyncio.sleep(DELAY * 2)
+            assert puts(mock) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_fan_mode_change_arms_no_reset():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            mock.offline.add(client.thermostats[0]["id"])
+            assert await client.set_fan_mode(0, 1) is None
+            assert not client._reset_timers
+
+    asyncio.run(scenario())
+
+
+def test_blocking_client_replaces_the_pending_reset_timer(client, monkeypatch):
+    sent = []
+    monkeypatch.setattr(client, "_put_device_data", lambda index, body, action: sent.append(body) or True)
+    commands = []
+    client.write_callback = commands.append
+    client._reset_after("device-0", True)
+    first = client._reset_timers["device-0"]
+    client._reset_after("device-0", True)
+    second = client._reset_timers["device-0"]
+    # Cancelled, it never sends
+    assert first.finished.is_set()
+    second.join(DELAY * 5)
+    assert sent == [daikinskyport.P1P2_RESET_BODY]
+    assert commands == []
+    assert not client._reset_timers
@@ -0,0 +1,64 @@
+"""Written values hold over polls that have not caught up with them yet."""
+import json
+import random
+import time
+
+from conftest import make_client
+from custom_components.daikinskyport.const import PENDING_WRITE_TIMEOUT
+from skyport_mock import make_device_data
+
+POLLED_MODE = 1
+WRITTEN_MODE = 3
+
+
+def poll(client, **changes):
+    """Feed the client a poll of device-0 with changes over the generated payload."""
+    data = make_device_data(0, False, random.Random(0))
+    data.update(changes)
+    client._store_thermostats([json.dumps(data).encode()])
+
+
+def written_client():
+    client = make_client()
+    poll(client, mode=POLLED_MODE)
+    client._note_write("device-0", {"mode": WRITTEN_MODE})
+    return client
+
+
+def test_stale_poll_keeps_the_written_value():
+    client = written_client()
+    poll(client, mode=POLLED_MODE)
+    assert client.thermostats[0]["mode"] == WRITTEN_MODE
+    # An unchanged body is decoded again while a write is pending
+    poll(client, mode=POLLED_MODE)
+    assert client.thermostats[0]["mode"] == WRITTEN_MODE
+
+
+def test_confirming_poll_retires_the_write():
+    client = written_client()
+    poll(client, mode=WRITTEN_MODE)
+    assert client.thermostats[0]["mode"] == WRITTEN_MODE
+    assert not client._pending_writes["device-0"]
+    # The device moving on afterwards is shown as is
+    poll(client, mode=POLLED_MODE)
+    assert client.thermostats[0]["mode"] == POLLED_MODE
+
+
+def test_write_expires_after_the_timeout(monkeypatch):
+    client = written_client()
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + PENDING_WRITE_TIMEOUT - 1)
+    poll(client, mode=POLLED_MODE)
+    assert client.thermostats[0]["mode"] == WRITTEN_MODE
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + PENDING_WRITE_TIMEOUT + 1)
+    poll(client, mode=POLLED_MODE)
+    assert client.thermostats[0]["mode"] == POLLED_MODE
+    assert not client._pending_writes["device-0"]
+
+
+def test_poll_only_overlays_the_keys_written():
+    client = written_client()
+    poll(client, mode=POLLED_MODE, fanCirculateSpeed=2)
+    assert client.thermostats[0]["mode"] == WRITTEN_MODE
+    assert client.thermostats[0]["fanCirculateSpeed"] == 2
@@ -0,0 +1,135 @@
+"""Adaptive per-device poll scheduling."""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from conftest import make_client
+from custom_components.daikinskyport.const import COMMAND_POLL_BURST, IDLE_BACKOFF_FACTOR, POLL_TICK
+from custom_components.daikinskyport.polling import AdaptivePolling
+
+NOW = 1000.0
+# A Monday afternoon, clear of the stand-in's schedule parts
+WALL = datetime(2024, 1, 1, 13, 0, tzinfo=ZoneInfo("America/New_York"))
+
+
+def idle_client(count=1):
+    """Client whose thermostats are idle and have no schedule, fan or night mode transitions."""
+    client = make_client(count)
+    for thermostat in client.thermostats:
+        thermostat["equipmentStatus"] = 5
+        thermostat["schedEnabled"] = False
+    return client
+
+
+def poll(polling, client, now, wall=WALL, results=True, success=True):
+    """Run one poll of the due devices at now, every one of them answering with results."""
+    requested = polling.due_devices([thermostat["id"] for thermostat in client.thermostatlist], now)
+    client.poll_results = {
+        thermostat["id"]: results
+        for thermostat in client.thermostatlist
+        if requested is None or thermostat["id"] in requested
+    }
+    return requested, polling.next_interval(client, requested, success, now, wall)
+
+
+@pytest.fixture
+def polling():
+    return AdaptivePolling(15, 300, 30)
+
+
+def test_idle_device_backs_off_to_the_maximum(polling):
+    client = idle_client()
+    poll(polling, client, NOW)
+    device = polling.devices["device-0"]
+    assert device.interval == 30 * IDLE_BACKOFF_FACTOR
+    for _ in range(20):
+        poll(polling, client, device.due)
+    assert device.interval == 300
+
+
+def test_running_equipment_polls_at_the_minimum(polling):
+    client = idle_client()
+    client.thermostats[0]["equipmentStatus"] = 3
+    _, interval = poll(polling, client, NOW)
+    assert polling.devices["device-0"].interval == 15
+    assert interval == timedelta(seconds=15)
+
+
+def test_command_starts_a_burst_of_fast_polls(polling):
+    client = idle_client()
+    for _ in range(5):
+        poll(polling, client, NOW if not polling.devices else polling.devices["device-0"].due)
+    device = polling.devices["device-0"]
+    command = device.due - 100
+    polling.note_command("device-0", command)
+    assert device.due == command + 15
+    poll(polling, client, device.due)
+    assert device.interval == 15
+    poll(polling, client, command + COMMAND_POLL_BURST + 1)
+    assert device.interval == 15 * IDLE_BACKOFF_FACTOR
+
+
+def test_poll_moves_to_just_after_a_schedule_transition(polling):
+    client = make_client(1)
+    # The stand-in's schedule starts a part at 16:00
+    wall = WALL.replace(hour=15, minute=59, second=50)
+    poll(polling, client, NOW, wall)
+    assert polling.devices["device-0"].due == pytest.approx(NOW + 10 + 15)
+
+
+def test_offline_device_doubles_its_interval_and_waits_for_its_backoff(polling):
+    client = idle_client()
+    poll(polling, client, NOW)
+    client._store_thermostats([None])
+    device = polling.devices["device-0"]
+    due = device.due
+    requested = polling.due_devices(["device-0"], due)
+    polling.next_interval(client, requested, True, due, WALL)
+    assert device.interval == 2 * 30 * IDLE_BACKOFF_FACTOR
+    assert device.due >= due + client.retry_in("device-0")
+
+
+def test_unreachable_api_retries_at_the_minimum_without_backoff(polling):
+    client = idle_client()
+    poll(polling, client, NOW)
+    device = polling.devices["device-0"]
+    interval = device.interval
+    poll(polling, client, device.due, results=None)
+    assert device.interval == interval
+    assert device.due == NOW + interval + 15
+    poll(polling, client, device.due, success=False)
+    assert device.interval == interval
+
+
+def test_new_devices_are_spread_over_their_first_interval(polling):
+    client = idle_client(4)
+    requested, _ = poll(polling, client, NOW)
+    assert requested is None
+    dues = [polling.devices[f"device-{index}"].due for index in range(4)]
+    interval = 30 * IDLE_BACKOFF_FACTOR
+    assert dues == [NOW + interval * (1 + position / 4) for position in range(4)]
+
+
+def test_only_due_devices_are_fetched(polling):
+    client = idle_client(4)
+    poll(polling, client, NOW)
+    first = polling.devices["device-0"].due
+    requested, interval = poll(polling, client, first)
+    assert requested == {"device-0"}
+    # The next device is due a quarter interval later
+    assert interval == timedelta(seconds=polling.devices["device-1"].due - first)
+    # Devices due within POLL_TICK ride along
+    polling.devices["device-2"].due = polling.devices["device-1"].due + POLL_TICK
+    requested, _ = poll(polling, client, polling.devices["device-1"].due)
+    assert requested == {"device-1", "device-2"}
+
+
+def test_removed_devices_are_dropped_and_the_wait_has_a_floor(polling):
+    client = idle_client(2)
+    poll(polling, client, NOW)
+    client.thermostatlist.pop()
+    poll(polling, client, NOW + 1)
+    assert set(polling.devices) == {"device-0"}
+    polling.devices["device-0"].due = NOW
+    assert polling.time_to_next_poll(NOW) == timedelta(seconds=POLL_TICK)
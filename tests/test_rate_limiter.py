@@ -0,0 +1,51 @@
+"""Per-account rate limiter shared by the clients."""
+import pytest
+
+from custom_components.daikinskyport.daikinskyport import (
+    RateLimiter,
+    TokenBucket,
+    _retry_after,
+    get_rate_limiter,
+)
+
+
+@pytest.fixture(autouse=True)
+def not_throttled(monkeypatch):
+    monkeypatch.setattr(RateLimiter, "_throttled_until", 0.0)
+
+
+def test_bucket_serves_the_burst_then_spaces_requests_at_the_rate():
+    bucket = TokenBucket(rate=2, capacity=3)
+    now = bucket.updated
+    assert [bucket.reserve(now) for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve(now) == pytest.approx(0.5)
+    assert bucket.reserve(now) == pytest.approx(1.0)
+    # Tokens come back with time, up to the capacity
+    assert bucket.reserve(now + 100) == 0
+    assert bucket.tokens == 2
+
+
+def test_reads_queue_behind_writes():
+    limiter = RateLimiter(read_rate=100, read_burst=100, write_rate=1, write_burst=1)
+    assert limiter.reserve(write=True) == 0
+    write_wait = limiter.reserve(write=True)
+    assert write_wait == pytest.approx(1, abs=0.05)
+    assert limiter.reserve(write=False) == pytest.approx(write_wait, abs=0.05)
+
+
+def test_throttle_holds_back_every_limiter():
+    first, second = RateLimiter(), RateLimiter()
+    RateLimiter.throttle(10)
+    assert first.reserve(write=False) == pytest.approx(10, abs=0.05)
+    assert second.reserve(write=True) == pytest.approx(10, abs=0.05)
+
+
+def test_clients_of_one_account_share_a_limiter():
+    assert get_rate_limiter("User@Example.com") is get_rate_limiter("user@example.com")
+    assert get_rate_limiter("user@example.com") is not get_rate_limiter("other@example.com")
+
+
+def test_retry_after_accepts_seconds_and_dates():
+    assert _retry_after("12") == 12
+    assert _retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert _retry_after(None) == _retry_after("soon") > 0
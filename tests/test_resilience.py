@@ -0,0 +1,139 @@
+"""Retry policy and circuit breaker of the client."""
+import asyncio
+
+import pytest
+
+from custom_components.daikinskyport.daikinskyport import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DaikinSkyport,
+    RetryPolicy,
+)
+
+
+def test_backoff_stays_within_the_exponential_bound():
+    policy = RetryPolicy(4, 5, 20, backoff_base=0.5, backoff_max=3)
+    for retry, bound in ((1, 1), (2, 2), (3, 3), (8, 3)):
+        delays = [policy.backoff(retry) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+        assert max(delays) > bound / 2
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_request()
+        breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert not breaker.is_open
+
+
+def test_single_probe_after_the_reset_timeout_closes_on_success():
+    breaker = open_breaker(CircuitBreaker(failure_threshold=2, reset_timeout=30))
+    breaker.opened_at -= 30
+    assert breaker.before_request() is True
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.before_request() is False
+
+
+def test_failed_probe_reopens_with_a_doubled_timeout_up_to_the_maximum():
+    breaker = open_breaker(CircuitBreaker(failure_threshold=2, reset_timeout=30, reset_max=100))
+    for timeout in (60, 100, 100):
+        breaker.opened_at -= breaker._timeout
+        assert breaker.before_request() is True
+        breaker.record_failure()
+        assert breaker.is_open
+        assert breaker._timeout == timeout
+        breaker.opened_at -= timeout - 1
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+    breaker.opened_at -= 1
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker._timeout == 30
+
+
+
+class SlowRetryLimiter:
+    """Rate limiter that lets the first attempt through and holds every retry for hold seconds."""
+
+    def __init__(self, hold):
+        self.hold = hold
+        self.reserved = 0
+
+    def reserve(self, write):
+        self.reserved += 1
+        return 0 if self.reserved == 1 else self.hold
+
+
+def deadline_options():
+    """A get policy whose deadline passes while the limiter holds the first retry."""
+    return {
+        "config": {"EMAIL": "deadline@example.com", "PASSWORD": "test"},
+        "retry_policies": {"get": RetryPolicy(3, 1, 0.05, backoff_base=0.001, backoff_max=0.001)},
+        "rate_limiter": SlowRetryLimiter(0.1),
+    }
+
+
+def test_retry_held_past_the_deadline_raises_a_timeout():
+    requests = pytest.importorskip("requests")
+    client = DaikinSkyport(**deadline_options())
+    calls = []
+
+    def refuse(method, url, **kwargs):
+        calls.append(kwargs["timeout"])
+        raise requests.ConnectionError("refused")
+
+    client._session.request = refuse
+    with pytest.raises(requests.Timeout):
+        client._request("get", "GET", "http://127.0.0.1/devices")
+    assert calls == [pytest.approx(0.05, abs=0.01)]
+    assert client.circuit.failures == 1
+    client.close()
+
+
+def test_async_retry_held_past_the_deadline_raises_a_timeout():
+    aiohttp = pytest.importorskip("aiohttp")
+    from custom_components.daikinskyport.async_daikinskyport import AsyncDaikinSkyport
+
+    async def scenario():
+        client = AsyncDaikinSkyport(**deadline_options())
+        calls = []
+
+        def refuse(method, url, **kwargs):
+            calls.append(url)
+            raise aiohttp.ClientConnectionError("refused")
+
+        client._session.request = refuse
+        try:
+            with pytest.raises(TimeoutError):
+                await client._request("get", "GET", "http://127.0.0.1/devices")
+        finally:
+            await client.async_close()
+        assert len(calls) == 1
+        assert client.circuit.failures == 1
+
+    asyncio.run(scenario())
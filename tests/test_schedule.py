@@ -0,0 +1,96 @@
+"""Compiled weekly schedule lookups."""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from custom_components.daikinskyport.schedule import WeeklySchedule
+
+# 2024-01-01 is a Monday
+MONDAY = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_thermostat(time_zone="UTC", enabled=True):
+    """Wake at 06:00 and sleep at 22:00 on Mondays, a disabled part on Wednesdays."""
+    thermostat = {"schedEnabled": enabled, "timeZone": time_zone}
+    for day, part, slot, active, label, hsp, csp in (
+        ("Mon", 1, 24, True, "wake", 20.5, 24.5),
+        ("Mon", 2, 88, True, "sleep", 18.0, 26.0),
+        ("Wed", 1, 40, False, "away", 17.0, 27.0),
+    ):
+        prefix = f"sched{day}Part{part}"
+        thermostat.update({
+            prefix + "Time": slot, prefix + "Enabled": active, prefix + "Label": label,
+            prefix + "hsp": hsp, prefix + "csp": csp,
+        })
+    return thermostat
+
+
+def at(day, hour, minute=0, tz=timezone.utc):
+    return datetime(2024, 1, 1 + day, hour, minute, tzinfo=tz)
+
+
+@pytest.fixture
+def schedule():
+    return WeeklySchedule.from_thermostat(make_thermostat())
+
+
+def test_active_part_and_setpoints(schedule):
+    assert schedule.active_part(at(0, 7)).label == "wake"
+    assert schedule.active_part(at(0, 22)).label == "sleep"
+    assert schedule.setpoints_at(at(0, 12)) == (20.5, 24.5)
+
+
+def test_lookup_wraps_around_the_week(schedule):
+    # Before Monday's first part the last part of the previous week is in effect
+    assert schedule.active_part(at(0, 5)).label == "sleep"
+    assert schedule.active_part(at(6, 12)).label == "sleep"
+    start, part = schedule.next_transition(at(0, 23))
+    assert part.label == "wake"
+    assert start == datetime(2024, 1, 8, 6, 0, tzinfo=timezone.utc)
+
+
+def test_transitions(schedule):
+    assert schedule.transitions(at(0, 7)) == (60, 15 * 60)
+    since, until = schedule.transitions(at(0, 23))
+    assert since == 60
+    assert until == 7 * 24 * 60 - 17 * 60
+
+
+def test_times_are_in_the_thermostat_time_zone():
+    new_york = ZoneInfo("America/New_York")
+    schedule = WeeklySchedule.from_thermostat(make_thermostat("America/New_York"))
+    # 07:00 in New York is 12:00 UTC, 05:00 in New York still belongs to Sunday night's part
+    assert schedule.active_part(at(0, 12)).label == "wake"
+    assert schedule.active_part(at(0, 10)).label == "sleep"
+    start, part = schedule.next_transition(at(0, 10))
+    assert start == datetime(2024, 1, 1, 6, 0, tzinfo=new_york)
+    assert start.utcoffset() == new_york.utcoffset(datetime(2024, 1, 1))
+
+
+def test_unknown_time_zone_falls_back_to_utc():
+    assert WeeklySchedule.from_thermostat(make_thermostat("Mars/Olympus")).tz is timezone.utc
+
+
+def test_disabled_parts_are_kept_but_not_scheduled(schedule):
+    assert schedule.part("Wed", 1).label == "away"
+    assert schedule.active_part(at(2, 12)).label == "sleep"
+    assert schedule.part("Thu", 1) is None
+
+
+def test_disabled_schedule_has_no_lookups():
+    schedule = WeeklySchedule.from_thermostat(make_thermostat(enabled=False))
+    assert not schedule
+    assert schedule.active_part(MONDAY) is None
+    assert schedule.setpoints_at(MONDAY) is None
+    assert schedule.transitions(MONDAY) == (None, None)
+    assert schedule.next_transition(MONDAY) is None
+
+
+def test_client_rebuilds_the_schedule_only_after_a_sched_key_changed(client):
+    schedule = client.get_schedule(0)
+    assert client.get_schedule(0) is schedule
+    client._mark_changed(client.thermostats[0]["id"], {"tempIndoor"})
+    assert client.get_schedule(0) is schedule
+    client._mark_changed(client.thermostats[0]["id"], {"schedMonPart1Time"})
+    assert client.get_schedule(0) is not schedule
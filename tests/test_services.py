@@ -0,0 +1,113 @@
+"""Concurrent fan-out of the climate services to their target thermostats."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.const import ATTR_ENTITY_ID  # noqa: E402
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError  # noqa: E402
+
+from custom_components.daikinskyport import climate  # noqa: E402
+from custom_components.daikinskyport.const import COORDINATOR, DOMAIN  # noqa: E402
+
+
+def make_hass(*entries):
+    """Stand-in for hass with a coordinator per entry holding the given entity ids."""
+    return SimpleNamespace(data={DOMAIN: {
+        f"entry-{number}": {COORDINATOR: SimpleNamespace(climate_entities={
+            entity_id: SimpleNamespace(entity_id=entity_id) for entity_id in entity_ids
+        })}
+        for number, entity_ids in enumerate(entries)
+    }})
+
+
+def make_call(entity_ids, return_response=True):
+    return SimpleNamespace(data={ATTR_ENTITY_ID: entity_ids}, return_response=return_response)
+
+
+def test_writes_run_concurrently_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(climate, "SERVICE_MAX_CONCURRENT_WRITES", 2)
+    entity_ids = [f"climate.thermostat_{number}" for number in range(5)]
+    hass = make_hass(entity_ids[:3], entity_ids[3:])
+    running = set()
+    peak = []
+
+    async def write(thermostat):
+        running.add(thermostat.entity_id)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.discard(thermostat.entity_id)
+        return True
+
+    response = asyncio.run(
+        climate._async_call_thermostats(hass, make_call(entity_ids), "test", write)
+    )
+    assert max(peak) == 2
+    assert response == {"results": {entity_id: {"success": True} for entity_id in entity_ids}}
+
+
+def test_results_are_reported_per_entity():
+    hass = make_hass(["climate.ok", "climate.rejected", "climate.broken"])
+
+    async def write(thermostat):
+        if thermostat.entity_id == "climate.rejected":
+            return None
+        if thermostat.entity_id == "climate.broken":
+            raise HomeAssistantError("no answer")
+        return True
+
+    entity_ids = ["climate.ok", "climate.rejected", "climate.broken", "climate.unknown"]
+    response = asyncio.run(
+        climate._async_call_thermostats(hass, make_call(entity_ids), "test", write)
+    )
+    results = response["results"]
+    assert results["climate.ok"] == {"success": True}
+    assert results["climate.rejected"]["success"] is False
+    assert results["climate.broken"] == {"success": False, "error": "no answer"}
+    assert "not a Daikin Skyport thermostat" in results["climate.unknown"]["error"]
+
+    # Without a response asked for the failures are raised once every write is done
+    with pytest.raises(HomeAssistantError, match="climate.rejected"):
+        asyncio.run(climate._async_call_thermostats(
+            hass, make_call(entity_ids, return_response=False), "test", write
+        ))
+
+
+def test_only_the_targets_are_written():
+    hass = make_hass(["climate.a", "climate.b"], ["climate.c"])
+    written = []
+
+    async def write(thermostat):
+        written.append(thermostat.entity_id)
+        return True
+
+    asyncio.run(climate._async_call_thermostats(hass, make_call(["climate.b"]), "test", write))
+    assert written == ["climate.b"]
+
+
+def test_validation_error_is_raised_as_is():
+    hass = make_hass(["climate.a"])
+
+    async def write(thermostat):
+        raise ServiceValidationError("bad day")
+
+    with pytest.raises(ServiceValidationError, match="bad day"):
+        asyncio.run(climate._async_call_thermostats(
+            hass, make_call(["climate.a"], return_response=False), "test", write
+        ))
+
+
+def test_entity_id_is_required():
+    for schema in (climate.RESUME_PROGRAM_SCHEMA, climate.ONECLEAN_SCHEMA, climate.WEEKLY_SCHEDULE_SCHEMA):
+        with pytest.raises(climate.vol.Invalid):
+            schema({"schedule": {"Mon": []}} if schema is climate.WEEKLY_SCHEDULE_SCHEMA else {})
+
+
+def test_weekly_schedule_rejects_a_day_given_twice():
+    with pytest.raises(climate.vol.Invalid, match="Mon"):
+        climate.WEEKLY_SCHEDULE_SCHEMA({
+            ATTR_ENTITY_ID: "climate.a",
+            "schedule": {"Monday": [{"start_time": 24}], "mon": [{"start_time": 32}]},
+        })
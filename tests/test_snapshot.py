@@ -0,0 +1,57 @@
+"""Slotted thermostat snapshots over a shared key schema."""
+import pytest
+
+from custom_components.daikinskyport.snapshot import Schema, Snapshot
+
+
+@pytest.fixture
+def snapshot():
+    schema = Schema.for_keys(("mode", "tempIndoor", "hspHome"))
+    return Snapshot.from_dict(schema, {"tempIndoor": 21.5, "mode": 1, "hspHome": 20.0, "other": 0})
+
+
+def test_schemas_are_shared_per_key_set():
+    assert Schema.for_keys(["a", "b"]) is Schema.for_keys(("a", "b"))
+    assert Schema.for_keys(("b", "a")) is not Schema.for_keys(("a", "b"))
+
+
+def test_behaves_like_the_dict_it_replaces(snapshot):
+    assert snapshot.as_dict() == {"mode": 1, "tempIndoor": 21.5, "hspHome": 20.0}
+    snapshot["name"] = "Hall"
+    del snapshot["hspHome"]
+    assert snapshot["name"] == "Hall"
+    assert "hspHome" not in snapshot
+    assert snapshot.get("hspHome", "gone") == "gone"
+    assert len(snapshot) == 3
+    assert list(snapshot) == ["mode", "tempIndoor", "name"]
+    with pytest.raises(KeyError):
+        snapshot["hspHome"]
+    with pytest.raises(KeyError):
+        del snapshot["missing"]
+
+
+def test_copy_is_independent(snapshot):
+    snapshot["name"] = "Hall"
+    copy = snapshot.copy()
+    copy["mode"] = 2
+    copy["name"] = "Den"
+    assert copy.schema is snapshot.schema
+    assert (snapshot["mode"], snapshot["name"]) == (1, "Hall")
+
+
+def test_changed_keys(snapshot):
+    other = snapshot.copy()
+    other["tempIndoor"] = 22.0
+    other["name"] = "Hall"
+    assert other.changed_keys(snapshot) == {"tempIndoor", "name"}
+    assert snapshot.changed_keys(other) == {"tempIndoor", "name"}
+    assert other.changed_keys(other.as_dict()) == set()
+    assert other.changed_keys({"mode": 1}) == {"tempIndoor", "hspHome", "name"}
+
+
+def test_compact_drops_deleted_slots(snapshot):
+    keys, values, extra = snapshot.compact()
+    assert keys is snapshot.schema.keys
+    del snapshot["tempIndoor"]
+    snapshot["id"] = "device-0"
+    assert snapshot.compact() == (("mode", "hspHome"), [1, 20.0], {"id": "device-0"})
@@ -0,0 +1,73 @@
+"""Token changes are written to the config entry once they settle."""
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.const import CONF_EMAIL, CONF_NAME, CONF_PASSWORD  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.daikinskyport import DaikinSkyportData  # noqa: E402
+from custom_components.daikinskyport.const import (  # noqa: E402
+    CONF_ACCESS_TOKEN,
+    DOMAIN,
+    TOKEN_SAVE_COOLDOWN,
+)
+
+
+def make_coordinator(hass, monkeypatch):
+    """Coordinator for a fresh entry, with the entry updates it makes."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="test@example.com",
+        data={CONF_NAME: "Test", CONF_EMAIL: "test@example.com", CONF_PASSWORD: "test"},
+    )
+    entry.add_to_hass(hass)
+    updates = []
+    update_entry = hass.config_entries.async_update_entry
+
+    def record(entry, **kwargs):
+        updates.append(kwargs["data"][CONF_ACCESS_TOKEN])
+        return update_entry(entry, **kwargs)
+
+    monkeypatch.setattr(hass.config_entries, "async_update_entry", record)
+    config = {"EMAIL": "test@example.com", "PASSWORD": "test"}
+    return DaikinSkyportData(hass, config, "test@example.com", entry), entry, updates
+
+
+def refresh(coordinator, count):
+    for number in range(count):
+        coordinator.daikinskyport._store_access_token(
+            {"accessToken": f"token-{number}", "accessTokenExpiresIn": 3600}
+        )
+
+
+@pytest.mark.asyncio
+async def test_burst_of_token_changes_writes_the_entry_once(hass, monkeypatch):
+    coordinator, entry, updates = make_coordinator(hass, monkeypatch)
+    refresh(coordinator, 5)
+    await hass.async_block_till_done()
+    assert updates == []
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=TOKEN_SAVE_COOLDOWN + 1))
+    await hass.async_block_till_done()
+    assert updates == ["token-4"]
+    assert entry.data[CONF_ACCESS_TOKEN] == "token-4"
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_the_waiting_tokens_now(hass, monkeypatch):
+    coordinator, entry, updates = make_coordinator(hass, monkeypatch)
+    refresh(coordinator, 3)
+    coordinator.async_flush_tokens()
+    assert updates == ["token-2"]
+
+    # Nothing is left on the debouncer to write again
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=TOKEN_SAVE_COOLDOWN + 1))
+    await hass.async_block_till_done()
+    assert updates == ["token-2"]
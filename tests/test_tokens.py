@@ -0,0 +1,64 @@
+"""Single-flight, proactive access token refresh."""
+import asyncio
+import time
+
+from conftest import make_client, mock_client, puts
+from custom_components.daikinskyport.const import TOKEN_REFRESH_MARGIN
+
+REFRESH = "POST /users/auth/token"
+
+
+def test_token_is_refreshed_ahead_of_expiry():
+    client = make_client(0)
+    client.access_token = "token"
+    client.access_token_expires = None
+    assert not client.token_expiring()
+    client.access_token_expires = time.time() + TOKEN_REFRESH_MARGIN + 60
+    assert not client.token_expiring()
+    client.access_token_expires = time.time() + TOKEN_REFRESH_MARGIN - 1
+    assert client.token_expiring()
+    client.access_token = ""
+    client.access_token_expires = time.time() + 3600
+    assert client.token_expiring()
+
+
+def test_poll_inside_the_margin_refreshes_first():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            token = client.access_token
+            client.access_token_expires = time.time() + TOKEN_REFRESH_MARGIN + 60
+            await client.update()
+            assert mock.stats[REFRESH] == 0
+            client.access_token_expires = time.time() + TOKEN_REFRESH_MARGIN - 1
+            await client.update()
+            assert mock.stats[REFRESH] == 1
+            assert client.access_token != token
+            assert client.access_token_expires > time.time() + TOKEN_REFRESH_MARGIN
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_refresh():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            changes = []
+            client.token_callback = lambda: changes.append(client.access_token)
+            client.access_token_expires = time.time()
+            await asyncio.gather(*(client.ensure_token() for _ in range(10)))
+            assert mock.stats[REFRESH] == 1
+            assert len(changes) == 1
+
+    asyncio.run(scenario())
+
+
+def test_writes_rejected_with_an_expired_token_share_one_refresh():
+    async def scenario():
+        async with mock_client(devices=4, write_coalesce_window=0) as (mock, client):
+            # The API drops the token before the client expected it to expire
+            mock.access_tokens.clear()
+            results = await asyncio.gather(*(client.set_hvac_mode(index, 2) for index in range(4)))
+            assert all(result is not None for result in results)
+            assert mock.stats[REFRESH] == 1
+            assert puts(mock) == 8
+
+    asyncio.run(scenario())
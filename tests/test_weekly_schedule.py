@@ -0,0 +1,87 @@
+"""Weekly schedule upload in one PUT."""
+import asyncio
+
+import pytest
+
+from conftest import mock_client, puts
+
+
+def test_body_holds_only_the_changed_fields(client):
+    thermostat = client.thermostats[0]
+    body = client._weekly_schedule_body(0, {
+        "Mon": [
+            {"Time": thermostat["schedMonPart1Time"], "hsp": thermostat["schedMonPart1hsp"] + 1},
+            {"Label": "changed"},
+        ],
+        "Sun": [{"Enabled": thermostat["schedSunPart1Enabled"]}],
+    })
+    assert body == {
+        "schedMonPart1hsp": thermostat["schedMonPart1hsp"] + 1,
+        "schedMonPart2Label": "changed",
+    }
+    # Nothing is applied before the PUT
+    assert thermostat["schedMonPart2Label"] != "changed"
+
+
+@pytest.mark.parametrize("schedule", [
+    {"Monday": [{"Time": 24}]},
+    {"Mon": [{"Time": 24}]} | {"Tue": [{}] * 7},
+    {"Mon": [{"Start": 24}]},
+])
+def test_invalid_schedule_is_rejected(client, schedule):
+    with pytest.raises(ValueError):
+        client._weekly_schedule_body(0, schedule)
+
+
+def test_unchanged_schedule_sends_no_request():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            thermostat = client.thermostats[0]
+            generation = client.generation
+            unchanged = {"Tue": [{"Time": thermostat["schedTuePart1Time"], "Label": thermostat["schedTuePart1Label"]}]}
+            assert await client.set_weekly_schedule(0, unchanged) is True
+            assert puts(mock) == 0
+            assert client.generation == generation
+
+    asyncio.run(scenario())
+
+
+def test_uploaded_schedule_is_applied_after_the_put():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            before = client.get_schedule(0)
+            result = await client.set_weekly_schedule(0, {"Mon": [{"Label": "early", "Time": 20}]})
+            assert result is not None
+            assert puts(mock) == 1
+            assert mock.device_data[deviceid]["schedMonPart1Label"] == "early"
+            assert client.thermostats[0]["schedMonPart1Time"] == 20
+            schedule = client.get_schedule(0)
+            assert schedule is not before
+            assert schedule.part("Mon", 1).label == "early"
+
+    asyncio.run(scenario())
+
+
+def test_failed_upload_leaves_the_schedule_alone():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            mock.offline.add(client.thermostats[0]["id"])
+            label = client.thermostats[0]["schedMonPart1Label"]
+            assert await client.set_weekly_schedule(0, {"Mon": [{"Label": "early"}]}) is None
+            assert client.thermostats[0]["schedMonPart1Label"] == label
+            assert client.get_schedule(0).part("Mon", 1).label == label
+
+    asyncio.run(scenario())
+
+
+def test_schedule_written_in_a_transaction_is_applied_when_it_is_sent():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            async with client.transaction(0):
+                await client.set_weekly_schedule(0, {"Wed": [{"Label": "late"}]})
+                assert client.thermostats[0]["schedWedPart1Label"] != "late"
+            await asyncio.sleep(0)
+            assert client.thermostats[0]["schedWedPart1Label"] == "late"
+
+    asyncio.run(scenario())
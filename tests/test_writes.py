@@ -0,0 +1,114 @@
+"""Write coalescing, transactions and the rollback of values that were never sent."""
+import asyncio
+
+import pytest
+
+from conftest import mock_client, puts
+
+
+def test_transaction_sends_one_put_with_every_write():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            async with client.transaction(0) as sent:
+                mode = await client.set_hvac_mode(0, 2)
+                speed = await client.set_fan_speed(0, 1)
+                assert mode is speed is sent
+                assert puts(mock) == 0
+            assert puts(mock) == 1
+            assert sent.result() is not None
+            assert mock.device_data[deviceid]["mode"] == 2
+            assert mock.device_data[deviceid]["fanCirculateSpeed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_nested_transactions_share_the_outer_put():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            async with client.transaction(0) as outer:
+                async with client.transaction(0) as inner:
+                    await client.set_hvac_mode(0, 2)
+                assert inner is outer
+                assert puts(mock) == 0
+            assert puts(mock) == 1
+
+    asyncio.run(scenario())
+
+
+def test_writes_within_the_coalesce_window_share_one_put():
+    async def scenario():
+        async with mock_client(write_coalesce_window=0.05) as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            results = await asyncio.gather(
+                client.set_hvac_mode(0, 2), client.set_fan_speed(0, 1), client.set_fan_clean(0, True)
+            )
+            assert puts(mock) == 1
+            assert all(result is results[0] for result in results)
+            assert results[0] is not None
+            assert mock.device_data[deviceid]["oneCleanFanActive"] is True
+            # A write after the window closed goes out on its own
+            await client.set_hvac_mode(0, 1)
+            assert puts(mock) == 2
+
+    asyncio.run(scenario())
+
+
+def test_failed_transaction_drops_the_values_it_never_sent():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            mode = mock.device_data[deviceid]["mode"]
+            with pytest.raises(RuntimeError):
+                async with client.transaction(0) as sent:
+                    await client.set_hvac_mode(0, (mode + 1) % 4)
+                    assert client.thermostats[0]["mode"] != mode
+                    assert client._pending_writes[deviceid]
+                    raise RuntimeError("service failed")
+            assert sent.result() is None
+            assert puts(mock) == 0
+            assert not client._pending_writes[deviceid]
+            # The next poll shows the thermostat as it is
+            await client.update()
+            assert client.thermostats[0]["mode"] == mode
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_coalesce_window_drops_the_values_it_never_sent():
+    async def scenario():
+        async with mock_client(write_coalesce_window=0.5) as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            owner = asyncio.ensure_future(client.set_hvac_mode(0, 2))
+            await asyncio.sleep(0.01)
+            joined = asyncio.ensure_future(client.set_fan_speed(0, 1))
+            await asyncio.sleep(0.01)
+            owner.cancel()
+            assert await joined is None
+            assert owner.cancelled()
+            assert puts(mock) == 0
+            assert not client._pending_writes[deviceid]
+            assert deviceid not in client._write_windows
+
+    asyncio.run(scenario())
+
+
+def test_failed_put_drops_the_values_it_never_sent():
+    async def scenario():
+        async with mock_client() as (mock, client):
+            deviceid = client.thermostats[0]["id"]
+            mock.offline.add(deviceid)
+            assert await client.set_hvac_mode(0, 2) is None
+            assert not client._pending_writes[deviceid]
+
+    asyncio.run(scenario())
+
+
+def test_failed_blocking_transaction_drops_the_values_it_never_sent(client):
+    with pytest.raises(RuntimeError):
+        with client.transaction(0) as sent:
+            client.set_hvac_mode(0, 3)
+            raise RuntimeError("service failed")
+    assert sent.result() is None
+    assert not client._pending_writes["device-0"]
+    assert not client._transactions